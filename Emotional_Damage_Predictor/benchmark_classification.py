@@ -0,0 +1,83 @@
+"""
+Benchmark: per-comment model.predict loop vs batched classify_comments.
+
+Builds a synthetic comment corpus, trains the same TF-IDF + LogisticRegression
+pipeline as train_model_snowflake.py on a small labeled slice and times both
+classification paths.
+
+    python benchmark_classification.py --comments 50000
+"""
+import argparse
+import random
+import time
+
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import Pipeline
+
+from classifier import DEFAULT_BATCH_SIZE, classify_comments
+
+EMOTIONAL_WORDS = ["lol", "moon", "rekt", "insane", "love", "hate", "scam", "wow", "omg", "pump"]
+RATIONAL_WORDS = ["because", "polls", "data", "odds", "volume", "source", "report", "likely", "trend", "model"]
+SPAM_WORDS = ["gm", "follow", "airdrop", "link", "free", "join", "promo", "dm", "giveaway", "bonus"]
+FILLER_WORDS = ["the", "market", "this", "will", "yes", "no", "price", "event", "is", "it"]
+
+
+def make_corpus(n, seed=42):
+    rng = random.Random(seed)
+    vocab = {
+        "EMOTIONAL": EMOTIONAL_WORDS,
+        "RATIONAL": RATIONAL_WORDS,
+        "SPAM": SPAM_WORDS,
+    }
+    labels = list(vocab)
+    bodies, y = [], []
+    for _ in range(n):
+        label = rng.choice(labels)
+        words = rng.choices(vocab[label], k=rng.randint(2, 6))
+        words += rng.choices(FILLER_WORDS, k=rng.randint(3, 20))
+        rng.shuffle(words)
+        bodies.append(" ".join(words))
+        y.append(label)
+    return bodies, y
+
+
+def loop_predict(model, bodies):
+    return [model.predict([body])[0] for body in bodies]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--comments", type=int, default=50000)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--train-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    train_x, train_y = make_corpus(args.train_size, seed=1)
+    model = Pipeline([
+        ("tfidf", TfidfVectorizer()),
+        ("clf", LogisticRegression(max_iter=1000)),
+    ])
+    model.fit(train_x, train_y)
+
+    bodies, _ = make_corpus(args.comments, seed=2)
+
+    start = time.perf_counter()
+    loop_labels = loop_predict(model, bodies)
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch_results = classify_comments(bodies, batch_size=args.batch_size, model=model)
+    batch_time = time.perf_counter() - start
+
+    mismatches = sum(1 for a, b in zip(loop_labels, batch_results) if a != b["label"])
+
+    print(f"Comments:          {args.comments}")
+    print(f"Per-comment loop:  {loop_time:8.2f}s  ({args.comments / loop_time:10.0f} comments/s)")
+    print(f"classify_comments: {batch_time:8.2f}s  ({args.comments / batch_time:10.0f} comments/s)")
+    print(f"Speedup:           {loop_time / batch_time:8.1f}x")
+    print(f"Label mismatches:  {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark: classify_comments throughput with 1, 2, 4 and 8 classifier workers.
+
+Trains the TF-IDF + LogisticRegression pipeline on a synthetic corpus, then
+classifies the same comments in-process and through ClassifierPool at each
+worker count, once with the pipeline (shared by fork) and once with its
+compact artifact (shared by memory-mapping). Pool start-up is timed
+separately from classification. Scaling is bounded by os.cpu_count().
+
+    python benchmark_classify_pool.py --comments 200000 --workers 1 2 4 8
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import Pipeline
+
+from benchmark_model_load import make_corpus
+from classifier import DEFAULT_BATCH_SIZE, classify_comments
+from classifier_pool import ClassifierPool
+from compact_model import CompactClassifier, export_compact
+
+
+def run(model, bodies, batch_size, workers):
+    """(startup seconds, classification seconds, labels)"""
+    pool = ClassifierPool(workers=workers, min_comments=0) if workers > 1 else None
+    startup = 0.0
+    if pool is not None:
+        start = time.perf_counter()
+        pool.predict_proba(model, bodies[:1], batch_size)  # start the workers
+        startup = time.perf_counter() - start
+    try:
+        start = time.perf_counter()
+        results = classify_comments(bodies, batch_size=batch_size, model=model, cache=None, pool=pool)
+        elapsed = time.perf_counter() - start
+    finally:
+        if pool is not None:
+            pool.close()
+    return startup, elapsed, [r["label"] for r in results]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--comments", type=int, default=200000)
+    parser.add_argument("--vocab", type=int, default=50000)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    train_x, train_y = make_corpus(20000, args.vocab, seed=1)
+    pipeline = Pipeline([
+        ("tfidf", TfidfVectorizer()),
+        ("clf", LogisticRegression(max_iter=1000)),
+    ]).fit(train_x, train_y)
+    bodies, _ = make_corpus(args.comments, args.vocab, seed=2)
+
+    print(f"Comments: {args.comments}, CPUs: {os.cpu_count()}")
+    with tempfile.TemporaryDirectory() as tmp:
+        export_compact(pipeline, tmp)
+        for name, model in (("pipeline", pipeline), ("compact", CompactClassifier(tmp))):
+            baseline, expected = None, None
+            for workers in args.workers:
+                startup, elapsed, labels = run(model, bodies, args.batch_size, workers)
+                baseline = baseline or elapsed
+                expected = expected or labels
+                print(
+                    f"{name:8s} {workers} worker(s): {args.comments / elapsed:9.0f} comments/s  "
+                    f"speedup {baseline / elapsed:4.2f}x  startup {startup:5.2f}s  "
+                    f"same labels: {labels == expected}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Benchmark: cold start of the joblib pickle vs the compact artifact.
+
+Trains the TF-IDF + LogisticRegression pipeline on a synthetic corpus with a
+realistic vocabulary size, writes both artifacts to a scratch directory, then
+starts a fresh Python process per format that loads the model through
+ModelRegistry and classifies one comment. Reports wall time and peak RSS
+(VmHWM from /proc, so Linux only) of each process, the artifact sizes, and the largest probability difference
+between the two formats on held-out comments.
+
+    python benchmark_model_load.py --vocab 100000 --comments 50000
+"""
+import argparse
+import os
+import random
+import string
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import Pipeline
+
+from classifier import DEFAULT_BATCH_SIZE
+from compact_model import CompactClassifier, export_compact
+from model_registry import save_model
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+LABELS = ["EMOTIONAL", "RATIONAL", "SPAM"]
+
+CHILD = """
+import sys, time
+started = time.perf_counter()
+sys.path.insert(0, {base_dir!r})
+from model_registry import ModelRegistry
+model, version = ModelRegistry(model_path={model_path!r}, compact_dir={compact_dir!r}, model_format={fmt!r}).get()
+model.predict_proba(["this market is going to the moon"])
+elapsed = time.perf_counter() - started
+# Peak RSS of this process only (ru_maxrss would include the parent's, from before exec)
+with open("/proc/self/status") as f:
+    peak_kb = next(int(line.split()[1]) for line in f if line.startswith("VmHWM:"))
+print(elapsed, peak_kb, "sklearn" in sys.modules)
+"""
+
+
+def make_corpus(n, vocab_size, seed):
+    rng = random.Random(seed)
+    vocab = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 10))) for _ in range(vocab_size)]
+    bodies, y = [], []
+    for _ in range(n):
+        label = rng.randrange(len(LABELS))
+        # each label leans towards its own third of the vocabulary
+        words = [vocab[rng.randrange(vocab_size // 3) * 3 + label] if rng.random() < 0.5 else rng.choice(vocab)
+                 for _ in range(rng.randint(5, 30))]
+        bodies.append(" ".join(words))
+        y.append(LABELS[label])
+    return bodies, y
+
+
+def cold_start(fmt, model_path, compact_dir):
+    code = CHILD.format(base_dir=BASE_DIR, model_path=model_path, compact_dir=compact_dir, fmt=fmt)
+    output = subprocess.run([sys.executable, "-c", code], stdout=subprocess.PIPE, text=True, check=True).stdout
+    seconds, peak_kb, sklearn_loaded = output.splitlines()[-1].split()  # after the registry log line
+    return float(seconds), int(peak_kb) / 1024, sklearn_loaded == "True"
+
+
+def dir_size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vocab", type=int, default=100000)
+    parser.add_argument("--comments", type=int, default=50000)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    bodies, y = make_corpus(args.comments, args.vocab, seed=1)
+    model = Pipeline([
+        ("tfidf", TfidfVectorizer()),
+        ("clf", LogisticRegression(max_iter=1000)),
+    ]).fit(bodies, y)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = os.path.join(tmp, "comment_classifier.pkl")
+        compact_dir = os.path.join(tmp, "comment_classifier.compact")
+        save_model(model, model_path)
+        export_compact(model, compact_dir)
+
+        test, _ = make_corpus(20000, args.vocab, seed=2)
+        compact = CompactClassifier(compact_dir)
+        start = time.perf_counter()
+        for i in range(0, len(test), DEFAULT_BATCH_SIZE):
+            compact.predict_proba(test[i:i + DEFAULT_BATCH_SIZE])
+        compact_time = time.perf_counter() - start
+        start = time.perf_counter()
+        for i in range(0, len(test), DEFAULT_BATCH_SIZE):
+            model.predict_proba(test[i:i + DEFAULT_BATCH_SIZE])
+        pipeline_time = time.perf_counter() - start
+        diff = np.abs(compact.predict_proba(test) - model.predict_proba(test)).max()
+
+        print(f"Vocabulary:   {len(model.named_steps['tfidf'].vocabulary_)} terms")
+        print(f"Artifacts:    pickle {dir_size(model_path) / 1e6:.1f} MB, compact {dir_size(compact_dir) / 1e6:.1f} MB")
+        print(f"Max |p diff|: {diff:.2e} on {len(test)} comments")
+        print(f"Throughput:   pipeline {len(test) / pipeline_time:.0f}/s, compact {len(test) / compact_time:.0f}/s")
+        for fmt in ("pickle", "compact"):
+            runs = [cold_start(fmt, model_path, compact_dir) for _ in range(args.runs)]
+            seconds = min(r[0] for r in runs)
+            rss = min(r[1] for r in runs)
+            print(f"Cold start {fmt:8s} {seconds:6.3f}s  peak RSS {rss:6.1f} MB  sklearn imported: {runs[0][2]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+Benchmark: full TF-IDF + LogisticRegression refit vs incremental
+HashingVectorizer + SGDClassifier updates as the training table grows.
+
+Starts from --initial labeled rows and adds --batch new rows --steps times.
+After every step both modes retrain the way train_model() would (the full
+pipeline on the whole table, the incremental one through train_incremental()
+with a scratch checkpoint) and are scored on the same held-out set.
+
+With --memory, instead compares the peak memory of loading the
+whole table with to_pandas() against streaming it with iter_table_batches()
+from a fake table source that generates rows as they are downloaded.
+
+    python benchmark_training.py --initial 50000 --batch 2000 --steps 10
+    python benchmark_training.py --memory --initial 500000
+"""
+import argparse
+import contextlib
+import io
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+from benchmark_classification import EMOTIONAL_WORDS, FILLER_WORDS, RATIONAL_WORDS, SPAM_WORDS
+from train_model_snowflake import (
+    TABLE_NAME,
+    build_full_pipeline,
+    frame_batches,
+    iter_table_batches,
+    load_training_frame,
+    train_incremental,
+)
+
+
+def make_noisy_corpus(n, seed, signal=0.5):
+    """Like make_corpus, but each signal word comes from another label's vocabulary with p=1-signal."""
+    rng = random.Random(seed)
+    vocab = {"EMOTIONAL": EMOTIONAL_WORDS, "RATIONAL": RATIONAL_WORDS, "SPAM": SPAM_WORDS}
+    labels = list(vocab)
+    bodies, y = [], []
+    for i in range(n):
+        label = rng.choice(labels)
+        words = [
+            rng.choice(vocab[label] if rng.random() < signal else vocab[rng.choice(labels)])
+            for _ in range(rng.randint(2, 5))
+        ]
+        words += rng.choices(FILLER_WORDS, k=rng.randint(3, 15))
+        rng.shuffle(words)
+        bodies.append(" ".join(words) + f" #{seed}-{i}")  # keep rows distinct
+        y.append(label)
+    return pd.DataFrame({"BODY": bodies, "LABEL": y})
+
+
+def accuracy(model, test):
+    return float((model.predict(test["BODY"]) == test["LABEL"].to_numpy()).mean())
+
+
+def _measure(fn, conn):
+    import pyarrow as pa
+
+    pool = pa.default_memory_pool()
+    arrow_before = pool.bytes_allocated()
+    tracemalloc.start()
+    fn()
+    python_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    conn.send(python_peak + max(0, pool.max_memory() - arrow_before))
+
+
+def peak_memory(fn):
+    """Peak Python heap + Arrow buffer bytes of fn() (pandas 3 keeps strings in Arrow), in a forked child."""
+    ctx = multiprocessing.get_context("fork")
+    parent, child = ctx.Pipe()
+    proc = ctx.Process(target=_measure, args=(fn, child))
+    proc.start()
+    peak = parent.recv()
+    proc.join()
+    return peak
+
+
+class GeneratedTable:
+    """Fake table source: rows are generated on download, like a real fetch allocates them."""
+
+    def __init__(self, rows, batch_rows):
+        self.rows = rows
+        self.batch_rows = batch_rows
+
+    def to_pandas_batches(self):
+        for i, start in enumerate(range(0, self.rows, self.batch_rows)):
+            yield make_noisy_corpus(min(self.batch_rows, self.rows - start), seed=1000 + i)
+
+    def to_pandas(self):
+        return pd.concat(self.to_pandas_batches(), ignore_index=True)
+
+
+class GeneratedSession:
+    def __init__(self, rows, batch_rows):
+        self._table = GeneratedTable(rows, batch_rows)
+
+    def table(self, table_name):
+        return self._table
+
+
+def memory_benchmark(rows, batch_rows):
+    session = GeneratedSession(rows, batch_rows)
+    mb = 1024 * 1024
+
+    def full():
+        with contextlib.redirect_stdout(io.StringIO()):
+            pdf = load_training_frame(session)
+        pdf["BODY"].str.len().sum()
+
+    def streamed():
+        for batch in iter_table_batches(session, batch_rows=batch_rows):
+            batch["BODY"].str.len().sum()
+
+    print(f"Rows:                       {rows}")
+    print(f"to_pandas() peak:           {peak_memory(full) / mb:8.1f} MB")
+    print(f"iter_table_batches() peak:  {peak_memory(streamed) / mb:8.1f} MB  (batches of {batch_rows})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--initial", type=int, default=50000)
+    parser.add_argument("--batch", type=int, default=2000)
+    parser.add_argument("--steps", type=int, default=10)
+    parser.add_argument("--test-size", type=int, default=10000)
+    parser.add_argument("--signal", type=float, default=0.5)
+    parser.add_argument("--memory", action="store_true")
+    parser.add_argument("--batch-rows", type=int, default=10000)
+    args = parser.parse_args()
+
+    if args.memory:
+        memory_benchmark(args.initial, args.batch_rows)
+        return
+
+    table = make_noisy_corpus(args.initial, seed=1, signal=args.signal)
+    test = make_noisy_corpus(args.test_size, seed=0, signal=args.signal)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        checkpoint = os.path.join(tmp, "checkpoint.pkl")
+        with contextlib.redirect_stdout(io.StringIO()):
+            train_incremental(lambda: frame_batches(table), checkpoint_path=checkpoint, full_refit_every=0)
+
+        print(f"{'rows':>8}  {'full s':>7}  {'full acc':>8}  {'incr s':>7}  {'incr acc':>8}")
+        full_total = incr_total = 0.0
+        for step in range(1, args.steps + 1):
+            batch = make_noisy_corpus(args.batch, seed=100 + step, signal=args.signal)
+            table = pd.concat([table, batch], ignore_index=True)
+
+            start = time.perf_counter()
+            full = build_full_pipeline().fit(table["BODY"], table["LABEL"])
+            full_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                incr = train_incremental(lambda: frame_batches(table), checkpoint_path=checkpoint, full_refit_every=0)
+            incr_time = time.perf_counter() - start
+
+            full_total += full_time
+            incr_total += incr_time
+            print(
+                f"{len(table):8d}  {full_time:7.2f}  {accuracy(full, test):8.4f}  "
+                f"{incr_time:7.2f}  {accuracy(incr, test):8.4f}"
+            )
+
+    print(f"\nTotal retrain time: full {full_total:.2f}s, incremental {incr_total:.2f}s "
+          f"({full_total / incr_total:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
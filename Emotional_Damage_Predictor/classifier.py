@@ -0,0 +1,110 @@
+from classifier_pool import classifier_pool
+from label_cache import content_key, label_cache
+from model_registry import model_registry
+
+DEFAULT_BATCH_SIZE = 2000
+
+
+def _proba_chunks(model, bodies, batch_size, pool):
+    if pool is not None and pool.accepts(len(bodies)):
+        yield pool.predict_proba(model, bodies, batch_size)
+        return
+    for start in range(0, len(bodies), batch_size):
+        yield model.predict_proba(bodies[start:start + batch_size])
+
+
+def _predict(model, bodies, batch_size, pool=None):
+    classes = [str(c) for c in model.classes_]
+    results = []
+
+    for proba in _proba_chunks(model, bodies, batch_size, pool):
+        best = proba.argmax(axis=1)
+
+        for row, best_idx in zip(proba.tolist(), best.tolist()):
+            results.append({
+                "label": classes[best_idx],
+                "probabilities": dict(zip(classes, row)),
+            })
+
+    return results
+
+
+def classify_comments(bodies, batch_size=DEFAULT_BATCH_SIZE, model=None, version=None, cache=label_cache,
+                      pool=classifier_pool):
+    """
+    Classify many comment bodies in chunked batches.
+
+    Each chunk goes through the pipeline once (one TF-IDF transform and one
+    sparse matmul for the whole chunk) instead of once per comment.
+
+    Bodies that are the same after normalization are classified once. When
+    the model version is known (always, if the model comes from the registry)
+    results are also looked up in / written to the label cache under that
+    version, so repeated comments are never re-classified by the same model.
+
+    When more than `pool.min_comments` bodies are left to classify, they are
+    sharded across the classifier worker processes (see classifier_pool.py).
+
+    Returns a list aligned with `bodies`:
+        [{"label": "EMOTIONAL", "probabilities": {"EMOTIONAL": 0.7, ...}}, ...]
+    """
+    if model is None:
+        model, version = model_registry.get()
+
+    bodies = list(bodies)
+    key_of = {body: None for body in bodies}  # normalize each distinct raw body once
+    for body in key_of:
+        key_of[body] = content_key(body)
+    keys = [key_of[body] for body in bodies]
+    unique = {}  # key -> first body with it
+    for key, body in zip(keys, bodies):
+        unique.setdefault(key, body)
+    unique_keys = list(unique)
+    unique_bodies = list(unique.values())
+
+    if cache is not None and version is not None:
+        namespace = cache.use_model(version)
+        cached = cache.get_many(namespace, unique_bodies)
+    else:
+        namespace, cached = None, [None] * len(unique_bodies)
+
+    by_key = {key: result for key, result in zip(unique_keys, cached) if result is not None}
+    missing = [(key, body) for key, body, result in zip(unique_keys, unique_bodies, cached) if result is None]
+    if missing:
+        fresh = _predict(model, [body for _, body in missing], batch_size, pool)
+        by_key.update((key, result) for (key, _), result in zip(missing, fresh))
+        if namespace is not None:
+            cache.put_many(namespace, [body for _, body in missing], fresh)
+
+    return [dict(by_key[key]) for key in keys]
+
+
+def label_comments(all_comments, batch_size=DEFAULT_BATCH_SIZE, model=None, version=None):
+    """
+    Label every unlabeled comment (with a non-empty body) in place.
+
+    Returns (emotional_count, rational_count) for the comments labeled now.
+    """
+    pending = [
+        item for item in all_comments
+        if not item.get("label") and item.get("body")
+    ]
+    results = classify_comments(
+        [item["body"] for item in pending],
+        batch_size=batch_size,
+        model=model,
+        version=version,
+    )
+
+    emotional_rate = 0
+    rational_rate = 0
+    for item, result in zip(pending, results):
+        item["label"] = result["label"]
+        item["probabilities"] = result["probabilities"]
+
+        if result["label"] == "EMOTIONAL":
+            emotional_rate += 1
+        elif result["label"] == "RATIONAL":
+            rational_rate += 1
+
+    return emotional_rate, rational_rate
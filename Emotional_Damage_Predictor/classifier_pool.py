@@ -0,0 +1,140 @@
+"""
+Process pool for classifying large comment batches on several cores.
+
+The model is handed to the workers once, when the pool starts. Workers are
+started with "forkserver" (or "spawn" where that is missing), not "fork": the
+pool lives inside the threaded API next to the training scheduler and the
+sqlite / registry locks, and forking a multithreaded process can deadlock the
+child. A CompactClassifier (compact_model.py) pickles as its directory, so
+every worker memory-maps the same .npy files; a sklearn pipeline is pickled
+to each worker once.
+
+Bodies are cut into ordered shards, each worker runs predict_proba over its
+shard in `batch_size` chunks, and the probability arrays come back in shard
+order. A new model (the registry hot-swapped it) restarts the pool. With
+`current_model` set, only the registry's current model gets the pool: a
+request still holding a replaced model classifies in-process instead, so the
+pool never restarts for a model whose files a later export has removed, and
+requests on two versions do not bounce it back and forth.
+
+Note the pool is per process: with N API worker processes the machine runs
+N * CLASSIFY_WORKERS classifier processes.
+"""
+import multiprocessing
+import os
+import threading
+
+import numpy as np
+
+from model_registry import model_registry
+
+CLASSIFY_WORKERS = int(os.getenv("CLASSIFY_WORKERS", "0"))  # 0/1 = classify in-process
+CLASSIFY_POOL_MIN_COMMENTS = int(os.getenv("CLASSIFY_POOL_MIN_COMMENTS", "20000"))
+CLASSIFY_START_METHOD = os.getenv(
+    "CLASSIFY_START_METHOD",
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn",
+)
+SHARDS_PER_WORKER = 4  # a few shards per worker evens out uneven comment lengths
+
+_worker_model = None
+
+
+def _init_worker(model):
+    global _worker_model
+    _worker_model = model
+
+
+def _retire(pool):
+    # Let requests still mapping on the old pool drain, then reap its workers
+    pool.close()
+    pool.join()
+
+
+def _predict_shard(args):
+    bodies, batch_size = args
+    chunks = [
+        _worker_model.predict_proba(bodies[start:start + batch_size])
+        for start in range(0, len(bodies), batch_size)
+    ]
+    return np.vstack(chunks)
+
+
+class ClassifierPool:
+    """
+    Shards predict_proba across `workers` processes.
+
+    Only batches of at least `min_comments` bodies are worth the round trip
+    (see accepts()); smaller ones are classified in the calling process.
+    """
+
+    def __init__(self, workers=CLASSIFY_WORKERS, min_comments=CLASSIFY_POOL_MIN_COMMENTS,
+                 start_method=CLASSIFY_START_METHOD, current_model=None):
+        self.workers = workers
+        self.min_comments = min_comments
+        self.start_method = start_method
+        self.current_model = current_model  # () -> the model the pool may run, e.g. the registry's
+        self._lock = threading.Lock()
+        self._pool = None
+        self._model = None
+
+    def accepts(self, n_bodies):
+        return self.workers > 1 and n_bodies >= self.min_comments
+
+    def _pool_for(self, model):
+        """The pool running `model`, or None if `model` has been replaced."""
+        with self._lock:
+            if self._pool is not None and self._model is model:
+                return self._pool
+            if self.current_model is not None and self.current_model() is not model:
+                return None
+            if self._pool is not None:
+                # A request may still be using the old pool: join it in the background
+                threading.Thread(target=_retire, args=(self._pool,), name="classifier-pool-retire", daemon=True).start()
+            ctx = multiprocessing.get_context(self.start_method)
+            self._pool = ctx.Pool(self.workers, initializer=_init_worker, initargs=(model,))
+            self._model = model
+            print(f"Started {self.workers} classifier workers ({self.start_method})")
+            return self._pool
+
+    def shards(self, bodies, batch_size):
+        """Contiguous, ordered slices: SHARDS_PER_WORKER per worker, at least one batch each."""
+        n_shards = max(1, min(self.workers * SHARDS_PER_WORKER, -(-len(bodies) // batch_size)))
+        size = -(-len(bodies) // n_shards)
+        return [bodies[start:start + size] for start in range(0, len(bodies), size)]
+
+    def predict_proba(self, model, bodies, batch_size):
+        """Probability rows aligned with `bodies`."""
+        bodies = list(bodies)
+        if not bodies:
+            return np.empty((0, len(model.classes_)))
+        pool = self._pool_for(model)
+        if pool is None:
+            # A replaced model: its already opened arrays still work in this process
+            return np.vstack([
+                model.predict_proba(bodies[start:start + batch_size])
+                for start in range(0, len(bodies), batch_size)
+            ])
+        results = pool.map(_predict_shard, [(shard, batch_size) for shard in self.shards(bodies, batch_size)], chunksize=1)
+        return np.vstack(results)
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.close()
+                self._pool.join()
+            self._pool = None
+            self._model = None
+
+    def status(self):
+        return {
+            "workers": self.workers,
+            "min_comments": self.min_comments,
+            "start_method": self.start_method,
+            "running": self._pool is not None,
+        }
+
+
+# Shared per-process pool (None when CLASSIFY_WORKERS <= 1)
+classifier_pool = (
+    ClassifierPool(current_model=lambda: model_registry.get()[0]) if CLASSIFY_WORKERS > 1 else None
+)
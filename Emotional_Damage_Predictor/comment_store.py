@@ -0,0 +1,209 @@
+import os
+import threading
+from contextlib import contextmanager
+
+from commentsReceiver import CommentFetcher
+from event_storage import DATA_DIR, append_jsonl, comments_path, read_jsonl, write_jsonl
+
+try:
+    import fcntl
+except ImportError:  # Windows: in-process locking only
+    fcntl = None
+
+# newest first, so a sync can stop as soon as it reaches comments it already has
+NEWEST_FIRST = {"order": "createdAt", "ascending": "false"}
+
+LABELS = ("EMOTIONAL", "RATIONAL", "SPAM")
+
+# rewrite the store once superseded lines outnumber the live ones by this much
+COMPACT_SLACK = 64
+
+_path_locks = {}
+_path_locks_guard = threading.Lock()
+
+
+@contextmanager
+def event_lock(event_id, data_dir=DATA_DIR):
+    """
+    Serialize sync -> label -> save for one event across threads and (where
+    fcntl exists) processes. Not reentrant: load the store inside it.
+    """
+    path = comments_path(event_id, data_dir)
+    with _path_locks_guard:
+        lock = _path_locks.setdefault(path, threading.Lock())
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with lock, open(path + ".lock", "w") as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+
+
+class CommentStore:
+    """
+    Local comment store for one event.
+
+    Comments are keyed by Gamma comment id. The store keeps the newest
+    `createdAt` seen (high-water mark), running per-label tallies and the ids
+    that still need a label, so a sync only has to deal with new comments.
+
+    The file is append-only: `save` writes the comments added or labeled
+    since the last save plus a fresh `_meta` line, and loading lets later
+    lines win. It is compacted (rewritten) once mostly superseded lines.
+    """
+
+    def __init__(self, event_id, data_dir=DATA_DIR):
+        self.event_id = str(event_id)
+        self.path = comments_path(self.event_id, data_dir)
+
+        self.comments = {}              # id -> {"id", "body", "createdAt", "label"}
+        self.newest_created_at = None
+        self.tallies = {label: 0 for label in LABELS}
+        self.pending_ids = set()        # stored comments without a label yet
+        self.backfill_offset = 0        # next newest-first offset of the initial crawl
+        self.backfill_complete = False
+        self._dirty = {}                # id -> None, in insertion order
+        self._lines = 0                 # lines currently in the file
+
+        if os.path.exists(self.path):
+            self._load()
+
+    def _load(self):
+        # JSON Lines: "_meta" lines and comment lines; the last of each wins
+        meta = {}
+        for row in read_jsonl(self.path, skip_torn=True):
+            self._lines += 1
+            if "_meta" in row:
+                meta = row["_meta"] or {}
+            else:
+                self.comments[row["id"]] = row
+
+        self.newest_created_at = meta.get("newest_created_at")
+        self.tallies.update(meta.get("tallies") or {})
+        self.backfill_offset = meta.get("backfill_offset", 0)
+        self.backfill_complete = meta.get("backfill_complete", False)
+
+        for item in self.comments.values():
+            if not item.get("label") and item.get("body"):
+                self.pending_ids.add(item["id"])
+
+    def _meta(self):
+        return {
+            "event_id": self.event_id,
+            "newest_created_at": self.newest_created_at,
+            "tallies": self.tallies,
+            "backfill_offset": self.backfill_offset,
+            "backfill_complete": self.backfill_complete,
+        }
+
+    def save(self):
+        """
+        Append what changed since the last save, or rewrite the store
+        atomically (temp file + rename) when it is new or mostly stale.
+        """
+        changed = [self.comments[comment_id] for comment_id in self._dirty]
+        lines = self._lines + len(changed) + 1
+        if not os.path.exists(self.path) or lines > 2 * (len(self.comments) + 1) + COMPACT_SLACK:
+            def rows():
+                yield {"_meta": self._meta()}
+                yield from self.comments.values()
+
+            write_jsonl(self.path, rows())
+            self._lines = len(self.comments) + 1
+        else:
+            append_jsonl(self.path, [*changed, {"_meta": self._meta()}])
+            self._lines = lines
+        self._dirty.clear()
+
+    def add(self, raw_comments):
+        """Add Gamma comment objects; returns the ones that were not stored yet."""
+        added = []
+        for c in raw_comments:
+            comment_id = str(c.get("id"))
+            if comment_id in self.comments:
+                continue
+
+            item = {
+                "id": comment_id,
+                "body": c.get("body", "") or "",
+                "createdAt": c.get("createdAt"),
+            }
+            self.comments[comment_id] = item
+            self._dirty[comment_id] = None
+            if item["body"]:
+                self.pending_ids.add(comment_id)
+
+            created_at = item["createdAt"]
+            if created_at and (self.newest_created_at is None or created_at > self.newest_created_at):
+                self.newest_created_at = created_at
+            added.append(item)
+        return added
+
+    def unlabeled(self):
+        return [self.comments[comment_id] for comment_id in self.pending_ids]
+
+    def record_labels(self, items):
+        """Fold freshly labeled comments into the running tallies."""
+        for item in items:
+            label = item.get("label")
+            if not label or item["id"] not in self.pending_ids:
+                continue
+            self.pending_ids.discard(item["id"])
+            self._dirty[item["id"]] = None
+            self.tallies[label] = self.tallies.get(label, 0) + 1
+
+    def __len__(self):
+        return len(self.comments)
+
+
+def _reached_known(store, page):
+    """True once a newest-first page overlaps what the store already has."""
+    for c in page:
+        if str(c.get("id")) in store.comments:
+            return True
+        created_at = c.get("createdAt")
+        if created_at and store.newest_created_at and created_at < store.newest_created_at:
+            return True
+    return False
+
+
+def sync_event_comments(event_id, fetcher=None, store=None, save_every=20):
+    """
+    Bring the local store for `event_id` up to date and return (store, new_comments).
+
+    The first sync crawls the whole event (newest first, with prefetching) and
+    saves its progress every `save_every` pages so it can resume. Later syncs
+    only read newest-first pages until they reach an already stored comment.
+
+    Callers that label or save the store afterwards should hold
+    `event_lock(event_id)` around the whole sequence.
+    """
+    fetcher = fetcher or CommentFetcher()
+    if store is None:  # an empty store is falsy (__len__)
+        store = CommentStore(event_id)
+    new_comments = []
+
+    # 1) Delta: comments posted since the last sync. Once the crawl is done this
+    # always runs, even if the event had no (dated) comments when it was crawled.
+    if store.backfill_complete or store.newest_created_at is not None:
+        for _, page in fetcher.iter_pages(event_id, extra_params=NEWEST_FIRST, concurrency=1):
+            reached_known = _reached_known(store, page)
+            new_comments.extend(store.add(page))
+            if reached_known:
+                break
+        # Older comments moved down the newest-first listing by this much
+        store.backfill_offset += len(new_comments)
+
+    # 2) Backfill: finish (or start) the full crawl of older comments
+    if not store.backfill_complete:
+        pages = 0
+        for offset, page in fetcher.iter_pages(event_id, start_offset=store.backfill_offset, extra_params=NEWEST_FIRST):
+            new_comments.extend(store.add(page))
+            store.backfill_offset = offset + len(page)
+            pages += 1
+            if pages % save_every == 0:
+                store.save()
+        store.backfill_complete = True
+
+    store.save()
+    print(f"Synced event {event_id}: {len(new_comments)} new comments, {len(store)} stored")
+    return store, new_comments
@@ -1,50 +1,234 @@
 import requests
+from requests.adapters import HTTPAdapter
+import threading
 import time
 import json
 import os
+import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
-def getComments(link):
-    # Save NEXT TO this file
-    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-    OUTPUT_PATH = os.path.join(BASE_DIR, "data.json")
+from event_storage import atomic_write
 
-    event_slug = link.split("/")[-1]
-    slug_resp = requests.get(f"https://gamma-api.polymarket.com/events/slug/{event_slug}")
-    slug_data = slug_resp.json()
+# Save NEXT TO this file
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
-    BASE_URL = "https://gamma-api.polymarket.com/comments"
-    PARENT_TYPE = "Event"
-    PARENT_ID = slug_data.get("id")
-    LIMIT = 100
+# event_cache.py lives at the repo root and is shared with the other services
+sys.path.append(os.path.dirname(BASE_DIR))
+from event_cache import event_cache
+
+OUTPUT_PATH = os.path.join(BASE_DIR, "data.json")
+
+GAMMA_BASE_URL = "https://gamma-api.polymarket.com"
+COMMENTS_URL = f"{GAMMA_BASE_URL}/comments"
+PARENT_TYPE = "Event"
+LIMIT = 100
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class RateLimiter:
+    """Thread-safe limiter that spaces calls to at most `rate` per second."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if wait > 0:
+            time.sleep(wait)
 
-    if not PARENT_ID:
-        print("Failed to extract event ID from slug API.")
-        return
 
-    all_comments = []
-    offset = 0
+def make_session(pool_size=8):
+    """requests.Session with a keep-alive connection pool of `pool_size`."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
 
-    while True:
+
+class CommentFetcher:
+    """
+    Pages Gamma /comments over one pooled session.
+
+    Up to `concurrency` offsets are requested ahead of the one being consumed,
+    all requests share `rate_limit` (requests/sec), and 429/5xx responses are
+    retried with exponential backoff (honouring Retry-After).
+    """
+
+    def __init__(
+        self,
+        session=None,
+        concurrency=4,
+        rate_limit=5.0,
+        max_retries=5,
+        backoff=0.5,
+        timeout=15,
+        limit=LIMIT,
+    ):
+        self.session = session or make_session(pool_size=concurrency)
+        self.concurrency = max(1, concurrency)
+        self.rate_limiter = RateLimiter(rate_limit)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.limit = limit
+
+    def get_json(self, url, params=None):
+        attempt = 0
+        while True:
+            self.rate_limiter.acquire()
+            try:
+                resp = self.session.get(url, params=params, timeout=self.timeout)
+            except requests.RequestException:
+                if attempt >= self.max_retries:
+                    raise
+                resp = None
+
+            if resp is not None and resp.status_code not in RETRY_STATUS_CODES:
+                resp.raise_for_status()
+                return resp.json()
+
+            if attempt >= self.max_retries:
+                resp.raise_for_status()
+
+            delay = self.backoff * (2 ** attempt)
+            retry_after = resp.headers.get("Retry-After") if resp is not None else None
+            if retry_after and retry_after.isdigit():
+                delay = max(delay, float(retry_after))
+            time.sleep(delay)
+            attempt += 1
+
+    def fetch_page(self, event_id, offset, extra_params=None):
         params = {
             "parent_entity_type": PARENT_TYPE,
-            "parent_entity_id": PARENT_ID,
-            "limit": LIMIT,
-            "offset": offset
+            "parent_entity_id": event_id,
+            "limit": self.limit,
+            "offset": offset,
         }
-        resp = requests.get(BASE_URL, params=params)
-        resp.raise_for_status()
-        page = resp.json()
+        if extra_params:
+            params.update(extra_params)
+        return self.get_json(COMMENTS_URL, params=params)
+
+    def iter_pages(self, event_id, start_offset=0, extra_params=None, concurrency=None):
+        """
+        Yield (offset, page) in offset order until an empty page is returned,
+        keeping `concurrency` page requests in flight.
+        """
+        concurrency = max(1, concurrency or self.concurrency)
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            in_flight = deque()
+            next_offset = start_offset
+
+            def submit():
+                nonlocal next_offset
+                in_flight.append((next_offset, pool.submit(self.fetch_page, event_id, next_offset, extra_params)))
+                next_offset += self.limit
 
-        if not page:
-            break
+            for _ in range(concurrency):
+                submit()
+
+            try:
+                while in_flight:
+                    offset, future = in_flight.popleft()
+                    page = future.result()
+                    if not page:
+                        break
+                    yield offset, page
+                    submit()
+            finally:
+                for _, future in in_flight:
+                    future.cancel()
+
+
+def _read_checkpoint(checkpoint_path, event_id):
+    """Return the offset to resume from, dropping a torn last line if any."""
+    if not os.path.exists(checkpoint_path):
+        return 0
+
+    next_offset = 0
+    valid_bytes = 0
+    with open(checkpoint_path, "rb") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            if record.get("event_id") != event_id:
+                break
+            next_offset = record["offset"] + len(record["comments"])
+            valid_bytes += len(line)
+
+    with open(checkpoint_path, "r+b") as f:
+        f.truncate(valid_bytes)
+    return next_offset
+
+
+def _write_output(checkpoint_path, output_path):
+    """Stream the checkpointed pages into the final JSON array (temp file + rename)."""
+    count = 0
+
+    def write_array(dst):
+        nonlocal count
+        with open(checkpoint_path, "r", encoding="utf-8") as src:
+            dst.write("[")
+            for line in src:
+                for c in json.loads(line)["comments"]:
+                    item = {"body": c.get("body", "")}
+                    dst.write(",\n    " if count else "\n    ")
+                    dst.write(json.dumps(item, ensure_ascii=False))
+                    count += 1
+            dst.write("\n]" if count else "]")
+
+    atomic_write(output_path, write_array)
+    return count
+
+
+def get_event_id(link, fetcher=None):
+    """Resolve a Polymarket event link (or slug) to its Gamma event id."""
+    fetcher = fetcher or CommentFetcher()
+
+    event_slug = link.split("?")[0].rstrip("/").split("/")[-1]
+    slug_data = event_cache.get(
+        event_slug,
+        lambda slug: fetcher.get_json(f"{GAMMA_BASE_URL}/events/slug/{slug}"),
+        namespace="comments",  # raw Gamma payloads, not the summarizer's checked events
+    )
+    return slug_data.get("id")
+
+
+def getComments(link, output_path=OUTPUT_PATH, fetcher=None, resume=True):
+    fetcher = fetcher or CommentFetcher()
+
+    PARENT_ID = get_event_id(link, fetcher)
+
+    if not PARENT_ID:
+        print("Failed to extract event ID from slug API.")
+        return
 
-        all_comments.extend(page)
-        offset += LIMIT
-        time.sleep(0.2)
+    # Every page is appended to the checkpoint as soon as it arrives, so an
+    # interrupted crawl picks up at the next offset instead of offset 0.
+    checkpoint_path = f"{output_path}.{PARENT_ID}.partial.jsonl"
+    start_offset = _read_checkpoint(checkpoint_path, PARENT_ID) if resume else 0
+    if start_offset:
+        print(f"Resuming comment crawl for event {PARENT_ID} at offset {start_offset}")
 
-    filtered = [{"body": c.get("body", "")} for c in all_comments]
+    with open(checkpoint_path, "a" if start_offset else "w", encoding="utf-8") as checkpoint:
+        for offset, page in fetcher.iter_pages(PARENT_ID, start_offset=start_offset):
+            record = {"event_id": PARENT_ID, "offset": offset, "comments": page}
+            checkpoint.write(json.dumps(record, ensure_ascii=False) + "\n")
+            checkpoint.flush()
 
-    with open(OUTPUT_PATH, "w", encoding="utf-8") as f:
-        json.dump(filtered, f, indent=4, ensure_ascii=False)
+    count = _write_output(checkpoint_path, output_path)
+    os.remove(checkpoint_path)
 
-    print(f"Saved {len(filtered)} comments → {OUTPUT_PATH}")
\ No newline at end of file
+    print(f"Saved {count} comments → {output_path}")
+    return output_path
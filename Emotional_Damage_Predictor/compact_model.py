@@ -0,0 +1,295 @@
+"""
+Compact, memory-mappable artifact for the TF-IDF + linear comment classifier.
+
+    comment_classifier.compact/manifest.json            config, classes, file names
+    comment_classifier.compact/<prefix>-vocab_hashes.npy  sorted uint64 FNV-1a hashes of the terms
+    comment_classifier.compact/<prefix>-vocab_columns.npy feature column of each hash
+    comment_classifier.compact/<prefix>-idf.npy
+    comment_classifier.compact/<prefix>-coef.npy          (n_classes or 1, n_features)
+    comment_classifier.compact/<prefix>-intercept.npy
+
+Arrays are opened with mmap_mode="r", so loading is a few page mappings and
+every worker process shares the same pages through the page cache.
+CompactClassifier only needs NumPy (no sklearn import, no unpickling).
+"""
+import json
+import os
+import re
+import uuid
+
+import numpy as np
+
+from event_storage import atomic_write
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+COMPACT_MODEL_DIR = os.path.join(BASE_DIR, "comment_classifier.compact")
+FORMAT_VERSION = 1
+ARRAYS = ("vocab_hashes", "vocab_columns", "idf", "coef", "intercept")
+
+FNV_OFFSET = np.uint64(0xCBF29CE484222325)
+FNV_PRIME = np.uint64(0x100000001B3)
+
+
+def manifest_path(directory=COMPACT_MODEL_DIR):
+    return os.path.join(directory, "manifest.json")
+
+
+def hash_terms(terms):
+    """
+    64-bit FNV-1a of each term's UTF-8 bytes, vectorized over all terms: the
+    terms are sorted by length and byte j is folded into every term that is
+    longer than j, so the work is proportional to the total number of bytes.
+    """
+    if not terms:
+        return np.empty(0, dtype=np.uint64)
+    encoded = [t.encode("utf-8") for t in terms]
+    lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+    order = np.argsort(-lengths, kind="stable")
+    sorted_lengths = lengths[order]
+    data = np.frombuffer(b"".join([encoded[i] for i in order]), dtype=np.uint8).astype(np.uint64)
+    starts = np.concatenate(([0], np.cumsum(sorted_lengths)[:-1]))
+
+    hashes = np.full(len(terms), FNV_OFFSET, dtype=np.uint64)
+    descending = -sorted_lengths
+    for j in range(int(sorted_lengths[0])):
+        active = int(np.searchsorted(descending, -j, side="left"))  # terms longer than j
+        hashes[:active] = (hashes[:active] ^ data[starts[:active] + j]) * FNV_PRIME
+
+    out = np.empty_like(hashes)
+    out[order] = hashes
+    return out
+
+
+class CompactClassifier:
+    """NumPy inference for an exported TF-IDF + linear model (predict / predict_proba / classes_)."""
+
+    def __init__(self, directory=COMPACT_MODEL_DIR, manifest=None):
+        # `manifest` lets export_compact() check arrays before publishing them
+        if manifest is None:
+            with open(manifest_path(directory), "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        self.directory = directory
+        self.manifest = manifest
+        if self.manifest.get("format") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported compact model format {self.manifest.get('format')}")
+
+        m = self.manifest
+        arrays = {name: np.load(os.path.join(directory, m["files"][name]), mmap_mode="r") for name in ARRAYS}
+        self.vocab_hashes = arrays["vocab_hashes"]
+        self.vocab_columns = arrays["vocab_columns"]
+        self.idf = arrays["idf"]
+        self.coef = arrays["coef"]
+        self.intercept = arrays["intercept"]
+        self.classes_ = np.array(m["classes"])
+
+        self._token_re = re.compile(m["token_pattern"])
+        self._lowercase = m["lowercase"]
+        self._min_n, self._max_n = m["ngram_range"]
+
+    def __reduce__(self):
+        # Pickle as a reference to the files (e.g. for classifier pool
+        # workers), so every process maps the same arrays instead of a copy
+        return CompactClassifier, (self.directory, self.manifest)
+
+    # ----- Features -----
+
+    def _analyze(self, text):
+        if self._lowercase:
+            text = text.lower()
+        tokens = self._token_re.findall(text)
+        if self._max_n == 1:
+            return tokens
+        terms = tokens if self._min_n == 1 else []
+        for n in range(max(2, self._min_n), self._max_n + 1):
+            terms.extend(" ".join(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+        return terms
+
+    def _features(self, bodies):
+        """Sparse TF-IDF rows as (doc, column, value) triples."""
+        doc_ids, term_ids, terms = [], [], {}
+        for doc, text in enumerate(bodies):
+            for term in self._analyze(text):
+                doc_ids.append(doc)
+                term_ids.append(terms.setdefault(term, len(terms)))
+
+        hashes = hash_terms(list(terms))
+        pos = np.minimum(np.searchsorted(self.vocab_hashes, hashes), max(len(self.vocab_hashes) - 1, 0))
+        found = self.vocab_hashes[pos] == hashes
+        column_of_term = np.where(found, self.vocab_columns[pos], -1)
+
+        columns = column_of_term[np.asarray(term_ids, dtype=np.int64)]
+        keep = columns >= 0
+        n_features = len(self.idf)
+        pairs = np.asarray(doc_ids, dtype=np.int64)[keep] * n_features + columns[keep]
+        pairs, counts = np.unique(pairs, return_counts=True)
+        docs, columns = pairs // n_features, pairs % n_features
+
+        m = self.manifest
+        values = np.ones(len(counts)) if m["binary"] else counts.astype(np.float64)
+        if m["sublinear_tf"]:
+            values = 1.0 + np.log(values)
+        if m["use_idf"]:
+            values = values * self.idf[columns]
+        if m["norm"]:
+            weight = values * values if m["norm"] == "l2" else np.abs(values)
+            norms = np.bincount(docs, weights=weight, minlength=len(bodies))
+            if m["norm"] == "l2":
+                norms = np.sqrt(norms)
+            norms[norms == 0] = 1.0
+            values = values / norms[docs]
+        return docs, columns, values
+
+    # ----- Inference -----
+
+    def decision_function(self, bodies):
+        bodies = list(bodies)
+        docs, columns, values = self._features(bodies)
+        scores = np.empty((len(bodies), self.coef.shape[0]))
+        for k in range(self.coef.shape[0]):
+            scores[:, k] = np.bincount(docs, weights=values * self.coef[k, columns], minlength=len(bodies))
+        return scores + self.intercept
+
+    def predict_proba(self, bodies):
+        scores = self.decision_function(bodies)
+        proba = self.manifest["proba"]
+        if proba == "binary":
+            p = 1.0 / (1.0 + np.exp(-scores[:, 0]))
+            return np.column_stack([1.0 - p, p])
+        if proba == "ovr":
+            p = 1.0 / (1.0 + np.exp(-scores))
+            return p / p.sum(axis=1, keepdims=True)
+        scores = scores - scores.max(axis=1, keepdims=True)
+        p = np.exp(scores)
+        return p / p.sum(axis=1, keepdims=True)
+
+    def predict(self, bodies):
+        return self.classes_[self.predict_proba(bodies).argmax(axis=1)]
+
+
+# ----- Export -----
+
+def _check_exportable(vectorizer, clf):
+    if not hasattr(vectorizer, "vocabulary_") or not hasattr(vectorizer, "idf_"):
+        raise ValueError(f"{type(vectorizer).__name__} is not a fitted TfidfVectorizer")
+    if not hasattr(clf, "coef_") or not hasattr(clf, "intercept_"):
+        raise ValueError(f"{type(clf).__name__} is not a linear classifier")
+    if vectorizer.analyzer != "word" or callable(vectorizer.analyzer):
+        raise ValueError("only word analyzers are supported")
+    for option in ("preprocessor", "tokenizer", "strip_accents", "stop_words"):
+        if getattr(vectorizer, option) is not None:
+            raise ValueError(f"vectorizer option {option} is not supported")
+    if re.compile(vectorizer.token_pattern).groups > 1:
+        raise ValueError("token_pattern may have at most one capture group")
+
+
+def _proba_kind(clf, n_rows):
+    if n_rows == 1:
+        return "binary"
+    if type(clf).__name__ == "LogisticRegression":
+        if getattr(clf, "multi_class", "auto") == "ovr" or clf.solver == "liblinear":
+            return "ovr"
+        return "softmax"
+    return "ovr"  # SGDClassifier(log_loss) and other one-vs-rest models
+
+
+def _probe_texts(terms, n=200, seed=0):
+    rng = np.random.RandomState(seed)
+    picks = rng.randint(0, len(terms), size=(n, 8))
+    return [" ".join(terms[i] for i in row) + " unknownterm" for row in picks]
+
+
+def export_compact(model, directory=COMPACT_MODEL_DIR, tolerance=1e-6):
+    """
+    Export a fitted Pipeline([("tfidf", TfidfVectorizer), ("clf", linear model)])
+    and check it against the pipeline on probe texts. Raises ValueError for
+    pipelines this format cannot represent.
+    """
+    steps = getattr(model, "steps", None)
+    if not steps or len(steps) != 2:
+        raise ValueError("expected a two-step (vectorizer, classifier) pipeline")
+    vectorizer, clf = steps[0][1], steps[1][1]
+    _check_exportable(vectorizer, clf)
+
+    terms = list(vectorizer.vocabulary_)
+    hashes = hash_terms(terms)
+    columns = np.fromiter((vectorizer.vocabulary_[t] for t in terms), dtype=np.int64, count=len(terms))
+    order = np.argsort(hashes)
+    hashes, columns = hashes[order], columns[order]
+    if len(np.unique(hashes)) != len(hashes):
+        raise ValueError("term hash collision in the vocabulary")
+
+    coef = np.ascontiguousarray(clf.coef_, dtype=np.float64)
+    prefix = uuid.uuid4().hex[:12]
+    arrays = {
+        "vocab_hashes": hashes,
+        "vocab_columns": columns,
+        "idf": np.asarray(vectorizer.idf_, dtype=np.float64),
+        "coef": coef,
+        "intercept": np.asarray(clf.intercept_, dtype=np.float64),
+    }
+    manifest = {
+        "format": FORMAT_VERSION,
+        "kind": "tfidf-linear",
+        "classes": [str(c) for c in clf.classes_],
+        "proba": _proba_kind(clf, coef.shape[0]),
+        "lowercase": bool(vectorizer.lowercase),
+        "token_pattern": vectorizer.token_pattern,
+        "ngram_range": list(vectorizer.ngram_range),
+        "binary": bool(vectorizer.binary),
+        "sublinear_tf": bool(vectorizer.sublinear_tf),
+        "use_idf": bool(vectorizer.use_idf),
+        "norm": vectorizer.norm,
+        "n_features": len(arrays["idf"]),
+        "files": {name: f"{prefix}-{name}.npy" for name in ARRAYS},
+    }
+
+    os.makedirs(directory, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(directory, manifest["files"][name]), array)
+
+    # Check the arrays against the pipeline before publishing the manifest
+    try:
+        compact = CompactClassifier(directory, manifest)
+        probe = _probe_texts(terms) if terms else ["empty"]
+        diff = float(np.abs(compact.predict_proba(probe) - model.predict_proba(probe)).max())
+        if diff > tolerance:
+            raise ValueError(f"compact model differs from the pipeline by {diff:.2e}")
+    except Exception:
+        for name in manifest["files"].values():
+            os.remove(os.path.join(directory, name))
+        raise
+
+    previous = _published_files(directory)
+    atomic_write(manifest_path(directory), lambda f: json.dump(manifest, f, indent=2))
+    # The previous generation stays until the next export: a CompactClassifier
+    # loaded from it shortly before may still be pickled to (and re-opened in)
+    # classifier pool workers.
+    _remove_stale_arrays(directory, keep=set(manifest["files"].values()) | previous)
+    return manifest_path(directory)
+
+
+def _published_files(directory):
+    try:
+        with open(manifest_path(directory), "r", encoding="utf-8") as f:
+            return set(json.load(f)["files"].values())
+    except (OSError, ValueError, KeyError):
+        return set()
+
+
+def _remove_stale_arrays(directory, keep):
+    # Processes still mapping old arrays keep their pages (POSIX unlink);
+    # where the OS refuses, the files are retried on the next export.
+    for name in os.listdir(directory):
+        if name.endswith(".npy") and name not in keep:
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+
+
+def remove_compact(directory=COMPACT_MODEL_DIR):
+    """Unpublish the compact artifact (e.g. when the current model cannot be exported)."""
+    if os.path.exists(manifest_path(directory)):
+        unpublished = _published_files(directory)  # removed by the next export, see export_compact()
+        os.remove(manifest_path(directory))
+        _remove_stale_arrays(directory, keep=unpublished)
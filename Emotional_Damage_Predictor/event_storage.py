@@ -0,0 +1,124 @@
+import datetime as dt
+import glob
+import json
+import os
+import tempfile
+import uuid
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+
+# data/<event_id>/comments.jsonl        comment store (append-only; last "_meta" line wins)
+# data/<event_id>/comments.jsonl.lock   held while a request syncs / labels the event
+# data/<event_id>/labeled/*.jsonl       labeled batches waiting for upload
+# data/<event_id>/uploading/*.jsonl     batches claimed by an upload job
+# data/<event_id>/uploaded/*.jsonl      batches already uploaded to Snowflake
+
+
+def event_dir(event_id, data_dir=DATA_DIR):
+    return os.path.join(data_dir, str(event_id))
+
+
+def comments_path(event_id, data_dir=DATA_DIR):
+    return os.path.join(event_dir(event_id, data_dir), "comments.jsonl")
+
+
+def atomic_write(path, write_fn):
+    """
+    Write `path` through a uniquely named temp file in the same directory and
+    rename it into place, so concurrent writers never interleave and readers
+    only ever see complete files.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", suffix=".part", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            write_fn(f)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
+
+
+def write_jsonl(path, rows):
+    def write_rows(f):
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False))
+            f.write("\n")
+
+    return atomic_write(path, write_rows)
+
+
+def append_jsonl(path, rows):
+    """
+    Append rows to `path` in one write. A line torn by an earlier crash is
+    closed off first, so it never swallows the first appended row.
+    """
+    data = "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows).encode("utf-8")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "ab+") as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell() > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                data = b"\n" + data
+        f.write(data)
+    return path
+
+
+def read_jsonl(path, skip_torn=False):
+    """Yield the rows of `path`; with `skip_torn`, lines cut off by a crash are skipped."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                if not skip_torn:
+                    raise
+
+
+def write_labeled_batch(event_id, rows, data_dir=DATA_DIR):
+    """
+    Store newly labeled comments of one event as a new, uniquely named batch
+    file. Batches never overwrite each other, so any number of requests (or
+    worker processes) can write at once.
+    """
+    stamp = dt.datetime.now(dt.timezone.utc).strftime("%Y%m%dT%H%M%S")
+    name = f"{stamp}-{uuid.uuid4().hex[:8]}.jsonl"
+    path = os.path.join(event_dir(event_id, data_dir), "labeled", name)
+    return write_jsonl(path, rows)
+
+
+def pending_labeled_batches(data_dir=DATA_DIR):
+    return sorted(glob.glob(os.path.join(data_dir, "*", "labeled", "*.jsonl")))
+
+
+def _move_batch(batch_path, folder):
+    event_path = os.path.dirname(os.path.dirname(batch_path))
+    target_dir = os.path.join(event_path, folder)
+    os.makedirs(target_dir, exist_ok=True)
+    target = os.path.join(target_dir, os.path.basename(batch_path))
+    os.replace(batch_path, target)
+    return target
+
+
+def claim_batch(batch_path):
+    """
+    Take a pending batch for upload by renaming it into `uploading/`.
+    Returns None if another worker claimed it first.
+    """
+    try:
+        return _move_batch(batch_path, "uploading")
+    except FileNotFoundError:
+        return None
+
+
+def finish_batch(claimed_path, uploaded):
+    """Move a claimed batch to `uploaded/`, or back to `labeled/` on failure."""
+    return _move_batch(claimed_path, "uploaded" if uploaded else "labeled")
@@ -1,19 +1,33 @@
 import os
 import json
-import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from dotenv import load_dotenv
-from google import genai
 
+from commentsReceiver import RateLimiter
+from event_storage import atomic_write
+from label_cache import GEMINI_NAMESPACE, content_key, label_cache
+
+BATCH_SIZE = 20
+INPUT_PATH = "./data.json"           # raw comments
+OUTPUT_PATH = "./data_labeled.json"  # labeled file (written once, at the end)
+VALID_LABELS = {"EMOTIONAL", "RATIONAL", "SPAM"}
+MAX_ATTEMPTS = 3                     # per comment, before it is left unlabeled
+
+CONCURRENCY = int(os.environ.get("GEMINI_LABEL_CONCURRENCY", "4"))
+RATE_LIMIT = float(os.environ.get("GEMINI_LABEL_RATE", "2"))  # Gemini calls per second
 
-def geminiAutoClassifier():
-    load_dotenv()
 
-    api_key = os.getenv("GOOGLE_API_KEY")
-    client = genai.Client(api_key=api_key)
+def journal_path(output_path):
+    return output_path + ".journal.jsonl"
 
-    BATCH_SIZE = 20
-    INPUT_PATH = "./data.json"           # raw comments
-    OUTPUT_PATH = "./data_labeled.json"  # progressive labeled file
+
+def make_gemini_labeler(model="gemini-2.5-flash"):
+    """Return label_fn(batch) -> parsed Gemini results for a batch of {"idx", "body"}."""
+    from google import genai
+
+    load_dotenv()
+    client = genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
 
     def gemini_label_classifier(batch):
         """Automatic label classifier to have data for training our own model"""
@@ -21,8 +35,9 @@ def geminiAutoClassifier():
         batch_json = json.dumps(batch, ensure_ascii=False)
         prompt = f"""
         You are a strict comment classifier. You will receive an array of JSON objects, each with:
+            - "idx": an identifier you must copy to your answer unchanged
             - "body": the comment text
-        
+
         For EACH comment, classify it as exactly ONE of:
             - "EMOTIONAL"
             - "RATIONAL"
@@ -35,9 +50,10 @@ def geminiAutoClassifier():
 
         IMPORTANT:
         - Output MUST be valid JSON ONLY, no extra text.
+        - Return one object per input comment, with the same "idx".
         - Output format:
           [
-            {{"message": <comment_text>, "label": "EMOTIONAL" | "RATIONAL" | "SPAM"}},
+            {{"idx": <idx>, "label": "EMOTIONAL" | "RATIONAL" | "SPAM"}},
             ...
           ]
 
@@ -46,7 +62,7 @@ def geminiAutoClassifier():
         """
 
         resp = client.models.generate_content(
-            model="gemini-2.5-flash",
+            model=model,
             contents=prompt,
             config={"response_mime_type": "application/json"},
         )
@@ -58,46 +74,170 @@ def geminiAutoClassifier():
             raise ValueError(f"Failed to parse JSON from Gemini: {raw_text[:500]}")
         return parsed
 
-    # Load existing labeled file if it exists, otherwise start from raw data
-    if os.path.exists(OUTPUT_PATH):
-        with open(OUTPUT_PATH, "r", encoding="utf-8") as f:
-            all_comments = json.load(f)
-        print(f"Loaded {len(all_comments)} comments from {OUTPUT_PATH}")
-    else:
-        with open(INPUT_PATH, "r", encoding="utf-8") as f:
-            all_comments = json.load(f)
-        print(f"Loaded {len(all_comments)} comments from {INPUT_PATH}")
-
-    # Loop until no unlabeled comments remain
-    while True:
-        batch = []
-
-        for idx, item in enumerate(all_comments):
-            if "label" in item and item["label"]:
-                continue
+    return gemini_label_classifier
 
-            body = item.get("body", "")
-            batch.append({"idx": idx, "body": body})
 
-            if len(batch) == BATCH_SIZE:
-                break
-
-        if not batch:
-            print("\nNo unlabeled comments left — done!")
-            break
-
-        print(f"\nProcessing batch of {len(batch)} unlabeled comments starting at index {batch[0]['idx']}...")
-
-        results = gemini_label_classifier(batch)
-
-        for i, result in enumerate(results):
-            global_index = batch[i]["idx"]
-            if "label" not in all_comments[global_index] or not all_comments[global_index]["label"]:
-                all_comments[global_index]["label"] = result["label"]
-
-        with open(OUTPUT_PATH, "w", encoding="utf-8") as f:
-            json.dump(all_comments, f, indent=4, ensure_ascii=False)
-
-        time.sleep(0.2)
-
-    print(f"\nAll labeled comments saved to {OUTPUT_PATH}")
\ No newline at end of file
+def match_results(batch, results):
+    """
+    Map idx -> label for the results that name an idx from this batch and a
+    valid label. Positional order is never trusted.
+    """
+    wanted = {item["idx"] for item in batch}
+    labels = {}
+    for result in results if isinstance(results, list) else []:
+        if not isinstance(result, dict):
+            continue
+        try:
+            idx = int(result.get("idx"))
+        except (TypeError, ValueError):
+            continue
+        label = str(result.get("label", "")).strip().upper()
+        if idx in wanted and label in VALID_LABELS:
+            labels[idx] = label
+    return labels
+
+
+def load_comments(input_path, output_path):
+    """Labeled file if present (else raw input), with any journaled labels replayed on top."""
+    source = output_path if os.path.exists(output_path) else input_path
+    with open(source, "r", encoding="utf-8") as f:
+        all_comments = json.load(f)
+    print(f"Loaded {len(all_comments)} comments from {source}")
+
+    journal = journal_path(output_path)
+    replayed = 0
+    if os.path.exists(journal):
+        with open(journal, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    break  # torn last line of an interrupted run
+                idx = entry.get("idx")
+                if isinstance(idx, int) and 0 <= idx < len(all_comments) and not all_comments[idx].get("label"):
+                    all_comments[idx]["label"] = entry["label"]
+                    replayed += 1
+        print(f"Replayed {replayed} labels from {journal}")
+    return all_comments
+
+
+def compact(all_comments, output_path):
+    """Write the full labeled file once and drop the journal."""
+    atomic_write(output_path, lambda f: json.dump(all_comments, f, indent=4, ensure_ascii=False))
+    journal = journal_path(output_path)
+    if os.path.exists(journal):
+        os.remove(journal)
+
+
+def geminiAutoClassifier(
+    input_path=INPUT_PATH,
+    output_path=OUTPUT_PATH,
+    batch_size=BATCH_SIZE,
+    concurrency=CONCURRENCY,
+    rate=RATE_LIMIT,
+    label_fn=None,
+    cache=label_cache,
+):
+    """
+    Label every comment without a label.
+
+    Unlabeled comments are grouped by normalized body: labels already in the
+    label cache are applied straight away, and only one comment per remaining
+    group goes into the queue. Batches are popped from it and sent to Gemini
+    concurrently under a shared rate limiter; a label is applied to the whole
+    group and cached. Each label is appended to a journal (so an interrupted
+    run resumes where it stopped) and the labeled JSON file is rewritten once
+    at the end.
+    """
+    concurrency = max(1, concurrency)  # 0 (e.g. from the environment) would never submit a batch
+    label_fn = label_fn or make_gemini_labeler()
+    limiter = RateLimiter(rate)
+
+    all_comments = load_comments(input_path, output_path)
+    groups = {}  # content key -> indices of unlabeled comments with that body
+    for idx, item in enumerate(all_comments):
+        if not item.get("label"):
+            groups.setdefault(content_key(item.get("body", "")), []).append(idx)
+    group_of = {members[0]: members for members in groups.values()}
+
+    attempts = {}
+    stats = {"labeled": 0, "cache_hits": 0, "deduplicated": 0, "requeued": 0, "failed_calls": 0, "gave_up": 0}
+    journal = open(journal_path(output_path), "a", encoding="utf-8")
+
+    def apply_label(idx, label):
+        for member in group_of[idx]:
+            all_comments[member]["label"] = label
+            journal.write(json.dumps({"idx": member, "label": label}) + "\n")
+        stats["labeled"] += len(group_of[idx])
+
+    representatives = list(group_of)
+    cached = [None] * len(representatives)
+    if cache is not None:
+        cached = cache.get_many(GEMINI_NAMESPACE, [all_comments[idx].get("body", "") for idx in representatives])
+    queue = deque()
+    for idx, hit in zip(representatives, cached):
+        if hit is not None and hit["label"] in VALID_LABELS:
+            apply_label(idx, hit["label"])
+            stats["cache_hits"] += len(group_of[idx])
+        else:
+            queue.append(idx)
+            stats["deduplicated"] += len(group_of[idx]) - 1
+    journal.flush()
+    print(f"{stats['cache_hits']} comments labeled from cache, {len(queue)} unique comments queued")
+
+    def next_batch():
+        batch = []
+        while queue and len(batch) < batch_size:
+            idx = queue.popleft()
+            batch.append({"idx": idx, "body": all_comments[idx].get("body", "")})
+        return batch
+
+    def call(batch):
+        limiter.acquire()
+        return label_fn(batch)
+
+    def requeue(idx):
+        attempts[idx] = attempts.get(idx, 0) + 1
+        if attempts[idx] >= MAX_ATTEMPTS:
+            stats["gave_up"] += len(group_of[idx])
+        else:
+            queue.append(idx)
+            stats["requeued"] += 1
+
+    with journal, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        in_flight = {}
+
+        while queue or in_flight:
+            while queue and len(in_flight) < concurrency:
+                batch = next_batch()
+                in_flight[pool.submit(call, batch)] = batch
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                batch = in_flight.pop(future)
+                try:
+                    labels = match_results(batch, future.result())
+                except Exception as e:
+                    print(f"Batch starting at index {batch[0]['idx']} failed: {e}")
+                    stats["failed_calls"] += 1
+                    labels = {}
+
+                for idx, label in labels.items():
+                    apply_label(idx, label)
+                journal.flush()
+                if cache is not None and labels:
+                    cache.put_many(
+                        GEMINI_NAMESPACE,
+                        [all_comments[idx].get("body", "") for idx in labels],
+                        [{"label": label} for label in labels.values()],
+                    )
+
+                for item in batch:
+                    if item["idx"] not in labels:
+                        requeue(item["idx"])
+
+            print(f"Labeled {stats['labeled']}, {len(queue)} queued, {len(in_flight)} in flight")
+
+    compact(all_comments, output_path)
+    print(f"\nAll labeled comments saved to {output_path} ({json.dumps(stats)})")
+    return stats
@@ -0,0 +1,278 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+import zlib
+from contextlib import contextmanager
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+LABEL_CACHE_PATH = os.environ.get("LABEL_CACHE_PATH", os.path.join(BASE_DIR, "label_cache.sqlite3"))
+LABEL_CACHE_ENABLED = os.environ.get("LABEL_CACHE_ENABLED", "true").lower() == "true"
+# Near-duplicate matching (MinHash + LSH) is off unless asked for
+LABEL_CACHE_MINHASH = os.environ.get("LABEL_CACHE_MINHASH", "false").lower() == "true"
+NEAR_DUP_THRESHOLD = float(os.environ.get("LABEL_CACHE_NEAR_THRESHOLD", "0.85"))
+NEAR_DUP_MIN_CHARS = 20   # shorter texts only ever match exactly
+SHINGLE_SIZE = 4
+NUM_PERM = 64
+BANDS = 16                # 16 bands x 4 rows
+SQL_CHUNK = 500
+# model:<version> namespaces kept when the trainer evicts old ones; more than
+# one, so workers still serving the previous model keep their cache
+MODEL_NAMESPACES_KEPT = int(os.environ.get("LABEL_CACHE_MODEL_VERSIONS", "3"))
+
+GEMINI_NAMESPACE = "gemini"
+
+_EDGE_PUNCT = re.compile(r"^[\W_]+|[\W_]+$")
+
+_PRIME = np.uint64(4294967311)  # > 2**32
+_rng = np.random.RandomState(1)
+_PERM_A = _rng.randint(1, 2**31 - 1, size=NUM_PERM).astype(np.uint64)
+_PERM_B = _rng.randint(0, 2**31 - 1, size=NUM_PERM).astype(np.uint64)
+
+
+def model_namespace(version):
+    return f"model:{version}"
+
+
+def normalize_text(text):
+    """Case, Unicode form, whitespace and surrounding punctuation do not count."""
+    text = text or ""
+    if not text.isascii():  # NFKC leaves ASCII unchanged
+        text = unicodedata.normalize("NFKC", text)
+    text = " ".join(text.casefold().split())
+    if not text or (text[0].isalnum() and text[-1].isalnum()):
+        return text
+    stripped = _EDGE_PUNCT.sub("", text)
+    return stripped or text  # keep emoji / punctuation-only comments distinguishable
+
+
+def content_key(text):
+    return hashlib.blake2b(normalize_text(text).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def minhash_signature(normalized):
+    """NUM_PERM-long MinHash of the character shingles of a normalized text."""
+    shingles = {normalized[i:i + SHINGLE_SIZE] for i in range(max(1, len(normalized) - SHINGLE_SIZE + 1))}
+    hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+    return ((np.outer(hashes, _PERM_A) + _PERM_B) % _PRIME).min(axis=0)
+
+
+def band_keys(signature):
+    rows = NUM_PERM // BANDS
+    return [
+        f"{b}:{hashlib.blake2b(signature[b * rows:(b + 1) * rows].tobytes(), digest_size=8).hexdigest()}"
+        for b in range(BANDS)
+    ]
+
+
+class LabelCache:
+    """
+    Persistent (SQLite) label cache keyed on a hash of the normalized comment
+    text, in separate namespaces for Gemini labels ("gemini") and for each
+    local model version ("model:<version>").
+
+    With minhash=True, texts of at least NEAR_DUP_MIN_CHARS characters that
+    miss exactly are matched against stored near-duplicates through LSH
+    buckets and accepted at an estimated Jaccard similarity >= threshold.
+    """
+
+    def __init__(self, path=LABEL_CACHE_PATH, minhash=LABEL_CACHE_MINHASH, threshold=NEAR_DUP_THRESHOLD):
+        self.path = path
+        self.minhash = minhash
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._current_model = None
+        self._initialized = False  # the file is created on first use, not on import
+
+    @contextmanager
+    def _connect(self):
+        # Always called with self._lock held
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:  # commit / rollback
+                if not self._initialized:
+                    self._init_db(conn)
+                    self._initialized = True
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _init_db(conn):
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS labels (
+                namespace     TEXT NOT NULL,
+                key           TEXT NOT NULL,
+                label         TEXT NOT NULL,
+                probabilities TEXT,
+                signature     BLOB,
+                created       REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS lsh (
+                namespace TEXT NOT NULL,
+                band      TEXT NOT NULL,
+                key       TEXT NOT NULL,
+                PRIMARY KEY (namespace, band, key)
+            )
+            """
+        )
+
+    def _count(self, namespace, field, n=1):
+        ns = self._stats.setdefault(namespace, {"hits": 0, "near_hits": 0, "misses": 0, "writes": 0})
+        ns[field] += n
+
+    # ----- Lookups -----
+
+    def get_many(self, namespace, texts):
+        """Cached {"label", "probabilities"} per text (None on a miss), aligned with `texts`."""
+        normalized = [normalize_text(t) for t in texts]
+        keys = [content_key(t) for t in texts]
+        found = {}
+
+        with self._lock, self._connect() as conn:
+            unique = list(dict.fromkeys(keys))
+            for start in range(0, len(unique), SQL_CHUNK):
+                chunk = unique[start:start + SQL_CHUNK]
+                rows = conn.execute(
+                    f"SELECT key, label, probabilities FROM labels "
+                    f"WHERE namespace = ? AND key IN ({','.join('?' * len(chunk))})",
+                    [namespace, *chunk],
+                ).fetchall()
+                for key, label, probabilities in rows:
+                    found[key] = {"label": label, "probabilities": json.loads(probabilities) if probabilities else None}
+
+            near = {}
+            if self.minhash:
+                for key, norm in zip(keys, normalized):
+                    if key in found or key in near or len(norm) < NEAR_DUP_MIN_CHARS:
+                        continue
+                    match = self._near_lookup(conn, namespace, norm)
+                    if match is not None:
+                        near[key] = match
+
+            results = []
+            for key in keys:
+                if key in found:
+                    self._count(namespace, "hits")
+                    results.append(found[key])
+                elif key in near:
+                    self._count(namespace, "near_hits")
+                    results.append(near[key])
+                else:
+                    self._count(namespace, "misses")
+                    results.append(None)
+        return results
+
+    def _near_lookup(self, conn, namespace, normalized):
+        signature = minhash_signature(normalized)
+        bands = band_keys(signature)
+        candidates = conn.execute(
+            f"SELECT DISTINCT l.label, l.probabilities, l.signature FROM lsh "
+            f"JOIN labels l ON l.namespace = lsh.namespace AND l.key = lsh.key "
+            f"WHERE lsh.namespace = ? AND lsh.band IN ({','.join('?' * len(bands))})",
+            [namespace, *bands],
+        ).fetchall()
+
+        best, best_sim = None, self.threshold
+        for label, probabilities, blob in candidates:
+            similarity = float(np.mean(np.frombuffer(blob, dtype=np.uint64) == signature))
+            if similarity >= best_sim:
+                best_sim = similarity
+                best = {"label": label, "probabilities": json.loads(probabilities) if probabilities else None}
+        return best
+
+    # ----- Writes -----
+
+    def put_many(self, namespace, texts, results):
+        """Store {"label", "probabilities"} results for `texts` (first write wins)."""
+        now = time.time()
+        label_rows, lsh_rows = [], []
+        for text, result in zip(texts, results):
+            if not result or not result.get("label"):
+                continue
+            key = content_key(text)
+            signature = None
+            norm = normalize_text(text)
+            if self.minhash and len(norm) >= NEAR_DUP_MIN_CHARS:
+                sig = minhash_signature(norm)
+                signature = sig.tobytes()
+                lsh_rows.extend((namespace, band, key) for band in band_keys(sig))
+            probabilities = result.get("probabilities")
+            label_rows.append((
+                namespace,
+                key,
+                result["label"],
+                json.dumps(probabilities) if probabilities is not None else None,
+                signature,
+                now,
+            ))
+
+        if not label_rows:
+            return
+        with self._lock, self._connect() as conn:
+            cur = conn.executemany("INSERT OR IGNORE INTO labels VALUES (?, ?, ?, ?, ?, ?)", label_rows)
+            conn.executemany("INSERT OR IGNORE INTO lsh VALUES (?, ?, ?)", lsh_rows)
+            self._count(namespace, "writes", max(cur.rowcount, 0))
+
+    def use_model(self, version):
+        """
+        Namespace for a local model version. Nothing is deleted here: several
+        processes may be serving different versions from the same file, so old
+        namespaces are only dropped by evict_models().
+        """
+        namespace = model_namespace(version)
+        self._current_model = namespace
+        return namespace
+
+    def evict_models(self, keep=MODEL_NAMESPACES_KEPT):
+        """
+        Drop all but the `keep` most recently written model namespaces (the
+        Gemini namespace is never touched). Called by the trainer after it
+        publishes a new model; returns the evicted namespaces.
+        """
+        with self._lock, self._connect() as conn:
+            namespaces = [ns for ns, in conn.execute(
+                "SELECT namespace FROM labels WHERE namespace LIKE 'model:%' "
+                "GROUP BY namespace ORDER BY MAX(created) DESC"
+            ).fetchall()]
+            evicted = namespaces[max(keep, 0):]
+            for namespace in evicted:
+                conn.execute("DELETE FROM labels WHERE namespace = ?", (namespace,))
+                conn.execute("DELETE FROM lsh WHERE namespace = ?", (namespace,))
+        return evicted
+
+    def clear(self):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM labels")
+            conn.execute("DELETE FROM lsh")
+
+    def stats(self):
+        with self._lock, self._connect() as conn:
+            sizes = dict(conn.execute("SELECT namespace, COUNT(*) FROM labels GROUP BY namespace").fetchall())
+            per_ns = {ns: dict(s) for ns, s in self._stats.items()}
+
+        out = {}
+        for ns in sorted(set(sizes) | set(per_ns)):
+            s = per_ns.get(ns, {"hits": 0, "near_hits": 0, "misses": 0, "writes": 0})
+            lookups = s["hits"] + s["near_hits"] + s["misses"]
+            s["size"] = sizes.get(ns, 0)
+            s["hit_rate"] = (s["hits"] + s["near_hits"]) / lookups if lookups else 0.0
+            out[ns] = s
+        return out
+
+
+# Shared per-process label cache (None when disabled)
+label_cache = LabelCache() if LABEL_CACHE_ENABLED else None
@@ -1,9 +1,10 @@
-import joblib
 import json
 import math
 from commentsReceiver import getComments
 from upload_to_snowflake import upload_training_data
 from train_model_snowflake import train_model
+from model_registry import model_registry
+from classifier import label_comments
     
 INPUT_PATH = "./data.json"
 OUTPUT_PATH = "./data_labeled.json"
@@ -14,22 +15,8 @@ getComments(poly_event_link)
 with open(INPUT_PATH, "r", encoding="utf-8") as f:
        all_comments = json.load(f)
 
-model = joblib.load("comment_classifier.pkl")
-emotional_rate = 0
-rational_rate = 0
-
-for item in all_comments:
-    if "label" in item and item["label"]:
-           continue
-    else:
-            item["label"] = model.predict([item["body"]])[0]
-
-            if item["label"] == "EMOTIONAL":
-                    emotional_rate += 1
-            elif item["label"] == "RATIONAL":
-                    rational_rate += 1
-            else:
-                    continue      
+model, model_version = model_registry.get()
+emotional_rate, rational_rate = label_comments(all_comments, model=model, version=model_version)
 
 with open(OUTPUT_PATH, "w", encoding="utf-8") as f:
        json.dump(all_comments, f, indent=4)
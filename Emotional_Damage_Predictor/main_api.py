@@ -1,24 +1,113 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-import joblib
-import json
 import math
 import os
 
-from commentsReceiver import getComments
-from upload_to_snowflake import upload_training_data
-from train_model_snowflake import train_model
+from commentsReceiver import CommentFetcher, get_event_id
+from comment_store import event_lock, sync_event_comments
+from model_registry import MODEL_PATH, model_registry
+from classifier import label_comments
+from classifier_pool import classifier_pool
+from label_cache import label_cache
+from event_storage import write_labeled_batch
+from training_scheduler import TrainingScheduler
+from snowflake_session import TRAINING_DATA_SOURCE
+from upload_to_snowflake import upload_labeled_batches
+from event_cache import event_cache  # repo root is put on sys.path by commentsReceiver
 
-# --- PATHS RELATIVE TO THIS FILE ---
+app = Flask(__name__)
+CORS(app)
 
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Upload + retrain run in the background; the registry hot-swaps the new model.
+# All storage is per event with atomic renames, so this app can run with
+# several threads / worker processes.
+# With TRAINING_DATA_SOURCE=mirror, uploads and training use the local mirror
+# and Snowflake is only synced in the background (SNOWFLAKE_SYNC=true).
+if TRAINING_DATA_SOURCE == "mirror":
+    from training_mirror import SNOWFLAKE_SYNC, MirrorSync, training_mirror
+
+    training_scheduler = TrainingScheduler(
+        upload_fn=upload_labeled_batches,
+        session_factory=training_mirror.session,
+        on_trained=model_registry.refresh,
+    )
+    # not in classifier pool workers, which re-import this script as __mp_main__
+    mirror_sync = MirrorSync(training_mirror).start() if SNOWFLAKE_SYNC and __name__ != "__mp_main__" else None
+else:
+    training_scheduler = TrainingScheduler(
+        upload_fn=upload_labeled_batches,
+        on_trained=model_registry.refresh,
+    )
+    mirror_sync = None
+
+# One pooled Gamma client shared by all requests
+comment_fetcher = CommentFetcher()
+
+
+def analyze_event_url(event_url):
+    """Run the emotional/rational analysis for one event; returns (payload, status)."""
+    print("Received URL:", event_url)
 
-INPUT_PATH = os.path.join(BASE_DIR, "data.json")
-OUTPUT_PATH = os.path.join(BASE_DIR, "data_labeled.json")
-MODEL_PATH = os.path.join(BASE_DIR, "comment_classifier.pkl")
+    # 1) Resolve the event and sync only comments we have not stored yet
+    try:
+        event_id = get_event_id(event_url, fetcher=comment_fetcher)
+    except Exception as e:
+        return {"message": f"Failed to look up event: {e}"}, 502
+    if not event_id:
+        return {"message": "Failed to extract event ID from slug API."}, 502
+
+    # Steps 1-4 hold the event's lock: a concurrent /analyze of the same event
+    # waits, then finds these comments already stored and labeled
+    with event_lock(event_id):
+        store, new_comments = sync_event_comments(event_id, fetcher=comment_fetcher)
+
+        # 2) Get the resident model (loaded once, hot-swapped after retraining).
+        #    Holding this reference keeps the request on one model version.
+        try:
+            model, model_version = model_registry.get()
+        except FileNotFoundError:
+            return {"message": f"Model file {os.path.basename(MODEL_PATH)} not found."}, 500
+
+        # 3) Classify only the comments that still need a label, then fold them
+        #    into the event's running tallies (large backlogs are sharded across
+        #    the classifier worker processes when CLASSIFY_WORKERS > 1)
+        unlabeled = store.unlabeled()
+        label_comments(unlabeled, model=model, version=model_version)
+        store.record_labels(unlabeled)
+        store.save()
+
+        # 4) Save newly labeled comments as a training batch for this event;
+        #    retraining happens off the request path (debounced + coalesced)
+        if unlabeled:
+            write_labeled_batch(event_id, [{"body": c["body"], "label": c["label"]} for c in unlabeled])
+            training_scheduler.trigger(reason=f"{len(unlabeled)} new comments on {event_url}")
+
+    emotional_rate = store.tallies["EMOTIONAL"]
+    rational_rate = store.tallies["RATIONAL"]
+
+    # 5) Compute emotional vs rational result
+    final_rate = emotional_rate + rational_rate
+    if final_rate == 0:
+        final_msg = "Not enough usable comments to analyze this event."
+        return {"message": final_msg, "model_version": model_version}, 200
 
-app = Flask(__name__)
-CORS(app)
+    emotional_percent = (emotional_rate / final_rate) * 100
+    rational_percent = (rational_rate / final_rate) * 100
+
+    if emotional_percent > rational_percent:
+        final_msg = f"From comments provided it seems like the event might be based on Emotions: {math.ceil(emotional_percent)}%"
+    elif rational_percent > emotional_percent:
+        final_msg = f"From comments provided it seems like the event might be based on Rationalism: {math.ceil(rational_percent)}%"
+    else:
+        final_msg = "From comments provided it seems like the event is equally Emotional and Rational."
+
+    print("Final message:", final_msg, f"(model {model_version})")
+    return {
+        "message": final_msg,
+        "model_version": model_version,
+        "new_comments": len(new_comments),
+        "total_comments": len(store),
+    }, 200
 
 
 @app.route("/analyze", methods=["POST"])
@@ -27,73 +116,42 @@ def analyze_event():
     if not data or "url" not in data:
         return jsonify({"message": "Missing event URL"}), 400
 
-    event_url = data["url"]
-    print("Received URL:", event_url)
-
-    # 1) Get comments for this event (make sure commentsReceiver writes to INPUT_PATH)
-    getComments(event_url)
-
-    # 2) Load comments
-    if not os.path.exists(INPUT_PATH):
-        return jsonify({"message": "No comments file found after scraping."}), 500
-
-    with open(INPUT_PATH, "r", encoding="utf-8") as f:
-        all_comments = json.load(f)
-
-    # 3) Load model from the same folder as this file
-    if not os.path.exists(MODEL_PATH):
-        return jsonify({"message": "Model file comment_classifier.pkl not found."}), 500
+    payload, status = analyze_event_url(data["url"])
+    return jsonify(payload), status
 
-    model = joblib.load(MODEL_PATH)
 
-    emotional_rate = 0
-    rational_rate = 0
+@app.route("/cache/stats", methods=["GET"])
+def cache_stats():
+    return jsonify(event_cache.stats())
 
-    # 4) Classify comments
-    for item in all_comments:
-        # Skip already-labeled comments if any
-        if "label" in item and item["label"]:
-            continue
 
-        body = item.get("body", "")
-        if not body:
-            continue
+def label_cache_stats():
+    if label_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, "minhash": label_cache.minhash, "namespaces": label_cache.stats()}
 
-        prediction = model.predict([body])[0]
-        item["label"] = prediction
 
-        if prediction == "EMOTIONAL":
-            emotional_rate += 1
-        elif prediction == "RATIONAL":
-            rational_rate += 1
+@app.route("/label-cache/stats", methods=["GET"])
+def label_cache_stats_route():
+    return jsonify(label_cache_stats())
 
-    # 5) Save labeled comments
-    with open(OUTPUT_PATH, "w", encoding="utf-8") as f:
-        json.dump(all_comments, f, indent=4)
-
-    upload_training_data()
-    train_model() 
-
-    # 6) Compute emotional vs rational result
-    final_rate = emotional_rate + rational_rate
-    if final_rate == 0:
-        final_msg = "Not enough usable comments to analyze this event."
-        return jsonify({"message": final_msg})
 
-    emotional_percent = (emotional_rate / final_rate) * 100
-    rational_percent = (rational_rate / final_rate) * 100
+def training_status():
+    status = training_scheduler.status()
+    status["model_version"] = model_registry.version
+    status["data_source"] = TRAINING_DATA_SOURCE
+    status["classifier_pool"] = classifier_pool.status() if classifier_pool else {"enabled": False}
+    if TRAINING_DATA_SOURCE == "mirror":
+        status["mirror"] = training_mirror.status()
+        status["sync"] = mirror_sync.status() if mirror_sync else {"enabled": False}
+    return status
 
-    if emotional_percent > rational_percent:
-        final_msg = f"From comments provided it seems like the event might be based on Emotions: {math.ceil(emotional_percent)}%"
-    elif rational_percent > emotional_percent:
-        final_msg = f"From comments provided it seems like the event might be based on Rationalism: {math.ceil(rational_percent)}%"
-    else:
-        final_msg = "From comments provided it seems like the event is equally Emotional and Rational."
 
-    print("Final message:", final_msg)
-    return jsonify({"message": final_msg})
+@app.route("/train/status", methods=["GET"])
+def train_status():
+    return jsonify(training_status())
 
 
 if __name__ == "__main__":
     print("API running at http://127.0.0.1:5000")
-    app.run(port=5000)
\ No newline at end of file
+    app.run(port=5000, threaded=True)
\ No newline at end of file
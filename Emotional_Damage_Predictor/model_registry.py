@@ -0,0 +1,126 @@
+import datetime as dt
+import os
+import tempfile
+import threading
+import time
+
+import joblib
+
+from compact_model import COMPACT_MODEL_DIR, CompactClassifier, manifest_path
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(BASE_DIR, "comment_classifier.pkl")
+# "auto": the compact artifact when one is published, else the pickle
+MODEL_FORMAT = os.getenv("MODEL_FORMAT", "auto")  # auto | pickle | compact
+
+
+def save_model(model, path=MODEL_PATH):
+    """
+    Dump a trained pipeline next to the old one and swap it in with a rename,
+    so readers never see a half-written pickle.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".model-", suffix=".tmp", dir=directory)
+    os.close(fd)
+    try:
+        joblib.dump(model, tmp_path)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
+
+
+class ModelRegistry:
+    """
+    Keeps the comment classifier resident in memory.
+
+    The model file's mtime/size is checked at most every `check_interval`
+    seconds; when it changes, the new pipeline is loaded and swapped in as a
+    single (model, version) tuple. Callers that already hold the old tuple keep
+    using the old model until they ask again.
+
+    The model file is the compact artifact's manifest (memory-mapped NumPy
+    arrays, no sklearn needed) when one is published, else the joblib pickle.
+    """
+
+    def __init__(self, model_path=MODEL_PATH, check_interval=1.0, compact_dir=COMPACT_MODEL_DIR, model_format=MODEL_FORMAT):
+        self.model_path = model_path
+        self.compact_dir = compact_dir
+        self.model_format = model_format
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._current = None   # (model, version)
+        self._stamp = None     # (mtime_ns, size) of the loaded file
+        self._last_check = 0.0
+
+    def _artifact(self):
+        """(path to watch, loader) for the model format in use."""
+        compact_manifest = manifest_path(self.compact_dir)
+        if self.model_format == "compact" or (self.model_format == "auto" and os.path.exists(compact_manifest)):
+            return compact_manifest, lambda path: CompactClassifier(self.compact_dir)
+        return self.model_path, joblib.load
+
+    def _file_stamp(self, path):
+        st = os.stat(path)
+        return st.st_mtime_ns, st.st_size
+
+    @staticmethod
+    def _version_from_stamp(stamp):
+        # Full nanosecond mtime: two retrains within one second that happen to
+        # produce the same file size must still get different versions
+        mtime_ns, size = stamp
+        seconds, nanos = divmod(mtime_ns, 1_000_000_000)
+        loaded = dt.datetime.fromtimestamp(seconds, tz=dt.timezone.utc)
+        return f"{loaded.strftime('%Y%m%dT%H%M%S')}.{nanos:09d}-{size}"
+
+    def get(self):
+        """
+        Return (model, version).
+
+        Raises FileNotFoundError if no model has ever been loaded and the
+        model file does not exist.
+        """
+        current = self._current
+        if current is not None and time.monotonic() - self._last_check < self.check_interval:
+            return current
+        return self.refresh()
+
+    def refresh(self, force=False):
+        """Re-check the model file and load it if it changed (or if force=True)."""
+        with self._lock:
+            self._last_check = time.monotonic()
+            path, loader = self._artifact()
+            try:
+                stamp = self._file_stamp(path)
+            except FileNotFoundError:
+                if self._current is None:
+                    raise
+                return self._current
+
+            if not force and self._current is not None and stamp == self._stamp:
+                return self._current
+
+            try:
+                model = loader(path)
+            except Exception:
+                # Keep serving the previous model if the new file is unreadable
+                if self._current is None:
+                    raise
+                print(f"Failed to load {path}, keeping model {self._current[1]}")
+                return self._current
+
+            self._stamp = stamp
+            self._current = (model, self._version_from_stamp(stamp))
+            print(f"Loaded comment classifier version {self._current[1]}")
+            return self._current
+
+    @property
+    def version(self):
+        current = self._current
+        return current[1] if current is not None else None
+
+
+# Shared per-process registry
+model_registry = ModelRegistry()
@@ -0,0 +1,140 @@
+import os
+import threading
+import time
+from dotenv import load_dotenv
+import pandas as pd
+
+# Where training reads / uploads write labeled rows: "snowflake" (directly) or
+# "mirror" (the local columnar mirror, see training_mirror.py; Snowflake is
+# then only touched by the optional background sync).
+TRAINING_DATA_SOURCE = os.getenv("TRAINING_DATA_SOURCE", "snowflake")
+SESSION_MAX_AGE_SECONDS = float(os.getenv("SNOWFLAKE_SESSION_MAX_AGE", "3600"))
+
+
+def get_connection_parameters():
+    """Read Snowflake connection settings from the environment / .env."""
+    load_dotenv()
+
+    return {
+        "account":   os.getenv("SNOW_ACCOUNT"),
+        "user":      os.getenv("SNOW_USER"),
+        "password":  os.getenv("SNOW_PASSWORD"),
+        "role":      os.getenv("SNOW_ROLE"),
+        "warehouse": os.getenv("SNOW_WAREHOUSE"),
+        "database":  os.getenv("SNOW_DATABASE"),
+        "schema":    os.getenv("SNOW_SCHEMA"),
+    }
+
+
+def create_session():
+    """Open a new Snowpark session."""
+    # imported lazily so offline code paths don't need the Snowpark package
+    from snowflake.snowpark import Session
+
+    return Session.builder.configs(get_connection_parameters()).create()
+
+
+class _PooledSession:
+    """Handle to the pooled session: close() leaves the session open for the next user."""
+
+    def __init__(self, session):
+        self._session = session
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+    def close(self):
+        pass
+
+
+class SessionPool:
+    """
+    One long-lived Snowpark session shared by background jobs, instead of a
+    new connection per job. The session is re-created after `max_age`
+    seconds, or on the next get() after invalidate() (call it when a job
+    using the session failed).
+    """
+
+    def __init__(self, factory=create_session, max_age=SESSION_MAX_AGE_SECONDS):
+        self.factory = factory
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._session = None
+        self._created = 0.0
+
+    def get(self):
+        with self._lock:
+            if self._session is not None and time.monotonic() - self._created > self.max_age:
+                self._close()
+            if self._session is None:
+                self._session = self.factory()
+                self._created = time.monotonic()
+            return _PooledSession(self._session)
+
+    def invalidate(self):
+        with self._lock:
+            self._close()
+
+    def _close(self):
+        if self._session is not None:
+            try:
+                self._session.close()
+            except Exception as e:
+                print(f"Closing pooled Snowflake session failed: {e}")
+            self._session = None
+
+    close = invalidate
+
+
+# Shared per-process pool
+session_pool = SessionPool()
+
+
+class LocalTable:
+    """Minimal stand-in for a Snowpark table (only what the pipeline uses)."""
+
+    def __init__(self, df, batch_rows=10000):
+        self._df = df
+        self.batch_rows = batch_rows
+
+    def to_pandas(self):
+        return self._df.copy()
+
+    def count(self):
+        return len(self._df)
+
+    def to_pandas_batches(self):
+        # Copies, like batches downloaded from Snowflake
+        for start in range(0, len(self._df), self.batch_rows):
+            yield self._df.iloc[start:start + self.batch_rows].copy()
+
+
+class LocalSession:
+    """
+    In-memory stand-in for a Snowpark Session.
+
+    Supports `write_pandas(...)` and `table(name)` with `to_pandas()`,
+    `to_pandas_batches()` and `count()`, which is all the upload, training and
+    mirror sync code needs, so the pipeline can run offline.
+    """
+
+    def __init__(self, tables=None):
+        self.tables = {name: df.copy() for name, df in (tables or {}).items()}
+
+    def write_pandas(self, df, table_name, auto_create_table=False, overwrite=False, **kwargs):
+        if table_name not in self.tables and not auto_create_table:
+            raise ValueError(f"Table {table_name} does not exist")
+
+        if overwrite or table_name not in self.tables:
+            self.tables[table_name] = df.reset_index(drop=True).copy()
+        else:
+            self.tables[table_name] = pd.concat([self.tables[table_name], df], ignore_index=True)
+        return self.table(table_name)
+
+    def table(self, table_name):
+        if table_name not in self.tables:
+            raise ValueError(f"Table {table_name} does not exist")
+        return LocalTable(self.tables[table_name])
+
+    def close(self):
+        pass
@@ -0,0 +1,86 @@
+import os
+import threading
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import Pipeline
+
+from classifier_pool import ClassifierPool
+from compact_model import export_compact
+from model_registry import ModelRegistry
+
+BODIES = ["this is rigged", "great analysis of the odds", "click my link"] * 20
+
+
+def fit(flip=False):
+    labels = ["EMOTIONAL", "RATIONAL", "SPAM"]
+    if flip:
+        labels = labels[::-1]
+    texts = ["rigged angry unfair", "odds analysis polling", "click link free"] * 5
+    return Pipeline([
+        ("tfidf", TfidfVectorizer()),
+        ("clf", LogisticRegression(max_iter=1000)),
+    ]).fit(texts, labels * 5)
+
+
+def predict_with_timeout(pool, model, timeout=60):
+    out = {}
+    thread = threading.Thread(target=lambda: out.setdefault("proba", pool.predict_proba(model, BODIES, 8)), daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "classification hung"
+    return out["proba"]
+
+
+def test_retrain_while_the_pool_runs_the_old_model(tmp_path):
+    directory = str(tmp_path / "compact")
+    export_compact(fit(), directory)
+    registry = ModelRegistry(model_path=str(tmp_path / "missing.pkl"), check_interval=0, compact_dir=directory)
+    pool = ClassifierPool(workers=2, min_comments=0, current_model=lambda: registry.get()[0])
+    try:
+        old, _ = registry.get()
+        expected_old = old.predict_proba(BODIES)
+        np.testing.assert_allclose(predict_with_timeout(pool, old), expected_old)
+
+        # Two retrains: the first generation's arrays are deleted by the second
+        export_compact(fit(flip=True), directory)
+        export_compact(fit(), directory)
+        assert not os.path.exists(os.path.join(directory, old.manifest["files"]["coef"]))
+
+        # A request still holding the old model neither hangs nor moves the pool back
+        running = pool._pool
+        np.testing.assert_allclose(predict_with_timeout(pool, old), expected_old)
+        assert pool._pool is running
+
+        new, _ = registry.get()
+        np.testing.assert_allclose(predict_with_timeout(pool, new), new.predict_proba(BODIES))
+        assert pool._pool is not running
+    finally:
+        pool.close()
+
+
+def test_stale_model_on_a_pool_that_is_not_running_yet(tmp_path):
+    directory = str(tmp_path / "compact")
+    export_compact(fit(), directory)
+    registry = ModelRegistry(model_path=str(tmp_path / "missing.pkl"), check_interval=0, compact_dir=directory)
+    old, _ = registry.get()
+    export_compact(fit(flip=True), directory)
+    export_compact(fit(), directory)
+
+    pool = ClassifierPool(workers=2, min_comments=0, current_model=lambda: registry.get()[0])
+    try:
+        np.testing.assert_allclose(predict_with_timeout(pool, old), old.predict_proba(BODIES))
+        assert pool._pool is None
+    finally:
+        pool.close()
+
+
+def test_export_keeps_the_previous_generation(tmp_path):
+    directory = str(tmp_path / "compact")
+    export_compact(fit(), directory)
+    first = set(os.listdir(directory))
+    export_compact(fit(flip=True), directory)
+    assert first <= set(os.listdir(directory))
+    export_compact(fit(), directory)
+    assert not (first - {"manifest.json"}) & set(os.listdir(directory))
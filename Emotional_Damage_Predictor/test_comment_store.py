@@ -0,0 +1,134 @@
+import threading
+
+from comment_store import COMPACT_SLACK, CommentStore, event_lock, sync_event_comments
+
+
+class FakeFetcher:
+    """Serves one event's comments newest first, like Gamma with NEWEST_FIRST."""
+
+    def __init__(self, comments=(), limit=2):
+        self.comments = list(comments)
+        self.limit = limit
+
+    def iter_pages(self, event_id, start_offset=0, extra_params=None, concurrency=None):
+        newest_first = sorted(self.comments, key=lambda c: c["createdAt"], reverse=True)
+        offset = start_offset
+        while True:
+            page = newest_first[offset:offset + self.limit]
+            if not page:
+                return
+            yield offset, page
+            offset += len(page)
+
+
+def comment(n):
+    return {"id": n, "body": f"comment {n}", "createdAt": f"2024-01-01T00:00:{n:02d}Z"}
+
+
+def test_first_sync_crawls_everything(tmp_path):
+    fetcher = FakeFetcher([comment(n) for n in range(5)])
+
+    store, new_comments = sync_event_comments(9, fetcher, CommentStore(9, tmp_path))
+
+    assert len(new_comments) == 5
+    assert store.backfill_complete
+    assert store.newest_created_at == comment(4)["createdAt"]
+
+
+def test_later_sync_only_returns_new_comments(tmp_path):
+    fetcher = FakeFetcher([comment(n) for n in range(5)])
+    sync_event_comments(9, fetcher, CommentStore(9, tmp_path))
+
+    fetcher.comments += [comment(5), comment(6)]
+    store, new_comments = sync_event_comments(9, fetcher, CommentStore(9, tmp_path))
+
+    assert sorted(c["id"] for c in new_comments) == ["5", "6"]
+    assert len(store) == 7
+
+
+def test_event_empty_on_first_sync_picks_up_later_comments(tmp_path):
+    fetcher = FakeFetcher()
+    store, new_comments = sync_event_comments(9, fetcher, CommentStore(9, tmp_path))
+    assert new_comments == []
+    assert store.backfill_complete
+    assert store.newest_created_at is None
+
+    fetcher.comments = [comment(1), comment(2)]
+    store, new_comments = sync_event_comments(9, fetcher, CommentStore(9, tmp_path))
+
+    assert sorted(c["id"] for c in new_comments) == ["1", "2"]
+    assert len(store) == 2
+
+
+def label_all(store, label="RATIONAL"):
+    unlabeled = store.unlabeled()
+    for item in unlabeled:
+        item["label"] = label
+    store.record_labels(unlabeled)
+    return unlabeled
+
+
+def test_save_appends_only_changes(tmp_path):
+    fetcher = FakeFetcher([comment(n) for n in range(5)])
+    store, _ = sync_event_comments(9, fetcher, CommentStore(9, tmp_path))
+    label_all(store)
+    store.save()
+    with open(store.path, "rb") as f:
+        before = f.read()
+
+    fetcher.comments.append(comment(5))
+    store, _ = sync_event_comments(9, fetcher, CommentStore(9, tmp_path))
+    with open(store.path, "rb") as f:
+        after = f.read()
+
+    assert after.startswith(before)
+    assert after[len(before):].count(b"\n") == 2  # the new comment + a meta line
+
+    reloaded = CommentStore(9, tmp_path)
+    assert len(reloaded) == 6
+    assert reloaded.tallies["RATIONAL"] == 5
+    assert [c["id"] for c in reloaded.unlabeled()] == ["5"]
+
+
+def test_torn_last_line_is_ignored(tmp_path):
+    store, _ = sync_event_comments(9, FakeFetcher([comment(1)]), CommentStore(9, tmp_path))
+    with open(store.path, "a", encoding="utf-8") as f:
+        f.write('{"id": "2", "bo')
+
+    store = CommentStore(9, tmp_path)
+    assert len(store) == 1
+    store.add([comment(3)])
+    store.save()
+
+    assert sorted(CommentStore(9, tmp_path).comments) == ["1", "3"]
+
+
+def test_store_is_compacted_once_mostly_stale(tmp_path):
+    store, _ = sync_event_comments(9, FakeFetcher([comment(1)]), CommentStore(9, tmp_path))
+    for _ in range(COMPACT_SLACK + 5):
+        store.save()
+
+    with open(store.path, encoding="utf-8") as f:
+        assert sum(1 for _ in f) <= 2 * (len(store) + 1) + COMPACT_SLACK
+    assert CommentStore(9, tmp_path).backfill_complete
+
+
+def test_event_lock_serializes_concurrent_analyses(tmp_path):
+    fetcher = FakeFetcher([comment(n) for n in range(5)])
+    labeled = []
+
+    def analyze():
+        with event_lock(9, tmp_path):
+            store, _ = sync_event_comments(9, fetcher, CommentStore(9, tmp_path))
+            batch = label_all(store)
+            store.save()
+            labeled.append(len(batch))
+
+    threads = [threading.Thread(target=analyze) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert sorted(labeled) == [0, 0, 0, 5]
+    assert CommentStore(9, tmp_path).tallies["RATIONAL"] == 5
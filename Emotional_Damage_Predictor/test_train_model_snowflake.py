@@ -0,0 +1,82 @@
+import contextlib
+import io
+
+import numpy as np
+import pandas as pd
+
+from benchmark_training import GeneratedSession, make_noisy_corpus, peak_memory
+from train_model_snowflake import (
+    TEST_PERCENT,
+    frame_batches,
+    is_test_row,
+    iter_table_batches,
+    key_ints,
+    load_training_frame,
+    stratified_test_keys,
+    train_incremental,
+)
+
+
+def test_stratified_split_keeps_class_proportions():
+    table = pd.DataFrame({
+        "BODY": [f"comment {i}" for i in range(1000)],
+        "LABEL": ["EMOTIONAL"] * 700 + ["RATIONAL"] * 250 + ["SPAM"] * 50,
+    })
+    keys_by_class = {}
+    for batch in frame_batches(table, batch_rows=64):
+        keys, labels = key_ints(batch), batch["LABEL"].to_numpy()
+        for label in np.unique(labels):
+            keys_by_class.setdefault(label, []).append(keys[labels == label])
+
+    test = is_test_row(key_ints(table), stratified_test_keys(keys_by_class))
+
+    counts = table[test]["LABEL"].value_counts().to_dict()
+    assert counts == {"EMOTIONAL": 140, "RATIONAL": 50, "SPAM": 10}
+    assert test.sum() == len(table) * TEST_PERCENT // 100
+
+
+def test_stream_fit_holds_out_every_class(tmp_path):
+    table = make_noisy_corpus(600, seed=1)
+    with contextlib.redirect_stdout(io.StringIO()) as out:
+        model = train_incremental(lambda: frame_batches(table, batch_rows=100), checkpoint_path=tmp_path / "ckpt.pkl")
+
+    assert set(model.classes_) == {"EMOTIONAL", "RATIONAL", "SPAM"}
+    assert "(120 held out)" in out.getvalue()
+
+
+def _stream(session, batch_rows):
+    def run():
+        for batch in iter_table_batches(session, batch_rows=batch_rows):
+            batch["BODY"].str.len().sum()
+    return run
+
+
+def test_streamed_loading_stays_under_a_fixed_ceiling():
+    batch_rows = 2000
+    small = peak_memory(_stream(GeneratedSession(10 * batch_rows, batch_rows), batch_rows))
+    large = peak_memory(_stream(GeneratedSession(40 * batch_rows, batch_rows), batch_rows))
+
+    def full():
+        with contextlib.redirect_stdout(io.StringIO()):
+            load_training_frame(GeneratedSession(40 * batch_rows, batch_rows))
+
+    # 4x the rows, about the same peak: memory is bounded by the batch size
+    assert large < 1.5 * small
+    assert large < peak_memory(full) / 4
+
+
+def test_streamed_training_stays_under_a_fixed_ceiling(tmp_path):
+    batch_rows = 1000
+
+    def train(rows):
+        def run():
+            session = GeneratedSession(rows, batch_rows)
+            with contextlib.redirect_stdout(io.StringIO()):
+                train_incremental(
+                    lambda: iter_table_batches(session, batch_rows=batch_rows),
+                    checkpoint_path=tmp_path / f"ckpt-{rows}.pkl",
+                )
+        return run
+
+    # the model and the per-row keys (8 bytes a row) are all that is kept
+    assert peak_memory(train(20 * batch_rows)) < 1.5 * peak_memory(train(5 * batch_rows))
@@ -0,0 +1,78 @@
+import os
+
+import pandas as pd
+
+from train_model_snowflake import iter_table_batches
+from training_mirror import TrainingMirror
+from upload_to_snowflake import TABLE_NAME, UploadWatermark
+
+
+def frame(start, n):
+    return pd.DataFrame({
+        "BODY": [f"comment number {i}" for i in range(start, start + n)],
+        "LABEL": [("EMOTIONAL", "RATIONAL", "SPAM")[i % 3] for i in range(start, start + n)],
+    })
+
+
+def synced_mirror(directory, parts=4, rows=30):
+    mirror = TrainingMirror(str(directory))
+    for i in range(parts):
+        mirror.append(frame(i * rows, rows), origin="snowflake")  # pushed, so compact() merges them
+    return mirror
+
+
+def test_compaction_during_a_streamed_read(tmp_path):
+    mirror = synced_mirror(tmp_path)
+    session = mirror.session()
+    old_parts = [p["file"] for p in mirror.manifest()["parts"]]
+
+    batches = iter_table_batches(session, batch_rows=10)
+    first = next(batches)
+
+    assert mirror.compact(max_parts=1)
+    assert not any(os.path.exists(tmp_path / name) for name in old_parts)
+
+    rows = pd.concat([first, *batches], ignore_index=True)
+    assert len(rows) == 120
+
+    # later passes of the same session read the same snapshot
+    assert len(pd.concat(iter_table_batches(session), ignore_index=True)) == 120
+    session.close()
+
+    # a new session reads the merged part
+    assert len(mirror.session().table(TABLE_NAME).to_pandas()) == 120
+
+
+def test_writes_through_the_session_are_visible_to_its_next_read(tmp_path):
+    mirror = synced_mirror(tmp_path, parts=1)
+    session = mirror.session()
+    assert len(session.table(TABLE_NAME).to_pandas()) == 30
+
+    session.write_pandas(frame(1000, 5), TABLE_NAME)
+
+    assert len(session.table(TABLE_NAME).to_pandas()) == 35
+
+
+class CountingSession:
+    def __init__(self, df):
+        self.df = df
+
+    def table(self, table_name):
+        return self
+
+    def count(self):
+        return len(self.df)
+
+    def to_pandas(self):
+        return self.df
+
+
+def test_pull_records_pulled_rows_in_the_watermark(tmp_path, monkeypatch):
+    import training_mirror
+
+    watermark = UploadWatermark(str(tmp_path / "watermark.txt"))
+    monkeypatch.setattr(training_mirror, "upload_watermark", watermark)
+    mirror = TrainingMirror(str(tmp_path / "mirror"))
+
+    assert mirror.pull(CountingSession(frame(0, 12))) == 12
+    assert len(watermark.keys()) == 12
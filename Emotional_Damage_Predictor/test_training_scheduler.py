@@ -0,0 +1,108 @@
+import threading
+
+from training_scheduler import TrainingScheduler
+
+
+class FakeSession:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class Recorder:
+    """Fake session factory, upload and train steps that record their calls."""
+
+    def __init__(self, train_gate=None, fail=False):
+        self.sessions = []
+        self.uploads = []
+        self.trains = []
+        self.trained = 0
+        self.train_gate = train_gate
+        self.fail = fail
+
+    def session_factory(self):
+        session = FakeSession()
+        self.sessions.append(session)
+        return session
+
+    def upload(self, session=None):
+        self.uploads.append(session)
+
+    def train(self, session=None):
+        if self.train_gate is not None:
+            self.train_gate.wait()
+        self.trains.append(session)
+        if self.fail:
+            raise RuntimeError("fit failed")
+
+    def on_trained(self):
+        self.trained += 1
+
+    def scheduler(self, debounce_seconds=0.05):
+        return TrainingScheduler(
+            upload_fn=self.upload,
+            train_fn=self.train,
+            session_factory=self.session_factory,
+            on_trained=self.on_trained,
+            debounce_seconds=debounce_seconds,
+        )
+
+
+def test_burst_of_triggers_trains_once():
+    fake = Recorder()
+    scheduler = fake.scheduler()
+
+    for _ in range(10):
+        scheduler.trigger()
+    assert scheduler.status()["state"] == "pending"
+
+    assert scheduler.wait_idle(timeout=5)
+    status = scheduler.status()
+    assert status["state"] == "idle"
+    assert status["runs"] == 1
+    assert status["total_triggers"] == 10
+    assert status["last_coalesced_triggers"] == 10
+    assert status["pending_triggers"] == 0
+    assert status["last_error"] is None
+
+    # upload and fit share one session, which is closed afterwards
+    assert len(fake.sessions) == 1 and fake.sessions[0].closed
+    assert fake.uploads == fake.trains == fake.sessions
+    assert fake.trained == 1
+
+
+def test_triggers_during_a_run_coalesce_into_one_follow_up():
+    gate = threading.Event()
+    fake = Recorder(train_gate=gate)
+    scheduler = fake.scheduler(debounce_seconds=0.01)
+
+    scheduler.trigger()
+    assert not scheduler.wait_idle(timeout=0.2)  # first job blocked in train
+    assert scheduler.status()["state"] == "running"
+
+    for _ in range(5):
+        scheduler.trigger()
+    gate.set()
+
+    assert scheduler.wait_idle(timeout=5)
+    status = scheduler.status()
+    assert status["runs"] == 2
+    assert status["last_coalesced_triggers"] == 5
+    assert len(fake.trains) == 2
+
+
+def test_failed_job_is_reported_in_status():
+    fake = Recorder(fail=True)
+    scheduler = fake.scheduler(debounce_seconds=0.01)
+
+    scheduler.trigger()
+    assert scheduler.wait_idle(timeout=5)
+
+    status = scheduler.status()
+    assert status["state"] == "idle"
+    assert status["failures"] == 1
+    assert status["last_error"] == "RuntimeError: fit failed"
+    assert fake.sessions[0].closed
+    assert fake.trained == 0
@@ -0,0 +1,98 @@
+import multiprocessing
+import time
+
+import pandas as pd
+
+from snowflake_session import LocalSession
+from upload_to_snowflake import TABLE_NAME, UploadWatermark, upload_new_rows
+
+
+def rows(*pairs):
+    return [{"body": body, "label": label} for body, label in pairs]
+
+
+def table(session):
+    return session.table(TABLE_NAME).to_pandas()
+
+
+def empty_session(**tables):
+    return LocalSession({TABLE_NAME: pd.DataFrame(columns=["BODY", "LABEL"]), **tables})
+
+
+def test_only_new_rows_are_uploaded(tmp_path):
+    session = empty_session()
+    watermark = UploadWatermark(str(tmp_path / "watermark.txt"))
+
+    first = rows(("Great call!", "RATIONAL"), ("great call", "RATIONAL"), ("LOL", "SPAM"))
+    assert upload_new_rows(first, session=session, watermark=watermark) == (2, 1)
+
+    second = rows(("LOL", "SPAM"), ("LOL", "EMOTIONAL"), ("This is rigged", "EMOTIONAL"))
+    assert upload_new_rows(second, session=session, watermark=watermark) == (2, 1)
+
+    assert len(table(session)) == 4
+    assert upload_new_rows(first + second, session=session, watermark=watermark) == (0, 6)
+    assert len(table(session)) == 4
+
+
+def test_watermark_is_seeded_from_the_existing_table(tmp_path):
+    existing = pd.DataFrame({"BODY": ["already there"], "LABEL": ["SPAM"]})
+    session = LocalSession({TABLE_NAME: existing})
+    watermark = UploadWatermark(str(tmp_path / "watermark.txt"))
+
+    uploaded, skipped = upload_new_rows(
+        rows(("Already there.", "SPAM"), ("new one", "RATIONAL")), session=session, watermark=watermark
+    )
+
+    assert (uploaded, skipped) == (1, 1)
+    assert table(session)["BODY"].tolist() == ["already there", "new one"]
+
+
+def test_appends_from_another_process_are_picked_up(tmp_path):
+    path = str(tmp_path / "watermark.txt")
+    session = empty_session()
+    upload_new_rows(rows(("a", "SPAM")), session=session, watermark=UploadWatermark(path))
+
+    # torn last line from an interrupted writer elsewhere
+    with open(path, "a", encoding="ascii") as f:
+        f.write("0123")
+
+    other = UploadWatermark(path)
+    assert upload_new_rows(rows(("a", "SPAM"), ("b", "SPAM")), session=session, watermark=other) == (1, 1)
+    assert len(UploadWatermark(path).keys()) == 2
+
+
+class SlowSharedSession:
+    """Appends uploaded rows to a file shared by several processes, slowly."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def write_pandas(self, df, **kwargs):
+        time.sleep(0.2)  # widen the read-upload-append window
+        with open(self.path, "a", encoding="utf-8") as f:
+            for body in df["BODY"]:
+                f.write(body + "\n")
+
+    def close(self):
+        pass
+
+
+def _upload_in_child(watermark_path, table_path):
+    upload_new_rows(rows(("same", "SPAM"), ("rows", "SPAM")),
+                    session=SlowSharedSession(table_path), watermark=UploadWatermark(watermark_path))
+
+
+def test_concurrent_processes_upload_each_row_once(tmp_path):
+    watermark_path = str(tmp_path / "watermark.txt")
+    table_path = tmp_path / "table.txt"
+    UploadWatermark(watermark_path).seed([])
+
+    ctx = multiprocessing.get_context("spawn")
+    procs = [ctx.Process(target=_upload_in_child, args=(watermark_path, str(table_path))) for _ in range(3)]
+    for proc in procs:
+        proc.start()
+    for proc in procs:
+        proc.join(timeout=30)
+        assert proc.exitcode == 0
+
+    assert sorted(table_path.read_text().split()) == ["rows", "same"]
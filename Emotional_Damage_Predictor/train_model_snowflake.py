@@ -1,38 +1,69 @@
 import os
-from dotenv import load_dotenv
-from snowflake.snowpark import Session
+
+import joblib
+import numpy as np
+import pandas as pd
 from sklearn.model_selection import train_test_split
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.linear_model import LogisticRegression
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfVectorizer
+from sklearn.linear_model import LogisticRegression, SGDClassifier
 from sklearn.pipeline import Pipeline
 from sklearn.metrics import classification_report
-import joblib
 
-def train_model():
+from compact_model import export_compact, remove_compact
+from label_cache import label_cache
+from model_registry import BASE_DIR, MODEL_PATH, save_model
+from snowflake_session import TRAINING_DATA_SOURCE, create_session
+from upload_to_snowflake import TABLE_NAME, row_keys
 
-    load_dotenv()
+# "full": TF-IDF + LogisticRegression refit on the whole table every time.
+# The whole table is loaded into memory (LogisticRegression's solver needs the
+# full matrix), so memory in this mode grows with the table; use incremental
+# mode on small workers.
+# "incremental": HashingVectorizer + SGDClassifier updated with partial_fit on
+# the rows added since the last checkpoint, with a full refit every
+# FULL_REFIT_EVERY incremental runs (0 = only when forced / labels change).
+# Incremental mode streams the table in batches of at most TRAIN_BATCH_ROWS.
+TRAIN_MODE = os.getenv("TRAIN_MODE", "full")
+FULL_REFIT_EVERY = int(os.getenv("TRAIN_FULL_REFIT_EVERY", "20"))
+INCREMENTAL_EPOCHS = int(os.getenv("TRAIN_INCREMENTAL_EPOCHS", "3"))
+STREAM_EPOCHS = int(os.getenv("TRAIN_STREAM_EPOCHS", "2"))
+TRAIN_BATCH_ROWS = int(os.getenv("TRAIN_BATCH_ROWS", "50000"))
+TEST_PERCENT = 20
+HASHING_FEATURES = 2 ** 18
+CHECKPOINT_PATH = os.path.join(BASE_DIR, "incremental_checkpoint.pkl")
 
-    connection_parameters = {
-        "account":   os.getenv("SNOW_ACCOUNT"),
-        "user":      os.getenv("SNOW_USER"),
-        "password":  os.getenv("SNOW_PASSWORD"),
-        "role":      os.getenv("SNOW_ROLE"),
-        "warehouse": os.getenv("SNOW_WAREHOUSE"),
-        "database":  os.getenv("SNOW_DATABASE"),
-        "schema":    os.getenv("SNOW_SCHEMA"),
-    }
 
-    # initializing session connection with snowflake
-    session = Session.builder.configs(connection_parameters).create()
+def build_full_pipeline():
+    return Pipeline([
+        ("tfidf", TfidfVectorizer()),
+        ("clf", LogisticRegression(max_iter=1000)),
+    ])
 
+
+def build_incremental_pipeline():
+    # Stateless, fixed-size features: new rows never require refitting a vocabulary
+    return Pipeline([
+        ("hash", HashingVectorizer(n_features=HASHING_FEATURES, alternate_sign=False, norm="l2")),
+        ("clf", SGDClassifier(loss="log_loss", alpha=1e-5, random_state=42)),
+    ])
+
+
+def load_training_frame(session):
+    """
+    The whole training table as one DataFrame (full mode only). Peak memory is
+    unbounded: it grows with the table, unlike iter_table_batches().
+    """
     # read and get the data training table
-    sf_df = session.table("COMMENT_LABELS_DATA")
+    sf_df = session.table(TABLE_NAME)
 
     # bring data table to local memory
     pdf = sf_df.to_pandas()
 
     print(f"Successfully loaded {len(pdf)} comments from SnowFlake")
+    return pdf
 
+
+def fit_and_report(pdf, model):
     x = pdf["BODY"]
     y = pdf["LABEL"]
 
@@ -45,11 +76,6 @@ def train_model():
         random_state=42
     )
 
-    model = Pipeline([
-        ("tfidf", TfidfVectorizer()),
-        ("clf", LogisticRegression(max_iter=1000)),
-    ])
-
     print("Training process started...")
     model.fit(x_train, y_train)
 
@@ -59,8 +85,211 @@ def train_model():
     report = classification_report(y_test, y_pred)
     print("\nTest Results:\n")
     print(report)
+    return model
+
+
+def load_checkpoint(path=CHECKPOINT_PATH):
+    if not os.path.exists(path):
+        return None
+    try:
+        return joblib.load(path)
+    except Exception as e:
+        print(f"Ignoring unreadable checkpoint {path}: {e}")
+        return None
+
+
+# ----- Streaming -----
+
+def iter_table_batches(session, batch_rows=TRAIN_BATCH_ROWS):
+    """DataFrames of at most `batch_rows` rows, downloaded one result batch at a time."""
+    table = session.table(TABLE_NAME)
+    batches = table.to_pandas_batches() if hasattr(table, "to_pandas_batches") else [table.to_pandas()]
+    for batch in batches:
+        for start in range(0, len(batch), batch_rows):
+            yield batch.iloc[start:start + batch_rows]
+
+
+def frame_batches(pdf, batch_rows=TRAIN_BATCH_ROWS):
+    for start in range(0, len(pdf), batch_rows):
+        yield pdf.iloc[start:start + batch_rows]
+
+
+def key_ints(batch):
+    keys = row_keys(batch)
+    return np.fromiter((int(k, 16) for k in keys), dtype=np.uint64, count=len(keys))
+
+
+def stratified_test_keys(keys_by_class, test_percent=TEST_PERCENT):
+    """
+    Stratified split without holding the rows: for every class, the
+    `test_percent`% of its row keys with the lowest values go to the test set.
+    Keys are content hashes, so that is a random sample of the class, and a row
+    keeps its side of the split from one run to the next unless its class
+    grows a lot. Returns the sorted test keys.
+    """
+    test = []
+    for chunks in keys_by_class.values():
+        keys = np.unique(np.concatenate(chunks))
+        n_test = min(round(len(keys) * test_percent / 100), len(keys) - 1)  # keep a training row
+        test.append(keys[:max(n_test, 0)])
+    return np.sort(np.concatenate(test)) if test else np.empty(0, dtype=np.uint64)
+
+
+def is_test_row(keys, test_keys):
+    return np.isin(keys, test_keys)
+
+
+def partial_fit_rows(model, bodies, labels, classes, epochs=INCREMENTAL_EPOCHS, seed=0):
+    """A few shuffled partial_fit passes of the SGD step over new rows."""
+    x = model.named_steps["hash"].transform(bodies)
+    y = np.asarray(labels)
+    rng = np.random.RandomState(seed)
+    for _ in range(max(1, epochs)):
+        order = rng.permutation(len(y))
+        model.named_steps["clf"].partial_fit(x[order], y[order], classes=classes)
+    return model
+
+
+def stream_fit(batches_fn, model, epochs=STREAM_EPOCHS):
+    """
+    Fit the incremental pipeline out-of-core. `batches_fn()` must return a
+    fresh iterator of DataFrames on every call; the table is read 2 + epochs
+    times (labels and keys, training passes, evaluation), one batch at a time.
+
+    Returns (model, classes, sorted keys of every row).
+    """
+    keys_by_class = {}
+    for batch in batches_fn():
+        keys = key_ints(batch)
+        labels = batch["LABEL"].to_numpy()
+        for label in np.unique(labels):
+            keys_by_class.setdefault(label, []).append(keys[labels == label])
+    classes = np.array(sorted(keys_by_class))
+    seen = (
+        np.unique(np.concatenate([k for chunks in keys_by_class.values() for k in chunks]))
+        if keys_by_class else np.empty(0, dtype=np.uint64)
+    )
+    test_keys = stratified_test_keys(keys_by_class)
+    del keys_by_class
+    print(f"Streaming {len(seen)} rows ({len(test_keys)} held out), classes {[str(c) for c in classes]}")
+
+    print("Training process started...")
+    for epoch in range(max(1, epochs)):
+        for i, batch in enumerate(batches_fn()):
+            train = ~is_test_row(key_ints(batch), test_keys)
+            if train.any():
+                partial_fit_rows(model, batch["BODY"][train], batch["LABEL"][train], classes, epochs=1, seed=epoch * 100003 + i)
+
+    print("Test process started...")
+    y_test, y_pred = [], []
+    for batch in batches_fn():
+        test = is_test_row(key_ints(batch), test_keys)
+        if test.any():
+            y_test.extend(batch["LABEL"][test])
+            y_pred.extend(model.predict(batch["BODY"][test]))
+
+    if y_test:
+        report = classification_report(y_test, y_pred)
+        print("\nTest Results:\n")
+        print(report)
+    return model, classes, seen
+
+
+def train_incremental(batches_fn, checkpoint_path=CHECKPOINT_PATH, full_refit=False, full_refit_every=FULL_REFIT_EVERY):
+    """
+    Update the incremental model with the rows not seen at the last
+    checkpoint, streaming the table batch by batch (only the new rows are
+    kept). Returns the model, or None when there was nothing new.
+    """
+    checkpoint = load_checkpoint(checkpoint_path)
+
+    reason = None
+    if full_refit:
+        reason = "requested"
+    elif checkpoint is None:
+        reason = "no checkpoint"
+    elif not isinstance(checkpoint.get("seen"), np.ndarray):
+        reason = "old checkpoint format"
+    elif full_refit_every and checkpoint["updates"] >= full_refit_every:
+        reason = f"{checkpoint['updates']} incremental updates since the last one"
+
+    if not reason:
+        seen = checkpoint["seen"]
+        new_frames, new_keys = [], []
+        for batch in batches_fn():
+            keys = key_ints(batch)
+            fresh = ~np.isin(keys, seen)
+            if fresh.any():
+                keys, first = np.unique(keys[fresh], return_index=True)  # duplicates within the batch
+                new_frames.append(batch[fresh].iloc[first])
+                new_keys.append(keys)
+
+        if not new_frames:
+            print("No new rows since the last checkpoint")
+            return None
+        rows = pd.concat(new_frames, ignore_index=True)
+        if set(rows["LABEL"].unique()) - set(checkpoint["classes"]):
+            reason = "new labels"
+
+    if reason:
+        print(f"Full refit ({reason})...")
+        model, classes, seen = stream_fit(batches_fn, build_incremental_pipeline())
+        checkpoint = {"model": model, "classes": classes, "seen": seen, "updates": 0}
+    else:
+        model = checkpoint["model"]
+        # Test-then-train: score the new rows before learning from them
+        accuracy = float((model.predict(rows["BODY"]) == rows["LABEL"].to_numpy()).mean())
+        print(f"Incremental update on {len(rows)} new rows (accuracy before update: {accuracy:.3f})")
+
+        partial_fit_rows(model, rows["BODY"], rows["LABEL"], checkpoint["classes"], seed=checkpoint["updates"])
+        checkpoint["seen"] = np.union1d(seen, np.concatenate(new_keys))
+        checkpoint["updates"] += 1
+
+    save_model(checkpoint, checkpoint_path)
+    return model
+
+
+def train_model(session=None, mode=None, full_refit=False):
+    # initializing session connection with snowflake
+    # (or reuse the caller's session / a LocalSession stand-in;
+    # TRAINING_DATA_SOURCE=mirror trains offline from the local mirror)
+    if session is None and TRAINING_DATA_SOURCE == "mirror":
+        from training_mirror import training_mirror
+        session = training_mirror.session()
+
+    own_session = session is None
+    if own_session:
+        session = create_session()
+
+    try:
+        if (mode or TRAIN_MODE) == "incremental":
+            # Streamed: memory stays bounded by TRAIN_BATCH_ROWS plus the new rows
+            model = train_incremental(lambda: iter_table_batches(session), full_refit=full_refit)
+            if model is None:
+                return MODEL_PATH
+        else:
+            # TF-IDF + LogisticRegression needs the whole table in memory:
+            # unbounded, see load_training_frame()
+            model = fit_and_report(load_training_frame(session), build_full_pipeline())
+    finally:
+        if own_session:
+            session.close()
+
+    # Save trained modal (atomic rename, so the API's model registry can hot-swap it)
+    save_model(model, MODEL_PATH)
+    print(f"\nSaved trained model to {MODEL_PATH}")
 
-    # Save trained modal
-    joblib.dump(model, "comment_classifier.pkl")
-    print("\nSaved trained model.")
+    # Plus the compact artifact the registry prefers (TF-IDF pipelines only;
+    # otherwise unpublish a stale one so the registry falls back to the pickle)
+    try:
+        print(f"Exported compact model to {export_compact(model)}")
+    except ValueError as e:
+        print(f"Compact export skipped: {e}")
+        remove_compact()
 
+    # Labels of long-retired model versions are never looked up again
+    if label_cache is not None:
+        evicted = label_cache.evict_models()
+        if evicted:
+            print(f"Evicted label cache namespaces: {', '.join(evicted)}")
+    return MODEL_PATH
@@ -0,0 +1,439 @@
+"""
+Local columnar mirror of COMMENT_LABELS_DATA.
+
+Rows live in immutable Arrow IPC files (memory-mapped when read) listed in a
+manifest:
+
+    training_mirror/manifest.json      {"next_part": 3, "remote_rows": 120, "parts": [{"file", "rows", "origin", "pushed"}]}
+    training_mirror/part-000001.arrow  BODY, LABEL, KEY (uint64 row key)
+
+With TRAINING_DATA_SOURCE=mirror, uploads append to the mirror and training
+reads from it (MirrorSession is a drop-in for a Snowpark session), so the
+pipeline runs without Snowflake. MirrorSync optionally pushes local parts to
+Snowflake and pulls rows added there by others, on one pooled session.
+
+    python training_mirror.py status
+    python training_mirror.py import data_labeled.json
+    python training_mirror.py sync
+    python training_mirror.py train [--mode incremental]
+"""
+import argparse
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+from event_storage import atomic_write
+from snowflake_session import session_pool
+from upload_to_snowflake import TABLE_NAME, row_keys, upload_new_rows, upload_watermark
+
+try:
+    import fcntl
+except ImportError:  # Windows: in-process locking only
+    fcntl = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MIRROR_DIR = os.getenv("TRAINING_MIRROR_DIR", os.path.join(BASE_DIR, "training_mirror"))
+SNOWFLAKE_SYNC = os.getenv("SNOWFLAKE_SYNC", "false").lower() == "true"
+SYNC_INTERVAL_SECONDS = float(os.getenv("SNOWFLAKE_SYNC_INTERVAL", "300"))
+MAX_PARTS = 64            # synced parts are merged into one beyond this
+READ_BATCH_ROWS = 10000
+
+SCHEMA = pa.schema([("BODY", pa.string()), ("LABEL", pa.string()), ("KEY", pa.uint64())])
+
+
+def key_ints(df):
+    keys = row_keys(df)
+    return np.fromiter((int(k, 16) for k in keys), dtype=np.uint64, count=len(keys))
+
+
+class TrainingMirror:
+    def __init__(self, directory=MIRROR_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._keys = None         # sorted uint64 keys of every mirrored row
+        self._keys_stamp = None   # manifest mtime the keys were loaded for
+
+    # ----- Manifest / locking -----
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.directory, "manifest.json")
+
+    @contextmanager
+    def _locked(self):
+        """Serialize writers across threads and (where fcntl exists) processes."""
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock, open(os.path.join(self.directory, ".lock"), "w") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    def manifest(self):
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"next_part": 1, "parts": []}
+
+    def _save_manifest(self, manifest):
+        atomic_write(self.manifest_path, lambda f: json.dump(manifest, f, indent=2))
+
+    def __len__(self):
+        return sum(part["rows"] for part in self.manifest()["parts"])
+
+    # ----- Reading -----
+
+    def _open(self, part):
+        return ipc.open_file(pa.memory_map(os.path.join(self.directory, part["file"]), "r"))
+
+    def record_batches(self, parts=None, columns=None):
+        """
+        Batches of `parts` (opened one by one). Only safe for parts that
+        compact() cannot remove meanwhile: unpushed parts, or any part while
+        holding the lock. Other readers go through snapshot().
+        """
+        for part in self.manifest()["parts"] if parts is None else parts:
+            yield from _reader_batches(self._open(part), columns)
+
+    def to_pandas_batches(self, batch_rows=READ_BATCH_ROWS, parts=None):
+        if parts is None:
+            with self.snapshot() as snapshot:
+                yield from snapshot.to_pandas_batches(batch_rows)
+            return
+        for batch in self.record_batches(parts, columns=["BODY", "LABEL"]):
+            yield from _pandas_slices(batch, batch_rows)
+
+    def to_pandas(self):
+        with self.snapshot() as snapshot:
+            return snapshot.to_pandas()
+
+    def snapshot(self):
+        """
+        The current parts, all opened (memory-mapped) at once under the lock.
+        A compaction may unlink merged parts afterwards; the open mappings
+        stay readable until the snapshot is closed.
+        """
+        with self._locked():
+            return MirrorSnapshot([self._open(part) for part in self.manifest()["parts"]])
+
+    def keys(self):
+        """Sorted keys of every mirrored row (re-read when the manifest changes)."""
+        try:
+            stamp = os.stat(self.manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            return np.empty(0, dtype=np.uint64)
+        if self._keys is None or stamp != self._keys_stamp:
+            chunks = [b.column(0).to_numpy() for b in self.record_batches(columns=["KEY"])]
+            self._keys = np.unique(np.concatenate(chunks)) if chunks else np.empty(0, dtype=np.uint64)
+            self._keys_stamp = stamp
+        return self._keys
+
+    # ----- Writing -----
+
+    def append(self, df, origin="local"):
+        """
+        Add the rows of `df` (BODY, LABEL) that are not mirrored yet as a new
+        part. Returns the number of rows added.
+        """
+        df = df[["BODY", "LABEL"]].dropna()
+        keys = key_ints(df)
+        with self._locked():
+            fresh = ~np.isin(keys, self.keys())
+            _, first = np.unique(keys[fresh], return_index=True)  # duplicates within df
+            if not len(first):
+                return 0
+            order = np.sort(first)
+            rows = df[fresh].iloc[order]
+            keys = keys[fresh][order]
+
+            manifest = self.manifest()
+            name = f"part-{manifest['next_part']:06d}.arrow"
+            self._write_part(name, rows, keys)
+            manifest["next_part"] += 1
+            manifest["parts"].append({"file": name, "rows": len(rows), "origin": origin, "pushed": origin != "local"})
+            self._save_manifest(manifest)
+            self._keys = None
+        return len(rows)
+
+    def _write_part(self, name, rows, keys):
+        table = pa.table(
+            {
+                "BODY": pa.array(rows["BODY"].astype(str).tolist(), type=pa.string()),
+                "LABEL": pa.array(rows["LABEL"].astype(str).tolist(), type=pa.string()),
+                "KEY": pa.array(keys, type=pa.uint64()),
+            },
+            schema=SCHEMA,
+        )
+        path = os.path.join(self.directory, name)
+        tmp_path = path + ".part"
+        with pa.OSFile(tmp_path, "wb") as sink, ipc.new_file(sink, SCHEMA) as writer:
+            writer.write_table(table, max_chunksize=READ_BATCH_ROWS)
+        os.replace(tmp_path, path)
+
+    def compact(self, max_parts=MAX_PARTS):
+        """Merge all synced parts into one when there are more than `max_parts` parts."""
+        with self._locked():
+            manifest = self.manifest()
+            synced = [p for p in manifest["parts"] if p["pushed"]]
+            if len(manifest["parts"]) <= max_parts or len(synced) < 2:
+                return False
+
+            batches = list(self.record_batches(parts=synced))
+            name = f"part-{manifest['next_part']:06d}.arrow"
+            path = os.path.join(self.directory, name)
+            with pa.OSFile(path + ".part", "wb") as sink, ipc.new_file(sink, SCHEMA) as writer:
+                for batch in batches:
+                    writer.write_batch(batch)
+            os.replace(path + ".part", path)
+
+            merged = {"file": name, "rows": sum(p["rows"] for p in synced), "origin": "merged", "pushed": True}
+            manifest["next_part"] += 1
+            manifest["parts"] = [merged] + [p for p in manifest["parts"] if not p["pushed"]]
+            self._save_manifest(manifest)
+            del batches
+            for part in synced:
+                os.remove(os.path.join(self.directory, part["file"]))
+        return True
+
+    # ----- Snowflake sync -----
+
+    def push(self, session):
+        """Upload local parts not pushed yet (deduplicated by the upload watermark)."""
+        uploaded = 0
+        for part in [p for p in self.manifest()["parts"] if not p["pushed"]]:
+            rows = pd.concat(self.to_pandas_batches(parts=[part]), ignore_index=True)
+            n, _ = upload_new_rows(rows.rename(columns=str.lower).to_dict("records"), session=session)
+            uploaded += n
+            with self._locked():
+                manifest = self.manifest()
+                for entry in manifest["parts"]:
+                    if entry["file"] == part["file"]:
+                        entry["pushed"] = True
+                if "remote_rows" in manifest:
+                    manifest["remote_rows"] += n  # so pull() only rescans for rows added by others
+                self._save_manifest(manifest)
+        return uploaded
+
+    def pull(self, session):
+        """
+        Mirror rows that are in Snowflake but not here (e.g. uploaded by
+        another machine). Skipped while the table's row count is unchanged.
+        """
+        from train_model_snowflake import iter_table_batches
+
+        remote_rows = session.table(TABLE_NAME).count()
+        if remote_rows == self.manifest().get("remote_rows"):
+            return 0
+
+        pulled = 0
+        for batch in iter_table_batches(session):
+            added = self.append(batch, origin="snowflake")
+            if added:
+                with upload_watermark.locked():
+                    upload_watermark.add(row_keys(batch))  # they are in Snowflake already
+            pulled += added
+
+        with self._locked():
+            manifest = self.manifest()
+            manifest["remote_rows"] = remote_rows
+            self._save_manifest(manifest)
+        return pulled
+
+    def sync(self, session):
+        pushed = self.push(session)
+        pulled = self.pull(session)
+        self.compact()
+        return {"pushed": pushed, "pulled": pulled, "rows": len(self)}
+
+    def session(self):
+        return MirrorSession(self)
+
+    def status(self):
+        manifest = self.manifest()
+        return {
+            "directory": self.directory,
+            "rows": sum(p["rows"] for p in manifest["parts"]),
+            "parts": len(manifest["parts"]),
+            "unpushed_parts": sum(1 for p in manifest["parts"] if not p["pushed"]),
+        }
+
+
+def _reader_batches(reader, columns=None):
+    for i in range(reader.num_record_batches):
+        batch = reader.get_batch(i)
+        yield batch.select(columns) if columns else batch
+
+
+def _pandas_slices(batch, batch_rows):
+    for start in range(0, batch.num_rows, batch_rows):
+        yield batch.slice(start, batch_rows).to_pandas()
+
+
+class MirrorSnapshot:
+    """Open readers of the parts listed in one manifest (see TrainingMirror.snapshot())."""
+
+    def __init__(self, readers):
+        self.readers = readers
+
+    def record_batches(self, columns=None):
+        for reader in self.readers:
+            yield from _reader_batches(reader, columns)
+
+    def to_pandas_batches(self, batch_rows=READ_BATCH_ROWS):
+        for batch in self.record_batches(columns=["BODY", "LABEL"]):
+            yield from _pandas_slices(batch, batch_rows)
+
+    def to_pandas(self):
+        batches = list(self.record_batches(columns=["BODY", "LABEL"]))
+        if not batches:
+            return pd.DataFrame({"BODY": pd.Series(dtype=str), "LABEL": pd.Series(dtype=str)})
+        return pa.Table.from_batches(batches).to_pandas()
+
+    def close(self):
+        self.readers = []  # drops the last references to the mappings
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class MirrorTable:
+    def __init__(self, session):
+        self.session = session
+
+    def to_pandas(self):
+        return self.session.snapshot().to_pandas()
+
+    def to_pandas_batches(self):
+        return self.session.snapshot().to_pandas_batches()
+
+
+class MirrorSession:
+    """
+    Stand-in for a Snowpark session backed by the mirror: table() reads it
+    and write_pandas() appends to it, so upload_new_rows() and train_model()
+    run offline.
+
+    Reads see one snapshot of the mirror, taken on the first read after the
+    session was opened or wrote through write_pandas(), so the several
+    passes of a streamed fit read the same rows even if MirrorSync appends
+    or compacts in the meantime.
+    """
+
+    def __init__(self, mirror):
+        self.mirror = mirror
+        self._snapshot = None
+
+    def snapshot(self):
+        if self._snapshot is None:
+            self._snapshot = self.mirror.snapshot()
+        return self._snapshot
+
+    def table(self, table_name):
+        if table_name != TABLE_NAME:
+            raise ValueError(f"Table {table_name} is not mirrored")
+        return MirrorTable(self)
+
+    def append(self, df):
+        """TrainingMirror.append(); the next read through this session sees the new rows."""
+        added = self.mirror.append(df)
+        self.close()
+        return added
+
+    def write_pandas(self, df, table_name, **kwargs):
+        if table_name != TABLE_NAME:
+            raise ValueError(f"Table {table_name} is not mirrored")
+        self.append(df)
+        return self.table(table_name)
+
+    def close(self):
+        if self._snapshot is not None:
+            self._snapshot.close()
+            self._snapshot = None
+
+
+class MirrorSync:
+    """Background thread running TrainingMirror.sync() every `interval` seconds on the pooled session."""
+
+    def __init__(self, mirror, pool=session_pool, interval=SYNC_INTERVAL_SECONDS):
+        self.mirror = mirror
+        self.pool = pool
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+        self.last_result = None
+        self.last_error = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="mirror-sync", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def run_once(self):
+        try:
+            self.last_result = self.mirror.sync(self.pool.get())
+            self.last_error = None
+        except Exception as e:
+            self.last_error = f"{type(e).__name__}: {e}"
+            print(f"Snowflake sync failed: {self.last_error}")
+            self.pool.invalidate()
+        return self.last_result
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.run_once()
+            self._stop.wait(self.interval)
+
+    def status(self):
+        return {"enabled": True, "interval_seconds": self.interval, "last_result": self.last_result, "last_error": self.last_error}
+
+
+# Shared per-process mirror
+training_mirror = TrainingMirror()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local columnar mirror of COMMENT_LABELS_DATA.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status")
+    imp = sub.add_parser("import", help="Append a labeled JSON file ([{body, label}, ...]).")
+    imp.add_argument("path")
+    sub.add_parser("sync", help="Push local rows to Snowflake and pull rows added there.")
+    train = sub.add_parser("train", help="Train offline from the mirror.")
+    train.add_argument("--mode", choices=["full", "incremental"], default=None)
+    train.add_argument("--full-refit", action="store_true")
+    args = parser.parse_args(argv)
+
+    if args.command == "import":
+        with open(args.path, "r", encoding="utf-8") as f:
+            rows = json.load(f)
+        df = pd.DataFrame(rows, columns=["body", "label"]).rename(columns=str.upper)
+        print(f"Mirrored {training_mirror.append(df)} new rows")
+    elif args.command == "sync":
+        result = MirrorSync(training_mirror).run_once()
+        session_pool.close()
+        if result is None:
+            return 1
+        print(json.dumps(result))
+    elif args.command == "train":
+        from train_model_snowflake import train_model
+
+        train_model(session=training_mirror.session(), mode=args.mode, full_refit=args.full_refit)
+    print(json.dumps(training_mirror.status()))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
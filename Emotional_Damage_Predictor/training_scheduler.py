@@ -0,0 +1,161 @@
+import datetime as dt
+import os
+import threading
+import time
+
+from upload_to_snowflake import upload_training_data
+from snowflake_session import create_session
+
+DEFAULT_DEBOUNCE_SECONDS = float(os.getenv("TRAIN_DEBOUNCE_SECONDS", "30"))
+
+
+def train_model(session=None):
+    # Imported on first use: sklearn stays out of API processes until they retrain
+    from train_model_snowflake import train_model as train
+
+    return train(session=session)
+
+
+def _utc_now_iso():
+    return dt.datetime.now(dt.timezone.utc).isoformat()
+
+
+class TrainingScheduler:
+    """
+    Runs upload + retrain off the request path.
+
+    trigger() only records that new labeled data exists. A background thread
+    waits until no new trigger arrived for `debounce_seconds`, then runs one
+    upload and one fit for all triggers seen so far. Triggers that arrive while
+    a job is running are coalesced into a single follow-up job.
+    """
+
+    def __init__(
+        self,
+        upload_fn=upload_training_data,
+        train_fn=train_model,
+        session_factory=create_session,
+        on_trained=None,
+        debounce_seconds=DEFAULT_DEBOUNCE_SECONDS,
+    ):
+        self.upload_fn = upload_fn
+        self.train_fn = train_fn
+        self.session_factory = session_factory
+        self.on_trained = on_trained
+        self.debounce_seconds = debounce_seconds
+
+        self._cond = threading.Condition()
+        self._worker = None
+        self._state = "idle"           # idle | pending | running
+        self._pending_triggers = 0
+        self._last_trigger = 0.0
+
+        self._total_triggers = 0
+        self._runs = 0
+        self._failures = 0
+        self._last_started = None
+        self._last_finished = None
+        self._last_duration = None
+        self._last_error = None
+        self._last_batch_size = 0
+
+    def trigger(self, reason=None):
+        """Request a retrain; returns the scheduler status right after queuing."""
+        with self._cond:
+            self._pending_triggers += 1
+            self._total_triggers += 1
+            self._last_trigger = time.monotonic()
+
+            if self._state == "idle":
+                self._state = "pending"
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="training-scheduler", daemon=True)
+                self._worker.start()
+
+            self._cond.notify_all()
+
+        if reason:
+            print(f"Retrain requested: {reason}")
+        return self.status()
+
+    def status(self):
+        with self._cond:
+            return {
+                "state": self._state,
+                "pending_triggers": self._pending_triggers,
+                "total_triggers": self._total_triggers,
+                "runs": self._runs,
+                "failures": self._failures,
+                "last_started": self._last_started,
+                "last_finished": self._last_finished,
+                "last_duration_seconds": self._last_duration,
+                "last_error": self._last_error,
+                "last_coalesced_triggers": self._last_batch_size,
+                "debounce_seconds": self.debounce_seconds,
+            }
+
+    def wait_idle(self, timeout=None):
+        """Block until no job is pending or running. Returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._state != "idle":
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def _run(self):
+        while True:
+            with self._cond:
+                # Debounce: wait until triggers stop arriving for a while
+                while True:
+                    remaining = self._last_trigger + self.debounce_seconds - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+
+                batch_size = self._pending_triggers
+                self._pending_triggers = 0
+                self._state = "running"
+                self._last_started = _utc_now_iso()
+
+            started = time.monotonic()
+            error = None
+            try:
+                self._run_job()
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                print(f"Background training failed: {error}")
+
+            with self._cond:
+                self._runs += 1
+                self._last_batch_size = batch_size
+                self._last_finished = _utc_now_iso()
+                self._last_duration = round(time.monotonic() - started, 3)
+                self._last_error = error
+                if error:
+                    self._failures += 1
+
+                if self._pending_triggers == 0:
+                    self._state = "idle"
+                    self._worker = None
+                    self._cond.notify_all()
+                    return
+
+                # New triggers arrived during the job: run once more for all of them
+                self._state = "pending"
+                self._cond.notify_all()
+
+    def _run_job(self):
+        # One session for both steps instead of one connection per step
+        session = self.session_factory() if self.session_factory else None
+        try:
+            self.upload_fn(session=session)
+            self.train_fn(session=session)
+        finally:
+            if session is not None:
+                session.close()
+
+        if self.on_trained:
+            self.on_trained()
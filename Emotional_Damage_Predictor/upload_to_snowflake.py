@@ -1,41 +1,226 @@
+import hashlib
 import json
 import os
-from dotenv import load_dotenv
+import threading
+from contextlib import contextmanager
+
 import pandas as pd
-from snowflake.snowpark import Session
 
+from snowflake_session import TRAINING_DATA_SOURCE, create_session
+from event_storage import atomic_write, claim_batch, finish_batch, pending_labeled_batches, read_jsonl
+from label_cache import normalize_text
+
+try:
+    import fcntl
+except ImportError:  # Windows: in-process locking only
+    fcntl = None
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_LABELED_PATH = os.path.join(BASE_DIR, "data_labeled.json")
+TABLE_NAME = "COMMENT_LABELS_DATA"
 
-def upload_training_data():
-    load_dotenv()
-
-    connection_parameters = {
-        "account":   os.getenv("SNOW_ACCOUNT"),
-        "user":      os.getenv("SNOW_USER"),
-        "password":  os.getenv("SNOW_PASSWORD"),
-        "role":      os.getenv("SNOW_ROLE"),
-        "warehouse": os.getenv("SNOW_WAREHOUSE"),
-        "database":  os.getenv("SNOW_DATABASE"),
-        "schema":    os.getenv("SNOW_SCHEMA"),
-    }
-    
-    if not os.path.exists(DATA_LABELED_PATH):
-        raise FileNotFoundError(f"Missing labeled file: {DATA_LABELED_PATH}")
+# Keys of the rows already in TABLE_NAME, one per line (append-only)
+UPLOAD_WATERMARK_PATH = os.getenv("SNOWFLAKE_UPLOAD_WATERMARK", os.path.join(BASE_DIR, "upload_watermark.txt"))
+UPLOAD_CHUNK_ROWS = int(os.getenv("SNOWFLAKE_UPLOAD_CHUNK_ROWS", "50000"))
+UPLOAD_COMPRESSION = os.getenv("SNOWFLAKE_UPLOAD_COMPRESSION", "gzip")  # gzip | snappy
+KEY_LENGTH = 16  # hex chars (64-bit blake2b)
 
-    with open(DATA_LABELED_PATH, "r", encoding="utf-8") as f:
-        data = json.load(f)
 
-    df = pd.DataFrame(data)[["body", "label"]]
-    df.columns = ["BODY", "LABEL"]
-    session = Session.builder.configs(connection_parameters).create()
+def row_key(body, label):
+    """Dedup key of a training row: its label plus the normalized comment text."""
+    text = f"{label}\x1f{normalize_text(body)}"
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=KEY_LENGTH // 2).hexdigest()
+
+
+def row_keys(df):
+    return [row_key(body, label) for body, label in zip(df["BODY"].tolist(), df["LABEL"].tolist())]
+
+
+class UploadWatermark:
+    """
+    The set of row keys already uploaded, kept in an append-only text file.
+
+    Appends from other processes are picked up incrementally (only the bytes
+    past the last read offset are parsed). A torn last line from an
+    interrupted writer is ignored, and the next append starts on a new line.
+
+    Read-upload-append must run under locked(), which also serializes
+    uploads of other processes sharing the file.
+    """
 
+    def __init__(self, path=UPLOAD_WATERMARK_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._keys = set()
+        self._offset = 0
+
+    @contextmanager
+    def locked(self):
+        """Serialize uploads across threads and (where fcntl exists) processes."""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        with self._lock, open(self.path + ".lock", "w") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def keys(self):
+        if not self.exists():
+            return self._keys
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            data = f.read()
+        end = data.rfind(b"\n") + 1  # only complete lines
+        for line in data[:end].decode("ascii", errors="ignore").splitlines():
+            if len(line) == KEY_LENGTH:
+                self._keys.add(line)
+        self._offset += end
+        return self._keys
+
+    def add(self, keys):
+        keys = [k for k in keys if k not in self._keys]
+        if not keys:
+            return
+        with open(self.path, "ab+") as f:
+            f.seek(0, os.SEEK_END)
+            torn = False
+            if f.tell() > 0:
+                f.seek(-1, os.SEEK_END)
+                torn = f.read(1) != b"\n"
+            f.write((("\n" if torn else "") + "\n".join(keys) + "\n").encode("ascii"))
+        self._keys.update(keys)
+
+    def seed(self, keys):
+        """Replace the watermark with `keys` (e.g. the keys of the current table)."""
+        keys = sorted(set(keys))
+        atomic_write(self.path, lambda f: f.write("".join(k + "\n" for k in keys)))
+        self._keys = set(keys)
+        self._offset = os.path.getsize(self.path)
+
+
+# Shared per-process watermark
+upload_watermark = UploadWatermark()
+
+
+def _write_rows(df, session):
+    # Staged as compressed Parquet chunks of UPLOAD_CHUNK_ROWS rows each
     session.write_pandas(
         df,
-        table_name="COMMENT_LABELS_DATA",
+        table_name=TABLE_NAME,
         auto_create_table=False,
-        overwrite=False
+        overwrite=False,
+        chunk_size=UPLOAD_CHUNK_ROWS,
+        compression=UPLOAD_COMPRESSION,
     )
 
-    print(f"Successfully uploaded {len(df)} rows to Snowflake COMMENT_LABELS_DATA table")
\ No newline at end of file
+
+def _seed_watermark(session, watermark):
+    """First run: take the keys of whatever the table already holds."""
+    try:
+        existing = session.table(TABLE_NAME).to_pandas()
+    except Exception as e:
+        print(f"Could not read {TABLE_NAME} to seed the upload watermark: {e}")
+        existing = pd.DataFrame(columns=["BODY", "LABEL"])
+    watermark.seed(row_keys(existing))
+    print(f"Seeded upload watermark with {len(watermark.keys())} rows from {TABLE_NAME}")
+
+
+def _to_upload_frame(rows):
+    df = pd.DataFrame(rows, columns=["body", "label"])
+    df.columns = ["BODY", "LABEL"]
+    return df
+
+
+def upload_new_rows(rows, session=None, watermark=None):
+    """
+    Upload only the rows whose key is not in the watermark yet (duplicates
+    within `rows` are dropped too), then record their keys.
+
+    Returns (uploaded, skipped). No session is opened when nothing is new.
+    A mirror session (see training_mirror.py) deduplicates on its own keys.
+    """
+    if session is None and TRAINING_DATA_SOURCE == "mirror":
+        from training_mirror import training_mirror
+        session = training_mirror.session()
+
+    df = _to_upload_frame(rows).dropna()
+    if getattr(session, "mirror", None) is not None:
+        added = session.append(df)
+        return added, len(df) - added
+
+    watermark = watermark or upload_watermark
+    keys = row_keys(df)
+    own_session = False
+
+    with watermark.locked():
+        try:
+            if not watermark.exists():
+                own_session = session is None
+                if own_session:
+                    session = create_session()
+                _seed_watermark(session, watermark)
+
+            known = watermark.keys()
+            fresh, fresh_keys, seen = [], [], set()
+            for i, key in enumerate(keys):
+                if key not in known and key not in seen:
+                    seen.add(key)
+                    fresh.append(i)
+                    fresh_keys.append(key)
+
+            if fresh:
+                if session is None:
+                    own_session = True
+                    session = create_session()
+                _write_rows(df.iloc[fresh].reset_index(drop=True), session)
+                watermark.add(fresh_keys)
+        finally:
+            if own_session:
+                session.close()
+
+    return len(fresh), len(df) - len(fresh)
+
+
+def upload_training_data(session=None):
+    if not os.path.exists(DATA_LABELED_PATH):
+        raise FileNotFoundError(f"Missing labeled file: {DATA_LABELED_PATH}")
+
+    with open(DATA_LABELED_PATH, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    uploaded, skipped = upload_new_rows(data, session=session)
+    print(f"Successfully uploaded {uploaded} new rows to Snowflake {TABLE_NAME} ({skipped} already there)")
+    return uploaded
+
+
+def upload_labeled_batches(session=None):
+    """
+    Upload every pending per-event labeled batch (see event_storage).
+
+    Batches are claimed with an atomic rename first, so several API workers
+    can run this at the same time without uploading a batch twice.
+    """
+    claimed = [path for path in map(claim_batch, pending_labeled_batches()) if path]
+    if not claimed:
+        print("No labeled batches waiting for upload")
+        return 0
+
+    try:
+        rows = [row for path in claimed for row in read_jsonl(path)]
+        uploaded, skipped = upload_new_rows(rows, session=session)
+    except Exception:
+        for path in claimed:
+            finish_batch(path, uploaded=False)
+        raise
+
+    for path in claimed:
+        finish_batch(path, uploaded=True)
+
+    print(
+        f"Successfully uploaded {uploaded} new rows from {len(claimed)} batches "
+        f"to Snowflake {TABLE_NAME} ({skipped} already there)"
+    )
+    return uploaded
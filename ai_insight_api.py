@@ -1,7 +1,12 @@
-from flask import Flask, request, jsonify
+import json
+
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 
-from poly_event_ai_summarizer import generate_insight_from_query, HttpError
+from poly_event_ai_summarizer import generate_insight_from_query, stream_insight_from_query, HttpError
+from event_cache import event_cache
+from event_resolver import event_resolver
+from insight_cache import insight_cache
 
 app = Flask(__name__)
 CORS(app, resources={r"/*": {"origins": "*"}})
@@ -25,11 +30,73 @@ def ai_insight():
         return jsonify({"error": str(e)}), 500
 
 
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.route("/ai-insight/stream", methods=["POST"])
+def ai_insight_stream():
+    """
+    Same input as /ai-insight, but the insight is sent as server-sent events:
+    "chunk" events with {"text": ...}, then "done" (or "error" if Gemini
+    fails mid-stream).
+    """
+    data = request.get_json() or {}
+    slug = data.get("slug")
+
+    if not slug:
+        return jsonify({"error": "Missing slug"}), 400
+
+    chunks = stream_insight_from_query(slug)
+    try:
+        # resolve the event and open the Gemini stream before committing to a 200
+        first = next(chunks, None)
+    except HttpError as e:
+        return jsonify({"error": f"Gamma/Gemini HTTP error: {e}"}), 502
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    def generate():
+        if first is None:
+            yield sse_event("chunk", {"text": "Gemini returned an empty response."})
+            yield sse_event("done", {})
+            return
+        yield sse_event("chunk", {"text": first})
+        try:
+            for text in chunks:
+                yield sse_event("chunk", {"text": text})
+        except Exception as e:
+            yield sse_event("error", {"error": f"Gamma/Gemini HTTP error: {e}"})
+            return
+        yield sse_event("done", {})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.route("/ping")
 def ping():
     return jsonify({"status": "ok"})
 
 
+@app.route("/cache/stats")
+def cache_stats():
+    return jsonify(event_cache.stats())
+
+
+@app.route("/insight-cache/stats")
+def insight_cache_stats():
+    return jsonify(insight_cache.stats())
+
+
+@app.route("/resolver/stats")
+def resolver_stats():
+    return jsonify(event_resolver.stats())
+
+
 if __name__ == "__main__":
     print("AI Insight API running on http://127.0.0.1:5002")
     app.run(port=5002, debug=True)
\ No newline at end of file
@@ -0,0 +1,627 @@
+"""
+Async serving mode: AI insight, steamroller and /analyze endpoints in one
+asyncio process.
+
+Gamma and Gemini calls (insights, steamroller lookups, bulk scans and the
+market-wide index behind /top) go through one non-blocking aiohttp client, so
+many concurrent popup clicks are multiplexed on the event loop instead of each
+holding a worker thread for the length of an upstream call. Only the I/O lives
+here: URLs, prompts, response and SSE parsing and the event resolution plan are
+the same helpers poly_event_ai_summarizer.py and main_steamroller.py use. The
+comment sync and classification behind /analyze are still synchronous code and
+run in the default thread pool.
+
+With STEAMROLLER_FEED set (a JSONL replay or a ws:// price feed), the server
+also keeps a SteamrollerStream running and pushes threshold crossings to
+dashboards over server-sent events at /api/steamroller/stream.
+
+By default the same app listens on 5000, 5001 and 5002, so the extension's
+existing URLs keep working:
+
+    python async_server.py
+    python async_server.py --ports 8080
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+from typing import Any, AsyncIterator, Dict, Optional
+
+import aiohttp
+from aiohttp import web
+
+from event_cache import event_cache
+from event_resolver import event_resolver
+from insight_cache import insight_cache
+from poly_event_ai_summarizer import (
+    GAMMA_BASE_URL,
+    DEFAULT_GEMINI_MODEL,
+    EVENT_CACHE_NAMESPACE,
+    HTTP_GET_TIMEOUT,
+    HTTP_POOL_MAXSIZE,
+    HTTP_POST_TIMEOUT,
+    USER_AGENT,
+    HttpError,
+    SseDataParser,
+    build_gemini_prompt,
+    cached_event,
+    checked_event,
+    event_id_url,
+    event_slug_url,
+    first_search_event,
+    gemini_request,
+    gemini_stream_request,
+    is_cacheable_insight,
+    parse_gemini_chunk,
+    parse_gemini_response,
+    plan_event_lookup,
+    prepare_insight,
+    resolved_event,
+    search_request,
+)
+from main_steamroller import (
+    INDEX_AT_STARTUP,
+    INDEX_READY_TIMEOUT,
+    GammaError,
+    bulk_payload,
+    evaluate_event,
+    events_page_params,
+    gamma_error_payload,
+    parse_top_args,
+    steamroller_cache,
+    steamroller_index,
+    top_payload,
+)
+from steamroller_stream import SteamrollerStream, source_from_spec
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(BASE_DIR, "Emotional_Damage_Predictor"))
+import main_api  # noqa: E402  (needs the predictor folder on sys.path)
+
+DEFAULT_PORTS = (5000, 5001, 5002)
+HTTP_TOTAL_CONNECTIONS = int(os.environ.get("ASYNC_HTTP_TOTAL_CONNECTIONS", "100"))
+STEAMROLLER_FEED = os.environ.get("STEAMROLLER_FEED")  # JSONL file or ws:// URL; unset = no streaming
+STEAMROLLER_FEED_REALTIME = os.environ.get("STEAMROLLER_FEED_REALTIME", "false").lower() == "true"
+SSE_KEEPALIVE_SECONDS = 15.0
+
+steamroller_stream = SteamrollerStream()
+
+
+# ----- Async upstream client -----
+
+_client: Optional[aiohttp.ClientSession] = None
+
+
+def get_client() -> aiohttp.ClientSession:
+    if _client is None:
+        raise RuntimeError("HTTP client is not started")
+    return _client
+
+
+async def fetch_json(
+    method: str,
+    url: str,
+    params: Optional[Dict[str, Any]] = None,
+    body: Optional[Dict[str, Any]] = None,
+    headers: Optional[Dict[str, str]] = None,
+    timeout: float = HTTP_GET_TIMEOUT,
+) -> Any:
+    """Non-blocking JSON request; errors are raised as HttpError like the sync helpers."""
+    try:
+        async with get_client().request(
+            method,
+            url,
+            params=params,
+            json=body,
+            headers=headers,
+            timeout=aiohttp.ClientTimeout(total=timeout),
+        ) as resp:
+            resp.raise_for_status()
+            data = await resp.read()
+    except Exception as e:
+        status = e.status if isinstance(e, aiohttp.ClientResponseError) else None
+        raise HttpError(f"{method} {url} failed: {e}", status_code=status) from e
+
+    try:
+        return json.loads(data.decode("utf-8"))
+    except Exception as e:
+        raise HttpError(f"Failed to decode JSON from {url}: {e}") from e
+
+
+# ----- Async Gamma helpers (requests and parsing from poly_event_ai_summarizer) -----
+
+async def get_event_by_slug(slug: str) -> Optional[Dict[str, Any]]:
+    async def fetch(s: str) -> Optional[Dict[str, Any]]:
+        return checked_event(await fetch_json("GET", event_slug_url(s)))
+
+    return await event_cache.aget(slug, fetch, namespace=EVENT_CACHE_NAMESPACE)
+
+
+async def get_event_by_id(event_id: str) -> Optional[Dict[str, Any]]:
+    return checked_event(await fetch_json("GET", event_id_url(event_id)))
+
+
+async def search_event(query: str) -> Optional[Dict[str, Any]]:
+    url, params = search_request(query)
+    return first_search_event(await fetch_json("GET", url, params=params))
+
+
+async def load_event_from_query(raw_query: str) -> Dict[str, Any]:
+    """Async poly_event_ai_summarizer.load_event_from_query (same plan, aresolve)."""
+    mode, value, strategy, key = plan_event_lookup(raw_query)
+    cached = cached_event(strategy, key)
+    if cached:
+        return cached
+
+    direct = {"slug": get_event_by_slug, "id": get_event_by_id}.get(strategy)
+    ev = await event_resolver.aresolve(
+        strategy,
+        key,
+        (lambda: direct(key)) if direct and key else None,
+        lambda: search_event(value),
+    )
+    return resolved_event(ev, mode)
+
+
+# ----- Async steamroller Gamma calls (GammaError on non-200, like main_steamroller) -----
+
+async def gamma_get(path: str, params: Optional[Dict[str, Any]] = None, timeout: float = 5) -> Any:
+    async with get_client().get(
+        f"{GAMMA_BASE_URL}{path}",
+        params=params,
+        timeout=aiohttp.ClientTimeout(total=timeout),
+    ) as resp:
+        if resp.status != 200:
+            raise GammaError(resp.status, await resp.text())
+        return await resp.json(content_type=None)
+
+
+async def fetch_steamroller_event(slug: str) -> Dict[str, Any]:
+    return await gamma_get(f"/events/slug/{slug}")
+
+
+async def fetch_events_page(offset: int, limit: int = 100, **filters) -> list:
+    return await gamma_get("/events", params=events_page_params(offset, limit, **filters), timeout=10)
+
+
+async def fetch_events_by_tag(tag: str, max_events: int = 500, page_size: int = 100) -> list:
+    events = []
+    offset = 0
+    while len(events) < max_events:
+        page = await fetch_events_page(offset, page_size, tag_slug=tag)
+        if not page:
+            break
+        events.extend(page)
+        offset += page_size
+    return events[:max_events]
+
+
+async def fetch_events_by_slugs(slugs: list) -> tuple:
+    """Concurrent slug lookups through the steamroller cache; returns (events, errors)."""
+    async def fetch(slug: str):
+        try:
+            return await steamroller_cache.aget(slug, fetch_steamroller_event), None
+        except Exception as e:
+            return None, {"slug": slug, **gamma_error_payload(e)}
+
+    events, errors = [], []
+    for event, error in await asyncio.gather(*(fetch(slug) for slug in slugs)):
+        if error is not None:
+            errors.append(error)
+        else:
+            events.append(event)
+    return events, errors
+
+
+async def seed_stream_from_gamma(page_size: int = 100) -> int:
+    """Load every active market into the price stream so ticks have state to update."""
+    offset = 0
+    while True:
+        page = await fetch_json("GET", f"{GAMMA_BASE_URL}/events", params=events_page_params(offset, page_size))
+        if not page:
+            break
+        steamroller_stream.seed(page)
+        offset += page_size
+    return len(steamroller_stream.markets)
+
+
+async def call_gemini_insight(prompt: str, api_key: str, model: str = DEFAULT_GEMINI_MODEL) -> str:
+    url, body = gemini_request(prompt, model)
+    resp = await fetch_json(
+        "POST",
+        url,
+        body=body,
+        headers={"x-goog-api-key": api_key},
+        timeout=HTTP_POST_TIMEOUT,
+    )
+    return parse_gemini_response(resp)
+
+
+async def generate_insight_from_query(query: str, model: str = DEFAULT_GEMINI_MODEL) -> str:
+    """Async twin of poly_event_ai_summarizer.generate_insight_from_query."""
+    event = await load_event_from_query(query)
+    markets, api_key, cache_key = prepare_insight(event, model)
+
+    cached = await asyncio.to_thread(insight_cache.get, cache_key)
+    if cached is not None:
+        return cached
+
+    prompt = build_gemini_prompt(event, markets)
+    insight = await call_gemini_insight(prompt, api_key, model=model)
+    if is_cacheable_insight(insight):
+        await asyncio.to_thread(insight_cache.put, cache_key, insight)
+    return insight
+
+
+async def stream_gemini_insight(prompt: str, api_key: str, model: str = DEFAULT_GEMINI_MODEL) -> AsyncIterator[str]:
+    """Async twin of poly_event_ai_summarizer.stream_gemini_insight."""
+    url, body, headers = gemini_stream_request(prompt, api_key, model)
+    try:
+        resp = await get_client().post(
+            url,
+            json=body,
+            headers=headers,
+            timeout=aiohttp.ClientTimeout(total=HTTP_POST_TIMEOUT),
+        )
+        resp.raise_for_status()
+    except Exception as e:
+        raise HttpError(f"POST {url} failed: {e}") from e
+
+    async with resp:
+        parser = SseDataParser()
+        try:
+            async for raw in resp.content:
+                data = parser.feed(raw.decode("utf-8").rstrip("\r\n"))
+                if data is not None:
+                    text = parse_gemini_chunk(json.loads(data))
+                    if text:
+                        yield text
+            data = parser.flush()
+            if data is not None:
+                text = parse_gemini_chunk(json.loads(data))
+                if text:
+                    yield text
+        except json.JSONDecodeError as e:
+            raise HttpError(f"Failed to decode streamed JSON from {url}: {e}") from e
+        except aiohttp.ClientError as e:
+            raise HttpError(f"Stream from {url} failed: {e}") from e
+
+
+async def stream_insight_from_query(query: str, model: str = DEFAULT_GEMINI_MODEL) -> AsyncIterator[str]:
+    """Async twin of poly_event_ai_summarizer.stream_insight_from_query."""
+    event = await load_event_from_query(query)
+    markets, api_key, cache_key = prepare_insight(event, model)
+
+    cached = await asyncio.to_thread(insight_cache.get, cache_key)
+    if cached is not None:
+        yield cached
+        return
+
+    prompt = build_gemini_prompt(event, markets)
+    chunks = []
+    async for text in stream_gemini_insight(prompt, api_key, model=model):
+        chunks.append(text)
+        yield text
+
+    insight = "".join(chunks).strip()
+    if insight:
+        await asyncio.to_thread(insight_cache.put, cache_key, insight)
+
+
+# ----- Handlers -----
+
+async def ai_insight(request: web.Request) -> web.Response:
+    try:
+        data = await request.json()
+    except Exception:
+        data = {}
+    slug = (data or {}).get("slug")
+
+    if not slug:
+        return web.json_response({"error": "Missing slug"}, status=400)
+
+    try:
+        insight = await generate_insight_from_query(slug)
+        return web.json_response({"insight": insight})
+    except HttpError as e:
+        return web.json_response({"error": f"Gamma/Gemini HTTP error: {e}"}, status=502)
+    except Exception as e:
+        return web.json_response({"error": str(e)}, status=500)
+
+
+async def ai_insight_stream(request: web.Request) -> web.StreamResponse:
+    try:
+        data = await request.json()
+    except Exception:
+        data = {}
+    slug = (data or {}).get("slug")
+
+    if not slug:
+        return web.json_response({"error": "Missing slug"}, status=400)
+
+    chunks = stream_insight_from_query(slug)
+    try:
+        # resolve the event and open the Gemini stream before committing to a 200
+        first = await chunks.__anext__()
+    except StopAsyncIteration:
+        first = None
+    except HttpError as e:
+        return web.json_response({"error": f"Gamma/Gemini HTTP error: {e}"}, status=502)
+    except Exception as e:
+        return web.json_response({"error": str(e)}, status=500)
+
+    resp = web.StreamResponse(headers={
+        "Content-Type": "text/event-stream",
+        "Cache-Control": "no-cache",
+        "Access-Control-Allow-Origin": "*",
+    })
+    await resp.prepare(request)
+
+    if first is None:
+        await resp.write(_sse("chunk", {"text": "Gemini returned an empty response."}))
+    else:
+        await resp.write(_sse("chunk", {"text": first}))
+        try:
+            async for text in chunks:
+                await resp.write(_sse("chunk", {"text": text}))
+        except Exception as e:
+            await resp.write(_sse("error", {"error": f"Gamma/Gemini HTTP error: {e}"}))
+            return resp
+    await resp.write(_sse("done", {}))
+    return resp
+
+
+async def steamroller(request: web.Request) -> web.Response:
+    slug = request.query.get("slug")
+    if not slug:
+        return web.json_response({"error": "missing ?slug= parameter"}, status=400)
+
+    try:
+        event = await steamroller_cache.aget(slug, fetch_steamroller_event)
+    except GammaError as e:
+        return web.json_response({
+            "error": "gamma_returned_non_200",
+            "status_code": e.status_code,
+            "body": e.body,
+        }, status=502)
+    except Exception as e:
+        return web.json_response({"error": "failed_to_call_gamma", "details": str(e)}, status=502)
+
+    payload, status = evaluate_event(event, slug)
+    return web.json_response(payload, status=status)
+
+
+async def steamroller_bulk(request: web.Request) -> web.Response:
+    """Same query parameters as main_steamroller's /api/steamroller/bulk."""
+    slugs = list(request.query.getall("slug", []))
+    for chunk in request.query.getall("slugs", []):
+        slugs.extend(s.strip() for s in chunk.split(",") if s.strip())
+    tag = request.query.get("tag")
+
+    if not slugs and not tag:
+        return web.json_response({"error": "pass ?slug=, ?slugs= or ?tag="}, status=400)
+
+    try:
+        limit = int(request.query.get("limit", 50))
+    except ValueError:
+        return web.json_response({"error": "limit must be an integer"}, status=400)
+    include_all = request.query.get("include_all", "false").lower() == "true"
+
+    # Gamma lookups go through the aiohttp client; the numpy scan runs inline
+    try:
+        events = await fetch_events_by_tag(tag) if tag else []
+    except Exception as e:
+        return web.json_response(gamma_error_payload(e), status=502)
+
+    errors = []
+    if slugs:
+        slug_events, errors = await fetch_events_by_slugs(slugs)
+        events.extend(slug_events)
+    payload, status = bulk_payload(events, errors, limit=limit, include_all=include_all)
+    return web.json_response(payload, status=status)
+
+
+async def steamroller_top(request: web.Request) -> web.Response:
+    """Same query parameters as main_steamroller's /api/steamroller/top."""
+    kwargs, error = parse_top_args(request.query)
+    if error:
+        return web.json_response({"error": error}, status=400)
+
+    # the index refreshes from a task on this loop, paging Gamma with aiohttp
+    steamroller_index.astart(fetch_events_page)
+    await steamroller_index.await_ready(INDEX_READY_TIMEOUT)
+    return web.json_response(top_payload(**kwargs))
+
+
+def _sse(event: str, data: Any) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode("utf-8")
+
+
+async def steamroller_stream_events(request: web.Request) -> web.StreamResponse:
+    """
+    Server-sent events: one "snapshot" of current steamrollers, then an
+    "enter" / "exit" / "side_change" event per threshold crossing.
+    """
+    resp = web.StreamResponse(headers={
+        "Content-Type": "text/event-stream",
+        "Cache-Control": "no-cache",
+        "Access-Control-Allow-Origin": "*",
+    })
+    await resp.prepare(request)
+
+    queue = steamroller_stream.subscribe()
+    try:
+        await resp.write(_sse("snapshot", steamroller_stream.steamrollers()))
+        while True:
+            try:
+                message = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                await resp.write(b": keep-alive\n\n")
+                continue
+            await resp.write(_sse(message["type"], message))
+    except (ConnectionResetError, asyncio.CancelledError):
+        pass
+    finally:
+        steamroller_stream.unsubscribe(queue)
+    return resp
+
+
+async def steamroller_stream_stats(request: web.Request) -> web.Response:
+    return web.json_response(steamroller_stream.stats())
+
+
+async def analyze(request: web.Request) -> web.Response:
+    try:
+        data = await request.json()
+    except Exception:
+        data = None
+    if not data or "url" not in data:
+        return web.json_response({"message": "Missing event URL"}, status=400)
+
+    loop = asyncio.get_running_loop()
+    payload, status = await loop.run_in_executor(None, main_api.analyze_event_url, data["url"])
+    return web.json_response(payload, status=status)
+
+
+async def train_status(request: web.Request) -> web.Response:
+    return web.json_response(main_api.training_status())
+
+
+async def cache_stats(request: web.Request) -> web.Response:
+    return web.json_response({**event_cache.stats(), "steamroller": steamroller_cache.stats()})
+
+
+async def label_cache_stats(request: web.Request) -> web.Response:
+    return web.json_response(main_api.label_cache_stats())
+
+
+async def resolver_stats(request: web.Request) -> web.Response:
+    return web.json_response(event_resolver.stats())
+
+
+async def insight_cache_stats(request: web.Request) -> web.Response:
+    return web.json_response(await asyncio.to_thread(insight_cache.stats))
+
+
+async def ping(request: web.Request) -> web.Response:
+    return web.json_response({"status": "ok"})
+
+
+# ----- App -----
+
+@web.middleware
+async def cors_middleware(request: web.Request, handler):
+    if request.method == "OPTIONS":
+        response = web.Response()
+    else:
+        response = await handler(request)
+    if response.prepared:
+        return response  # streamed responses set their own headers
+    response.headers["Access-Control-Allow-Origin"] = "*"
+    response.headers["Access-Control-Allow-Headers"] = "Content-Type"
+    response.headers["Access-Control-Allow-Methods"] = "GET, POST, OPTIONS"
+    return response
+
+
+async def _start_client(app: web.Application) -> None:
+    global _client
+    _client = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=HTTP_TOTAL_CONNECTIONS, limit_per_host=HTTP_POOL_MAXSIZE),
+        headers={"User-Agent": USER_AGENT},
+    )
+
+
+async def _start_stream(app: web.Application) -> None:
+    if not STEAMROLLER_FEED:
+        return
+    if STEAMROLLER_FEED.startswith(("ws://", "wss://")):
+        count = await seed_stream_from_gamma()
+        print(f"Price stream seeded with {count} markets")
+    app["steamroller_stream_task"] = asyncio.create_task(steamroller_stream.run(
+        source_from_spec(STEAMROLLER_FEED, realtime=STEAMROLLER_FEED_REALTIME)
+    ))
+
+
+async def _start_index(app: web.Application) -> None:
+    # otherwise the first /api/steamroller/top request starts it
+    if INDEX_AT_STARTUP:
+        steamroller_index.astart(fetch_events_page)
+
+
+async def _stop_index(app: web.Application) -> None:
+    steamroller_index.stop()
+
+
+async def _stop_stream(app: web.Application) -> None:
+    task = app.get("steamroller_stream_task")
+    if task is not None:
+        task.cancel()
+
+
+async def _close_client(app: web.Application) -> None:
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+
+def create_app() -> web.Application:
+    app = web.Application(middlewares=[cors_middleware])
+    app.on_startup.append(_start_client)
+    app.on_startup.append(_start_stream)
+    app.on_startup.append(_start_index)
+    app.on_cleanup.append(_stop_stream)
+    app.on_cleanup.append(_stop_index)
+    app.on_cleanup.append(_close_client)
+
+    app.router.add_post("/ai-insight", ai_insight)
+    app.router.add_post("/ai-insight/stream", ai_insight_stream)
+    app.router.add_get("/api/steamroller", steamroller)
+    app.router.add_get("/api/steamroller/bulk", steamroller_bulk)
+    app.router.add_get("/api/steamroller/top", steamroller_top)
+    app.router.add_get("/api/steamroller/stream", steamroller_stream_events)
+    app.router.add_get("/api/steamroller/stream/stats", steamroller_stream_stats)
+    app.router.add_post("/analyze", analyze)
+    app.router.add_get("/train/status", train_status)
+    app.router.add_get("/cache/stats", cache_stats)
+    app.router.add_get("/insight-cache/stats", insight_cache_stats)
+    app.router.add_get("/resolver/stats", resolver_stats)
+    app.router.add_get("/label-cache/stats", label_cache_stats)
+    app.router.add_get("/ping", ping)
+    app.router.add_route("OPTIONS", "/{tail:.*}", ping)
+    return app
+
+
+async def serve(host: str, ports) -> None:
+    runner = web.AppRunner(create_app())
+    await runner.setup()
+    for port in ports:
+        await web.TCPSite(runner, host, port).start()
+        print(f"Async API running at http://{host}:{port}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Serve all Poly Predictor Kit endpoints from one asyncio process.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument(
+        "--ports",
+        default=",".join(str(p) for p in DEFAULT_PORTS),
+        help="Comma-separated ports to listen on (default: 5000,5001,5002).",
+    )
+    args = parser.parse_args(argv)
+
+    ports = [int(p) for p in args.ports.split(",") if p.strip()]
+    try:
+        asyncio.run(serve(args.host, ports))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,110 @@
+"""
+Benchmark: fresh urllib connection per call vs the pooled keep-alive client
+behind http_get_json.
+
+Starts a local HTTP/1.1 stand-in for Gamma that adds a fixed delay to every
+new connection (simulating TCP + TLS setup to a remote host), then times a
+"bad slug -> search fallback" resolution, which is two GETs.
+
+    python benchmark_http_pool.py --resolutions 200 --handshake-ms 40
+"""
+import argparse
+import json
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from poly_event_ai_summarizer import USER_AGENT, HttpError, configure_http_pool, http_get_json
+
+SEARCH_PAYLOAD = json.dumps({"events": [{"id": "1", "slug": "some-event", "title": "Some event"}]}).encode("utf-8")
+
+
+def make_handler(handshake_delay):
+    class GammaStandIn(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive
+        disable_nagle_algorithm = True  # avoid 40 ms delayed-ACK stalls on small writes
+
+        def setup(self):
+            time.sleep(handshake_delay)  # paid once per connection
+            super().setup()
+
+        def do_GET(self):
+            if self.path.startswith("/public-search"):
+                status, body = 200, SEARCH_PAYLOAD
+            else:
+                status, body = 404, b'{"error": "not found"}'
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return GammaStandIn
+
+
+def urllib_get_json(url, params=None):
+    """The previous http_get_json: a new urllib connection per request."""
+    if params:
+        url = f"{url}?{urllib.parse.urlencode(params, doseq=True)}"
+    req = urllib.request.Request(url, headers={"User-Agent": USER_AGENT}, method="GET")
+    try:
+        with urllib.request.urlopen(req, timeout=15) as resp:
+            return json.loads(resp.read().decode("utf-8"))
+    except urllib.error.HTTPError as e:
+        raise HttpError(str(e)) from e
+
+
+def resolve(get_json, base_url):
+    try:
+        get_json(f"{base_url}/events/slug/not-a-real-slug")
+    except HttpError:
+        pass
+    return get_json(f"{base_url}/public-search", params={"q": "some event"})
+
+
+def time_resolutions(get_json, base_url, n):
+    latencies = []
+    for _ in range(n):
+        start = time.perf_counter()
+        resolve(get_json, base_url)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--resolutions", type=int, default=200)
+    parser.add_argument("--handshake-ms", type=float, default=40.0)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(args.handshake_ms / 1000.0))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    configure_http_pool()
+    results = {
+        "urllib (new connection per call)": time_resolutions(urllib_get_json, base_url, args.resolutions),
+        "pooled keep-alive session": time_resolutions(http_get_json, base_url, args.resolutions),
+    }
+    server.shutdown()
+
+    print(f"{args.resolutions} resolutions (2 GETs each), {args.handshake_ms:.0f} ms simulated handshake")
+    for name, lat in results.items():
+        p50 = lat[len(lat) // 2] * 1000
+        p95 = lat[int(len(lat) * 0.95) - 1] * 1000
+        print(f"{name:34s} p50 {p50:7.2f} ms   p95 {p95:7.2f} ms   total {sum(lat):6.2f} s")
+
+    old_p50 = results["urllib (new connection per call)"][args.resolutions // 2]
+    new_p50 = results["pooled keep-alive session"][args.resolutions // 2]
+    print(f"Saved per resolution (p50): {(old_p50 - new_p50) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
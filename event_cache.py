@@ -0,0 +1,233 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+# ----- Config -----
+
+DEFAULT_MAX_ENTRIES = int(os.environ.get("EVENT_CACHE_MAX_ENTRIES", "512"))
+DEFAULT_TTL = float(os.environ.get("EVENT_CACHE_TTL", "30"))
+DEFAULT_STALE_TTL = float(os.environ.get("EVENT_CACHE_STALE_TTL", "300"))
+
+
+class _Call:
+    """One upstream load that any number of callers can wait on."""
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class EventCache:
+    """
+    Thread-safe LRU cache for Gamma event lookups (slug -> event dict).
+
+    - Entries younger than `ttl` are served as-is.
+    - Entries up to `ttl + stale_ttl` old are served immediately while one
+      background refresh fetches a new copy (stale-while-revalidate).
+    - Concurrent misses for the same slug share a single upstream call.
+    - `None` results (event not found) are never cached.
+
+    Callers whose loaders return different shapes for the same slug pass
+    their own `namespace`, so they never read each other's entries.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        ttl: float = DEFAULT_TTL,
+        stale_ttl: float = DEFAULT_STALE_TTL,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()  # (namespace, slug) -> (event, fetched_at)
+        self._inflight: Dict[tuple, _Call] = {}
+        self._async_inflight: Dict[tuple, "asyncio.Future"] = {}
+        self._stats = {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "inflight_waits": 0,
+            "refreshes": 0,
+            "refresh_errors": 0,
+            "evictions": 0,
+        }
+
+    def _lookup(self, key: tuple) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """Classify a cached entry as fresh / stale / miss. Call with the lock held."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return "miss", None
+
+        event, fetched_at = entry
+        age = time.monotonic() - fetched_at
+        if age < self.ttl:
+            self._stats["hits"] += 1
+            self._entries.move_to_end(key)
+            return "fresh", event
+        if age < self.ttl + self.stale_ttl:
+            self._stats["stale_hits"] += 1
+            self._entries.move_to_end(key)
+            return "stale", event
+        return "miss", None
+
+    def _loading(self, key: tuple) -> bool:
+        return key in self._inflight or key in self._async_inflight
+
+    def peek(self, slug: str, namespace: str = "") -> Optional[Dict[str, Any]]:
+        """Return the event only if it is cached and fresh; never loads."""
+        key = (namespace, slug)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[1] >= self.ttl:
+                return None
+            self._stats["hits"] += 1
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def get(
+        self,
+        slug: str,
+        loader: Callable[[str], Optional[Dict[str, Any]]],
+        namespace: str = "",
+    ) -> Optional[Dict[str, Any]]:
+        """Return the cached event for `slug`, calling `loader(slug)` when needed."""
+        key = (namespace, slug)
+        with self._lock:
+            state, event = self._lookup(key)
+            if state == "fresh":
+                return event
+
+            if state == "stale":
+                refresh_call = None
+                if not self._loading(key):
+                    self._stats["refreshes"] += 1
+                    refresh_call = self._inflight[key] = _Call()
+            else:
+                call = self._inflight.get(key)
+                if call is not None:
+                    self._stats["inflight_waits"] += 1
+                    leader = False
+                else:
+                    self._stats["misses"] += 1
+                    call = self._inflight[key] = _Call()
+                    leader = True
+
+        if state == "stale":
+            if refresh_call is not None:
+                threading.Thread(
+                    target=self._load,
+                    args=(key, loader, refresh_call, True),
+                    name=f"event-cache-refresh-{slug}",
+                    daemon=True,
+                ).start()
+            return event
+
+        if leader:
+            self._load(key, loader, call, False)
+        else:
+            call.done.wait()
+
+        if call.error is not None:
+            raise call.error
+        return call.value
+
+    def _load(self, key: tuple, loader: Callable, call: _Call, is_refresh: bool) -> None:
+        try:
+            call.value = loader(key[1])
+        except BaseException as e:
+            call.error = e
+        finally:
+            with self._lock:
+                if call.error is None and call.value is not None:
+                    self._store(key, call.value)
+                elif is_refresh:
+                    self._stats["refresh_errors"] += 1
+                self._inflight.pop(key, None)
+            call.done.set()
+
+    async def aget(
+        self,
+        slug: str,
+        loader: Callable[[str], Awaitable[Optional[Dict[str, Any]]]],
+        namespace: str = "",
+    ) -> Optional[Dict[str, Any]]:
+        """
+        asyncio version of get(): `loader` is a coroutine function. Concurrent
+        misses on the event loop share one task; stale entries are refreshed
+        by a background task.
+        """
+        key = (namespace, slug)
+        with self._lock:
+            state, event = self._lookup(key)
+            if state == "fresh":
+                return event
+
+            if state == "stale":
+                if not self._loading(key):
+                    self._stats["refreshes"] += 1
+                    self._async_inflight[key] = asyncio.ensure_future(self._aload(key, loader, True))
+                return event
+
+            task = self._async_inflight.get(key)
+            if task is not None:
+                self._stats["inflight_waits"] += 1
+            else:
+                self._stats["misses"] += 1
+                task = self._async_inflight[key] = asyncio.ensure_future(self._aload(key, loader, False))
+
+        return await asyncio.shield(task)
+
+    async def _aload(self, key: tuple, loader: Callable, is_refresh: bool) -> Optional[Dict[str, Any]]:
+        try:
+            value = await loader(key[1])
+        except Exception:
+            with self._lock:
+                self._async_inflight.pop(key, None)
+                if is_refresh:
+                    self._stats["refresh_errors"] += 1
+                    return None  # keep serving the stale entry
+            raise
+
+        with self._lock:
+            if value is not None:
+                self._store(key, value)
+            elif is_refresh:
+                self._stats["refresh_errors"] += 1
+            self._async_inflight.pop(key, None)
+        return value
+
+    def _store(self, key: tuple, event: Dict[str, Any]) -> None:
+        self._entries[key] = (event, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def invalidate(self, slug: str, namespace: str = "") -> None:
+        with self._lock:
+            self._entries.pop((namespace, slug), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        lookups = stats["hits"] + stats["stale_hits"] + stats["misses"] + stats["inflight_waits"]
+        stats["hit_rate"] = (stats["hits"] + stats["stale_hits"]) / lookups if lookups else 0.0
+        return stats
+
+
+# Shared per-process cache used by the summarizer and the comments receiver
+# (each under its own namespace). The steamroller API keeps its own short-lived
+# cache, see main_steamroller.steamroller_cache.
+event_cache = EventCache()
@@ -0,0 +1,326 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+# ----- Config -----
+
+NEGATIVE_CACHE_TTL = float(os.environ.get("RESOLVER_NEGATIVE_TTL", "300"))
+NEGATIVE_CACHE_MAX_ENTRIES = int(os.environ.get("RESOLVER_NEGATIVE_MAX_ENTRIES", "4096"))
+# How long to keep waiting for the direct lookup once search has answered
+# with an event that does not match the query.
+DIRECT_GRACE_SECONDS = float(os.environ.get("RESOLVER_DIRECT_GRACE", "2.0"))
+RESOLVER_WORKERS = int(os.environ.get("RESOLVER_WORKERS", "16"))
+LATENCY_SAMPLES = 512
+
+Event = Optional[Dict[str, Any]]
+
+
+def event_matches(event: Event, key: str) -> bool:
+    """True if `event` is the one a slug / id query asked for."""
+    return bool(event) and (event.get("slug") == key or str(event.get("id")) == key)
+
+
+class NegativeCache:
+    """Slugs / ids the direct lookup recently answered 404 for."""
+
+    def __init__(self, ttl: float = NEGATIVE_CACHE_TTL, max_entries: int = NEGATIVE_CACHE_MAX_ENTRIES) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, float]" = OrderedDict()  # key -> expires_at
+
+    def add(self, key: str) -> None:
+        with self._lock:
+            self._entries[key] = time.monotonic() + self.ttl
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            expires_at = self._entries.get(key)
+            if expires_at is None:
+                return False
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return False
+            return True
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class _StrategyStats:
+    def __init__(self) -> None:
+        self.calls = 0
+        self.found = 0
+        self.misses = 0
+        self.errors = 0
+        self.wins = 0
+        self.abandoned = 0
+        self.latencies: deque = deque(maxlen=LATENCY_SAMPLES)
+
+    def snapshot(self) -> Dict[str, Any]:
+        lat = sorted(self.latencies)
+        pct = (lambda q: round(lat[min(len(lat) - 1, int(len(lat) * q))] * 1000, 2)) if lat else (lambda q: None)
+        return {
+            "calls": self.calls,
+            "found": self.found,
+            "misses": self.misses,
+            "errors": self.errors,
+            "wins": self.wins,
+            "abandoned": self.abandoned,
+            "latency_ms_p50": pct(0.5),
+            "latency_ms_p95": pct(0.95),
+        }
+
+
+class _Race:
+    """
+    Decision rules of one hedged resolution, shared by resolve() and
+    aresolve(): they only differ in how they wait for the two lookups.
+    """
+
+    def __init__(self, strategy: str, key: str, grace: float, negative_cache: NegativeCache) -> None:
+        self.strategy = strategy
+        self.key = key
+        self.grace = grace
+        self.negative_cache = negative_cache
+        self.fallback: Event = None
+        self.search_error: Optional[BaseException] = None
+        self.deadline: Optional[float] = None
+
+    def finished(self, is_direct: bool, event: Event, error: Optional[BaseException], direct_pending: bool) -> Optional[str]:
+        """Take one finished lookup; returns the winning strategy if it decides the race."""
+        if is_direct:
+            if event:
+                return self.strategy
+            if error is None or getattr(error, "status_code", None) == 404:
+                self.negative_cache.add(self.key)
+        elif error is not None:
+            self.search_error = error
+        elif event_matches(event, self.key):
+            return "search"
+        else:
+            self.fallback = event
+            if direct_pending:
+                self.deadline = time.monotonic() + self.grace
+        return None
+
+    def timeout(self) -> Optional[float]:
+        """How long to wait for the next lookup (None: until one finishes)."""
+        return None if self.deadline is None else max(0.0, self.deadline - time.monotonic())
+
+
+class HedgedResolver:
+    """
+    Resolve a query to a Gamma event by racing the direct lookup (slug / id)
+    against /public-search.
+
+    - If the direct lookup finds the event it wins, as before.
+    - A search hit that matches the slug / id wins immediately.
+    - A search hit that does not match is only used if the direct lookup
+      misses (or has not answered DIRECT_GRACE_SECONDS later).
+    - The loser is cancelled (async) or abandoned (threads; its result is
+      dropped when it finishes).
+    - Slugs / ids the direct lookup answered 404 for go into a negative
+      cache and skip straight to search until they expire.
+    """
+
+    def __init__(self, negative_cache: Optional[NegativeCache] = None, grace: float = DIRECT_GRACE_SECONDS) -> None:
+        self.negative_cache = negative_cache or NegativeCache()
+        self.grace = grace
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._stats: Dict[str, _StrategyStats] = {}
+        self._counters = {"resolutions": 0, "hedged": 0, "negative_hits": 0, "unresolved": 0}
+
+    # ----- Bookkeeping -----
+
+    def _strategy(self, name: str) -> _StrategyStats:
+        stats = self._stats.get(name)
+        if stats is None:
+            stats = self._stats.setdefault(name, _StrategyStats())
+        return stats
+
+    def _record(self, name: str, started: float, event: Event = None, error: bool = False) -> None:
+        with self._lock:
+            stats = self._strategy(name)
+            stats.calls += 1
+            stats.latencies.append(time.monotonic() - started)
+            if error:
+                stats.errors += 1
+            elif event:
+                stats.found += 1
+            else:
+                stats.misses += 1
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    def _abandoned(self, strategy: str) -> None:
+        with self._lock:
+            self._strategy(strategy).abandoned += 1
+
+    def _win(self, strategy: str, event: Event) -> Event:
+        if event:
+            with self._lock:
+                self._strategy(strategy).wins += 1
+        return event
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out = dict(self._counters)
+            out["strategies"] = {name: s.snapshot() for name, s in self._stats.items()}
+        out["negative_cache_size"] = len(self.negative_cache)
+        return out
+
+    def _search_only(self, key: Optional[str], has_direct: bool) -> bool:
+        """Count a resolution; True if only search should run for it."""
+        self._count("resolutions")
+        if not has_direct or not key:
+            return True
+        if key in self.negative_cache:
+            self._count("negative_hits")
+            return True
+        self._count("hedged")
+        return False
+
+    def _race_over(self, race: _Race) -> Event:
+        """Outcome when neither lookup won outright."""
+        if race.fallback:
+            return self._win("search", race.fallback)
+        if race.search_error is not None:
+            raise race.search_error
+        self._count("unresolved")
+        return None
+
+    # ----- Threaded -----
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=RESOLVER_WORKERS, thread_name_prefix="resolver")
+        return self._pool
+
+    def _timed(self, name: str, fn: Callable[[], Event]) -> Event:
+        started = time.monotonic()
+        try:
+            event = fn()
+        except BaseException as e:
+            self._record(name, started, error=getattr(e, "status_code", None) != 404)
+            raise
+        self._record(name, started, event)
+        return event
+
+    def resolve(
+        self,
+        strategy: str,
+        key: Optional[str],
+        direct: Optional[Callable[[], Event]],
+        search: Callable[[], Event],
+    ) -> Event:
+        """
+        strategy: "slug" or "id" (name used in metrics); key: the slug / id.
+        direct / search: zero-argument callables returning an event or None.
+        Without a direct lookup (plain search, or a negatively cached key)
+        only search runs.
+        """
+        if self._search_only(key, direct is not None):
+            return self._win("search", self._timed("search", search))
+
+        race = _Race(strategy, key, self.grace, self.negative_cache)
+        pool = self._get_pool()
+        direct_future = pool.submit(self._timed, strategy, direct)
+        search_future = pool.submit(self._timed, "search", search)
+        pending = {direct_future, search_future}
+
+        while pending:
+            done, pending = wait(pending, timeout=race.timeout(), return_when=FIRST_COMPLETED)
+            if not done:
+                break  # grace period over, direct lookup still running
+
+            for future in done:
+                error = future.exception()
+                event = None if error else future.result()
+                winner = race.finished(future is direct_future, event, error, direct_future in pending)
+                if winner == strategy:
+                    self._abandon(search_future, "search")
+                elif winner:
+                    self._abandon(direct_future, strategy)
+                if winner:
+                    return self._win(winner, event)
+
+        if direct_future in pending:
+            self._abandon(direct_future, strategy)
+        return self._race_over(race)
+
+    def _abandon(self, future, strategy: str) -> None:
+        if not future.done():
+            future.cancel()
+            self._abandoned(strategy)
+
+    # ----- asyncio -----
+
+    async def _atimed(self, name: str, fn: Callable[[], Awaitable[Event]]) -> Event:
+        started = time.monotonic()
+        try:
+            event = await fn()
+        except asyncio.CancelledError:
+            raise
+        except BaseException as e:
+            self._record(name, started, error=getattr(e, "status_code", None) != 404)
+            raise
+        self._record(name, started, event)
+        return event
+
+    async def aresolve(
+        self,
+        strategy: str,
+        key: Optional[str],
+        direct: Optional[Callable[[], Awaitable[Event]]],
+        search: Callable[[], Awaitable[Event]],
+    ) -> Event:
+        """asyncio version of resolve(): the losing request is cancelled."""
+        if self._search_only(key, direct is not None):
+            return self._win("search", await self._atimed("search", search))
+
+        race = _Race(strategy, key, self.grace, self.negative_cache)
+        direct_task = asyncio.ensure_future(self._atimed(strategy, direct))
+        search_task = asyncio.ensure_future(self._atimed("search", search))
+        pending = {direct_task, search_task}
+
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, timeout=race.timeout(), return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    break
+
+                for task in done:
+                    error = task.exception()
+                    event = None if error else task.result()
+                    winner = race.finished(task is direct_task, event, error, direct_task in pending)
+                    if winner:
+                        return self._win(winner, event)
+        finally:
+            for task, name in ((direct_task, strategy), (search_task, "search")):
+                if not task.done():
+                    task.cancel()
+                    self._abandoned(name)
+
+        return self._race_over(race)
+
+
+# Shared per-process resolver used by the summarizer and the async server.
+event_resolver = HedgedResolver()
@@ -0,0 +1,132 @@
+"""
+Local stand-in for Gemini (and the Gamma event lookups) for testing the
+insight and steamroller endpoints without network access or an API key.
+
+    python fake_gemini_server.py --port 8765 --chunk-delay 0.3
+    GEMINI_BASE_URL=http://127.0.0.1:8765/v1beta GAMMA_BASE_URL=http://127.0.0.1:8765 \\
+        GEMINI_API_KEY=fake python ai_insight_api.py
+
+generateContent answers with the whole text (or, for JSON-mode prompts with
+"=== EVENT <id> ===" blocks, a JSON array with one insight per id);
+streamGenerateContent?alt=sse sends it as SSE chunks, one every --chunk-delay
+seconds.
+"""
+import argparse
+import json
+import re
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+INSIGHT_TEXT = (
+    "Summary: The market prices the favourite at 93%. "
+    "Key drivers: recent polling and resolution wording. "
+    "Risks: a late upset would wipe out roughly thirteen wins. "
+    "Not financial advice."
+)
+
+
+def fake_event(slug):
+    return {
+        "id": "1",
+        "slug": slug,
+        "title": f"Fake event {slug}",
+        "active": True,
+        "closed": False,
+        "endDate": "2030-01-01T00:00:00Z",
+        "markets": [{
+            "id": "11",
+            "question": "Will the favourite win?",
+            "active": True,
+            "closed": False,
+            "outcomes": '["Yes", "No"]',
+            "outcomePrices": '["0.93", "0.07"]',
+            "volume": "12345",
+            "endDate": "2030-01-01T00:00:00Z",
+        }],
+    }
+
+
+def split_chunks(text, n_chunks):
+    words = text.split(" ")
+    step = max(1, len(words) // n_chunks)
+    return [" ".join(words[i:i + step]) + (" " if i + step < len(words) else "") for i in range(0, len(words), step)]
+
+
+def make_handler(chunk_delay, n_chunks):
+    class FakeGemini(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def _json(self, status, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urllib.parse.urlparse(self.path)
+            query = urllib.parse.parse_qs(url.query)
+            if url.path.startswith("/events/slug/"):
+                self._json(200, fake_event(url.path.rsplit("/", 1)[-1]))
+            elif url.path == "/events":
+                # one page of active events, then the end of the listing
+                first_page = query.get("offset", ["0"])[0] == "0"
+                self._json(200, [fake_event("fake-listed-event")] if first_page else [])
+            elif url.path == "/public-search":
+                self._json(200, {"events": [fake_event(query.get("q", [""])[0])]})
+            else:
+                self._json(404, {"error": "not found"})
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+            json_mode = (request.get("generationConfig") or {}).get("responseMimeType") == "application/json"
+
+            if ":streamGenerateContent" in self.path:
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for chunk in split_chunks(INSIGHT_TEXT, n_chunks):
+                    time.sleep(chunk_delay)
+                    payload = {"candidates": [{"content": {"parts": [{"text": chunk}], "role": "model"}}]}
+                    event = f"data: {json.dumps(payload)}\r\n\r\n".encode("utf-8")
+                    self.wfile.write(f"{len(event):x}\r\n".encode("ascii") + event + b"\r\n")
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+            elif ":generateContent" in self.path:
+                time.sleep(chunk_delay * n_chunks)  # same total generation time
+                text = INSIGHT_TEXT
+                if json_mode:
+                    prompt = request["contents"][0]["parts"][0]["text"]
+                    ids = [int(i) for i in re.findall(r"=== EVENT (\d+) ===", prompt)]
+                    text = json.dumps([{"id": i, "insight": f"[{i}] {INSIGHT_TEXT}"} for i in ids])
+                self._json(200, {"candidates": [{"content": {"parts": [{"text": text}]}}]})
+            else:
+                self._json(404, {"error": "not found"})
+
+        def log_message(self, *args):
+            pass
+
+    return FakeGemini
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--chunk-delay", type=float, default=0.3)
+    parser.add_argument("--chunks", type=int, default=6)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(args.chunk_delay, args.chunks))
+    print(f"Fake Gemini/Gamma listening on http://127.0.0.1:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+# ----- Config -----
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CACHE_PATH = os.environ.get("INSIGHT_CACHE_PATH", os.path.join(BASE_DIR, "insight_cache.sqlite3"))
+DEFAULT_TTL = float(os.environ.get("INSIGHT_CACHE_TTL", "900"))
+DEFAULT_MAX_ENTRIES = int(os.environ.get("INSIGHT_CACHE_MAX_ENTRIES", "2000"))
+DEFAULT_PRICE_PRECISION = float(os.environ.get("INSIGHT_CACHE_PRICE_PRECISION", "0.01"))
+DEFAULT_VOLUME_PRECISION = float(os.environ.get("INSIGHT_CACHE_VOLUME_PRECISION", "0.05"))
+
+
+# ----- Key helpers -----
+
+def bucket_price(price: Optional[float], precision: float) -> Optional[int]:
+    """0.537 with precision 0.01 -> 54."""
+    if price is None:
+        return None
+    return int(round(price / precision))
+
+
+def bucket_volume(volume: Optional[float], precision: float) -> Optional[int]:
+    """
+    Volumes grow all the time, so they are bucketed on a log scale:
+    with precision 0.05, values within ~5% of each other share a bucket.
+    """
+    if volume is None:
+        return None
+    if volume <= 0:
+        return 0
+    return int(math.floor(math.log(volume) / math.log1p(precision)))
+
+
+def hash_inputs(canonical: Dict[str, Any]) -> str:
+    """Stable sha256 of a JSON-serialisable dict of prompt inputs."""
+    payload = json.dumps(canonical, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# ----- Cache -----
+
+class InsightCache:
+    """
+    On-disk (SQLite) cache of generated insights.
+
+    Entries expire after `ttl` seconds; once more than `max_entries` are
+    stored, the least recently used ones are evicted.
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_CACHE_PATH,
+        ttl: float = DEFAULT_TTL,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        price_precision: float = DEFAULT_PRICE_PRECISION,
+        volume_precision: float = DEFAULT_VOLUME_PRECISION,
+    ) -> None:
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.price_precision = price_precision
+        self.volume_precision = volume_precision
+
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+        self._initialized = False  # the file is created on first use, not on import
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # Always called with self._lock held
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:  # commit / rollback
+                if not self._initialized:
+                    self._init_db(conn)
+                    self._initialized = True
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _init_db(conn: sqlite3.Connection) -> None:
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS insights (
+                key         TEXT PRIMARY KEY,
+                insight     TEXT NOT NULL,
+                created     REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS insights_last_access ON insights (last_access)")
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT insight FROM insights WHERE key = ? AND created >= ?",
+                (key, now - self.ttl),
+            ).fetchone()
+            if row is None:
+                self._stats["misses"] += 1
+                return None
+            conn.execute("UPDATE insights SET last_access = ? WHERE key = ?", (now, key))
+            self._stats["hits"] += 1
+            return row[0]
+
+    def put(self, key: str, insight: str) -> None:
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO insights (key, insight, created, last_access) VALUES (?, ?, ?, ?)",
+                (key, insight, now, now),
+            )
+            self._stats["writes"] += 1
+
+            # Drop expired rows, then trim to max_entries by least recent use
+            cur = conn.execute("DELETE FROM insights WHERE created < ?", (now - self.ttl,))
+            evicted = cur.rowcount
+            (count,) = conn.execute("SELECT COUNT(*) FROM insights").fetchone()
+            if count > self.max_entries:
+                cur = conn.execute(
+                    "DELETE FROM insights WHERE key IN "
+                    "(SELECT key FROM insights ORDER BY last_access ASC LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+                evicted += cur.rowcount
+            self._stats["evictions"] += max(evicted, 0)
+
+    def clear(self) -> None:
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM insights")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock, self._connect() as conn:
+            (size,) = conn.execute("SELECT COUNT(*) FROM insights").fetchone()
+            stats = dict(self._stats)
+        stats["size"] = size
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+# Shared per-process insight cache
+insight_cache = InsightCache()
@@ -2,12 +2,37 @@ from flask import Flask, request, jsonify
 from flask_cors import CORS
 import requests
 from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
 import math
+import os
 import json
 
+from event_cache import EventCache
+from steamroller_index import SORT_KEYS, SteamrollerIndex
+from steamroller_scan import (
+    EPS,
+    RISK_MEDIUM_P,
+    SCORE_HIGH,
+    SCORE_MEDIUM,
+    STEAMROLLER_MIN_P,
+    STEAMROLLER_MIN_WIPEOUT,
+    TIME_RISK_HIGH,
+    TIME_RISK_MEDIUM,
+    TIME_RISK_MULTIPLIERS,
+    scan_events,
+)
+
 # ---------- Config ----------
 
 GAMMA_BASE_URL = "https://gamma-api.polymarket.com"
+INDEX_REFRESH_SECONDS = float(os.environ.get("STEAMROLLER_INDEX_REFRESH_SECONDS", "60"))
+# how long a /top request may wait for the index's first pass after a (re)start
+INDEX_READY_TIMEOUT = float(os.environ.get("STEAMROLLER_INDEX_READY_TIMEOUT", "30"))
+# steamroller verdicts depend on live prices: cache events only briefly and
+# never serve an expired copy
+STEAMROLLER_CACHE_TTL = float(os.environ.get("STEAMROLLER_CACHE_TTL", "5"))
+# build the index when the server boots instead of on the first /top request
+INDEX_AT_STARTUP = os.environ.get("STEAMROLLER_INDEX_AT_STARTUP", "false").lower() == "true"
 
 app = Flask(__name__)
 CORS(app, resources={r"/*": {"origins": "*"}})
@@ -15,6 +40,170 @@ CORS(app, resources={r"/*": {"origins": "*"}})
 
 # ---------- Helper functions ----------
 
+# Separate from the shared event_cache, whose entries may be served minutes old
+steamroller_cache = EventCache(ttl=STEAMROLLER_CACHE_TTL, stale_ttl=0)
+
+
+class GammaError(Exception):
+    """Gamma answered with a non-200 status."""
+
+    def __init__(self, status_code: int, body: str):
+        super().__init__(f"Gamma returned {status_code}")
+        self.status_code = status_code
+        self.body = body
+
+
+def fetch_event_by_slug(slug: str) -> dict:
+    resp = requests.get(f"{GAMMA_BASE_URL}/events/slug/{slug}", timeout=5)
+    if resp.status_code != 200:
+        raise GammaError(resp.status_code, resp.text)
+    return resp.json()
+
+
+def events_page_params(offset: int, limit: int = 100, **filters) -> dict:
+    """Query of one /events page of active, open events (plus filters such as tag_slug)."""
+    return {
+        **filters,
+        "active": "true",
+        "closed": "false",
+        "limit": limit,
+        "offset": offset,
+    }
+
+
+def fetch_events_page(offset: int, limit: int = 100, **filters) -> list:
+    """One page of active, open events (extra filters such as tag_slug are passed through)."""
+    resp = requests.get(
+        f"{GAMMA_BASE_URL}/events",
+        params=events_page_params(offset, limit, **filters),
+        timeout=10,
+    )
+    if resp.status_code != 200:
+        raise GammaError(resp.status_code, resp.text)
+    return resp.json()
+
+
+def fetch_events_by_tag(tag: str, max_events: int = 500, page_size: int = 100) -> list:
+    """All active, open events carrying a Gamma tag slug."""
+    events = []
+    offset = 0
+    while len(events) < max_events:
+        page = fetch_events_page(offset, page_size, tag_slug=tag)
+        if not page:
+            break
+        events.extend(page)
+        offset += page_size
+    return events[:max_events]
+
+
+def gamma_error_payload(e: Exception) -> dict:
+    """JSON error body for a failed Gamma call."""
+    if isinstance(e, GammaError):
+        return {"error": "gamma_returned_non_200", "status_code": e.status_code, "body": e.body}
+    return {"error": "failed_to_call_gamma", "details": str(e)}
+
+
+def fetch_events_by_slugs(slugs: list) -> tuple[list, list]:
+    """
+    Look up several slugs concurrently through the steamroller cache.
+
+    Returns (events, errors): one slug failing does not fail the others, its
+    error is reported as {"slug": ..., **gamma_error_payload(e)} instead.
+    """
+    def fetch(slug):
+        try:
+            return steamroller_cache.get(slug, fetch_event_by_slug), None
+        except Exception as e:
+            return None, {"slug": slug, **gamma_error_payload(e)}
+
+    events, errors = [], []
+    with ThreadPoolExecutor(max_workers=min(8, len(slugs)) or 1) as pool:
+        for event, error in pool.map(fetch, slugs):
+            if error is not None:
+                errors.append(error)
+            else:
+                events.append(event)
+    return events, errors
+
+
+def scan_bulk(slugs: list, tag: str | None, limit: int = 50, include_all: bool = False) -> tuple[dict, int]:
+    """
+    Bulk steamroller scan behind /api/steamroller/bulk; returns (payload, status).
+
+    A failing tag lookup fails the request; failing slugs are listed under
+    "errors" next to the results of the slugs that resolved (502 only if none did).
+    """
+    try:
+        events = fetch_events_by_tag(tag) if tag else []
+    except Exception as e:
+        return gamma_error_payload(e), 502
+
+    errors = []
+    if slugs:
+        slug_events, errors = fetch_events_by_slugs(slugs)
+        events.extend(slug_events)
+    return bulk_payload(events, errors, limit=limit, include_all=include_all)
+
+
+def bulk_payload(events: list, errors: list, limit: int = 50, include_all: bool = False) -> tuple[dict, int]:
+    """Scan the fetched events; 502 if slugs were asked for and none resolved."""
+    if errors and not events:
+        return {"error": "all_slugs_failed", "errors": errors}, 502
+
+    results = scan_events(events, limit=limit, include_all=include_all)
+    return {
+        "events_scanned": len(events),
+        "results": results,
+        "errors": errors,
+    }, 200
+
+
+# Market-wide index behind /api/steamroller/top (started on first use, or at boot
+# with STEAMROLLER_INDEX_AT_STARTUP)
+steamroller_index = SteamrollerIndex(fetch_page=fetch_events_page, refresh_interval=INDEX_REFRESH_SECONDS)
+
+
+def top_steamrollers(n: int = 20, min_p=None, max_days=None, sort: str = "score") -> dict:
+    """
+    /api/steamroller/top payload. Starts the index if needed and waits (up to
+    INDEX_READY_TIMEOUT) for its first pass, so a fresh process does not
+    answer with an empty list.
+    """
+    steamroller_index.start()
+    steamroller_index.wait_ready(INDEX_READY_TIMEOUT)
+    return top_payload(n=n, min_p=min_p, max_days=max_days, sort=sort)
+
+
+def top_payload(n: int = 20, min_p=None, max_days=None, sort: str = "score") -> dict:
+    """Answer a /top query from the index as it is now."""
+    return {
+        "index": steamroller_index.status(),
+        "results": steamroller_index.top(n=n, min_p=min_p, max_days=max_days, sort=sort),
+    }
+
+
+def parse_top_args(args) -> tuple[dict | None, str | None]:
+    """
+    Validate /api/steamroller/top query parameters (Flask or aiohttp mapping).
+    Returns (kwargs for top_steamrollers, None) or (None, error message).
+    """
+    try:
+        n = int(args.get("n", 20))
+    except ValueError:
+        return None, "n must be an integer"
+    bounds = {}
+    for name in ("min_p", "max_days"):
+        raw = args.get(name)
+        try:
+            bounds[name] = float(raw) if raw is not None else None
+        except ValueError:
+            return None, f"{name} must be a number"
+    sort = args.get("sort", "score")
+    if sort not in SORT_KEYS:
+        return None, f"sort must be one of {', '.join(SORT_KEYS)}"
+    return {"n": n, "sort": sort, **bounds}, None
+
+
 def parse_iso_datetime(s: str) -> datetime | None:
     """Turn '2025-10-31T23:59:00Z' into a timezone-aware datetime."""
     if not s:
@@ -62,7 +251,6 @@ def compute_outcome_metrics(probability: float, now: datetime, end_dt: datetime
     - wipeout factor
     - simple risk labels
     """
-    EPS = 1e-4
     p_raw = probability
     p = max(EPS, min(1.0 - EPS, p_raw))
 
@@ -71,12 +259,12 @@ def compute_outcome_metrics(probability: float, now: datetime, end_dt: datetime
 
     wipeout_factor = max_loss / max_gain
 
-    if p < 0.75:
+    if p < RISK_MEDIUM_P:
         risk_label = "low"
-    elif p < 0.9:
+    elif p < STEAMROLLER_MIN_P:
         risk_label = "medium"
     else:
-        risk_label = "high" if wipeout_factor >= 10.0 else "medium"
+        risk_label = "high" if wipeout_factor >= STEAMROLLER_MIN_WIPEOUT else "medium"
 
     days_left = None
     time_risk = "unknown"
@@ -91,9 +279,9 @@ def compute_outcome_metrics(probability: float, now: datetime, end_dt: datetime
 
         if days_left == 0:
             time_risk = "low"
-        elif p > 0.9 and days_left > 7:
+        elif p > TIME_RISK_HIGH[0] and days_left > TIME_RISK_HIGH[1]:
             time_risk = "high"
-        elif p > 0.85 and days_left > 3:
+        elif p > TIME_RISK_MEDIUM[0] and days_left > TIME_RISK_MEDIUM[1]:
             time_risk = "medium"
         else:
             time_risk = "low"
@@ -126,15 +314,11 @@ def pick_steamroller_side(outcome_metrics: dict):
         if wipe is None:
             continue
 
-        if p < 0.9 or wipe < 10.0:
+        if p < STEAMROLLER_MIN_P or wipe < STEAMROLLER_MIN_WIPEOUT:
             continue
 
         score = wipe * p
-
-        if time_risk == "high":
-            score *= 1.3
-        elif time_risk == "medium":
-            score *= 1.1
+        score *= TIME_RISK_MULTIPLIERS.get(time_risk, 1.0)
 
         if score > best_score:
             best_score = score
@@ -154,9 +338,9 @@ def pick_steamroller_side(outcome_metrics: dict):
 
     wipe_int = int(math.floor(wipe)) if wipe is not None else None
 
-    if best_score > 30:
+    if best_score > SCORE_HIGH:
         overall = "high"
-    elif best_score > 15:
+    elif best_score > SCORE_MEDIUM:
         overall = "medium"
     else:
         overall = "low"
@@ -179,27 +363,8 @@ def pick_steamroller_side(outcome_metrics: dict):
     }
 
 
-# ---------- Main endpoint ----------
-
-@app.route("/api/steamroller", methods=["GET"])
-def steamroller():
-    slug = request.args.get("slug")
-    if not slug:
-        return jsonify({"error": "missing ?slug= parameter"}), 400
-
-    try:
-        resp = requests.get(f"{GAMMA_BASE_URL}/events/slug/{slug}", timeout=5)
-    except Exception as e:
-        return jsonify({"error": "failed_to_call_gamma", "details": str(e)}), 502
-
-    if resp.status_code != 200:
-        return jsonify({
-            "error": "gamma_returned_non_200",
-            "status_code": resp.status_code,
-            "body": resp.text,
-        }), 502
-
-    event = resp.json()
+def evaluate_event(event: dict, slug: str) -> tuple[dict, int]:
+    """Steamroller check for the first active market of a Gamma event; returns (payload, status)."""
     markets = event.get("markets") or []
     active_markets = [m for m in markets if m.get("active") and not m.get("closed")]
 
@@ -217,13 +382,13 @@ def steamroller():
     prices_raw = safe_outcome_list(market.get("outcomePrices"))
 
     if not outcomes_raw or not prices_raw or len(outcomes_raw) != len(prices_raw):
-        return jsonify({
+        return {
             "slug": slug,
             "market_title": question,
             "error": "could_not_parse_outcomes_or_prices",
             "raw_outcomes": outcomes_raw,
             "raw_prices": prices_raw,
-        }), 500
+        }, 500
 
     outcome_metrics = {}
     for outcome_name, price_value in zip(outcomes_raw, prices_raw):
@@ -238,11 +403,11 @@ def steamroller():
         outcome_metrics[str(outcome_name)] = metrics
 
     if not outcome_metrics:
-        return jsonify({
+        return {
             "slug": slug,
             "market_title": question,
             "error": "no_valid_outcomes_after_parsing",
-        }), 500
+        }, 500
 
     summary = pick_steamroller_side(outcome_metrics)
 
@@ -255,7 +420,71 @@ def steamroller():
         "outcomes": outcome_metrics,
         "steamroller_summary": summary,
     }
-    return jsonify(response)
+    return response, 200
+
+
+# ---------- Main endpoint ----------
+
+@app.route("/api/steamroller", methods=["GET"])
+def steamroller():
+    slug = request.args.get("slug")
+    if not slug:
+        return jsonify({"error": "missing ?slug= parameter"}), 400
+
+    try:
+        event = steamroller_cache.get(slug, fetch_event_by_slug)
+    except GammaError as e:
+        return jsonify({
+            "error": "gamma_returned_non_200",
+            "status_code": e.status_code,
+            "body": e.body,
+        }), 502
+    except Exception as e:
+        return jsonify({"error": "failed_to_call_gamma", "details": str(e)}), 502
+
+    payload, status = evaluate_event(event, slug)
+    return jsonify(payload), status
+
+
+@app.route("/api/steamroller/bulk", methods=["GET"])
+def steamroller_bulk():
+    """
+    Scan every open market of one or many events, ranked by steamroller score.
+
+    ?slug=a&slug=b  or  ?slugs=a,b  or  ?tag=politics
+    Optional: &limit=50  &include_all=true (also list markets with no steamroller side)
+    """
+    slugs = request.args.getlist("slug")
+    for chunk in request.args.getlist("slugs"):
+        slugs.extend(s.strip() for s in chunk.split(",") if s.strip())
+    tag = request.args.get("tag")
+
+    if not slugs and not tag:
+        return jsonify({"error": "pass ?slug=, ?slugs= or ?tag="}), 400
+
+    try:
+        limit = int(request.args.get("limit", 50))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    include_all = request.args.get("include_all", "false").lower() == "true"
+
+    payload, status = scan_bulk(slugs, tag, limit=limit, include_all=include_all)
+    return jsonify(payload), status
+
+
+@app.route("/api/steamroller/top", methods=["GET"])
+def steamroller_top():
+    """
+    Best steamroller candidates across every active market, from the
+    background index.
+
+    Optional: ?n=20  &min_p=0.95  &max_days=7  &sort=score|wipeout|days_left
+    """
+    kwargs, error = parse_top_args(request.args)
+    if error:
+        return jsonify({"error": error}), 400
+
+    return jsonify(top_steamrollers(**kwargs))
 
 
 @app.route("/ping")
@@ -263,5 +492,13 @@ def ping():
     return jsonify({"status": "ok"})
 
 
+@app.route("/cache/stats")
+def cache_stats():
+    return jsonify(steamroller_cache.stats())
+
+
 if __name__ == "__main__":
+    # with the debug reloader, only the serving child process builds the index
+    if INDEX_AT_STARTUP and os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        steamroller_index.start()
     app.run(host="0.0.0.0", port=5001, debug=True)
\ No newline at end of file
@@ -4,17 +4,26 @@ import json
 import os
 import sys
 import textwrap
+import threading
 import urllib.parse
-import urllib.request
-from typing import Any, Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 from dotenv import load_dotenv
+import requests
+from requests.adapters import HTTPAdapter
+
+from event_cache import event_cache
+from event_resolver import event_resolver
+from insight_cache import bucket_price, bucket_volume, hash_inputs, insight_cache
 
 # ----- Constants -----
 
 load_dotenv()
-GAMMA_BASE_URL = "https://gamma-api.polymarket.com"
 USER_AGENT = "PolyPredictionKit/0.1 (hackathon-cli)"
 DEFAULT_GEMINI_MODEL = "gemini-2.5-flash"
+# Overridable so tests can point at local fake Gamma / Gemini endpoints
+GAMMA_BASE_URL = os.environ.get("GAMMA_BASE_URL", "https://gamma-api.polymarket.com")
+GEMINI_BASE_URL = os.environ.get("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com/v1beta")
 
 
 # ----- Errors -----
@@ -22,26 +31,92 @@ DEFAULT_GEMINI_MODEL = "gemini-2.5-flash"
 class HttpError(Exception):
     """Raised when an HTTP or JSON error occurs."""
 
+    def __init__(self, message: str, status_code: Optional[int] = None) -> None:
+        super().__init__(message)
+        self.status_code = status_code  # upstream HTTP status, if there was one
+
+
+# ----- HTTP client -----
+
+# One keep-alive connection pool per process, so repeated Gamma / Gemini calls
+# skip the TCP + TLS handshake.
+HTTP_POOL_CONNECTIONS = int(os.environ.get("HTTP_POOL_CONNECTIONS", "4"))  # hosts kept pooled
+HTTP_POOL_MAXSIZE = int(os.environ.get("HTTP_POOL_MAXSIZE", "16"))  # keep-alive connections per host
+HTTP_POOL_BLOCK = os.environ.get("HTTP_POOL_BLOCK", "false").lower() == "true"  # hard per-host limit
+# event_cache namespace of the events loaded by _fetch_event_by_slug (and its async twin)
+EVENT_CACHE_NAMESPACE = "event"
+
+HTTP_GET_TIMEOUT = float(os.environ.get("HTTP_GET_TIMEOUT", "15"))
+HTTP_POST_TIMEOUT = float(os.environ.get("HTTP_POST_TIMEOUT", "30"))
+
+_http_session: Optional[requests.Session] = None
+_http_session_lock = threading.Lock()
+
+
+def _build_http_session(pool_connections: int, pool_maxsize: int, pool_block: bool) -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        pool_block=pool_block,
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["User-Agent"] = USER_AGENT
+    return session
+
+
+def configure_http_pool(
+    pool_connections: int = HTTP_POOL_CONNECTIONS,
+    pool_maxsize: int = HTTP_POOL_MAXSIZE,
+    pool_block: bool = HTTP_POOL_BLOCK,
+) -> requests.Session:
+    """
+    Replace the shared HTTP pool.
+
+    pool_connections: number of hosts whose connections are kept.
+    pool_maxsize:     keep-alive connections kept per host.
+    pool_block:       if True, never open more than pool_maxsize connections
+                      to one host (callers wait for a free one).
+    """
+    global _http_session
+    session = _build_http_session(pool_connections, pool_maxsize, pool_block)
+    with _http_session_lock:
+        old, _http_session = _http_session, session
+    if old is not None:
+        old.close()
+    return session
+
+
+def get_http_session() -> requests.Session:
+    """Return the shared pooled session, creating it on first use."""
+    global _http_session
+    if _http_session is None:
+        with _http_session_lock:
+            if _http_session is None:
+                _http_session = _build_http_session(HTTP_POOL_CONNECTIONS, HTTP_POOL_MAXSIZE, HTTP_POOL_BLOCK)
+    return _http_session
+
 
 # ----- HTTP helpers -----
 
-def http_get_json(url: str, params: Optional[Dict[str, Any]] = None) -> Any:
+def http_get_json(
+    url: str,
+    params: Optional[Dict[str, Any]] = None,
+    timeout: Optional[float] = None,
+) -> Any:
     """Perform a GET request and return parsed JSON."""
     if params:
         query = urllib.parse.urlencode(params, doseq=True)
         url = f"{url}?{query}"
 
-    req = urllib.request.Request(
-        url,
-        headers={"User-Agent": USER_AGENT},
-        method="GET",
-    )
-
     try:
-        with urllib.request.urlopen(req, timeout=15) as resp:
-            data = resp.read()
+        resp = get_http_session().get(url, timeout=timeout or HTTP_GET_TIMEOUT)
+        resp.raise_for_status()
+        data = resp.content
     except Exception as e:
-        raise HttpError(f"GET {url} failed: {e}") from e
+        status = getattr(getattr(e, "response", None), "status_code", None)
+        raise HttpError(f"GET {url} failed: {e}", status_code=status) from e
 
     try:
         return json.loads(data.decode("utf-8"))
@@ -53,6 +128,7 @@ def http_post_json(
     url: str,
     body: Dict[str, Any],
     headers: Optional[Dict[str, str]] = None,
+    timeout: Optional[float] = None,
 ) -> Any:
     """Perform a POST request with JSON body and return parsed JSON."""
     payload = json.dumps(body).encode("utf-8")
@@ -64,16 +140,15 @@ def http_post_json(
     if headers:
         all_headers.update(headers)
 
-    req = urllib.request.Request(
-        url,
-        data=payload,
-        headers=all_headers,
-        method="POST",
-    )
-
     try:
-        with urllib.request.urlopen(req, timeout=30) as resp:
-            data = resp.read()
+        resp = get_http_session().post(
+            url,
+            data=payload,
+            headers=all_headers,
+            timeout=timeout or HTTP_POST_TIMEOUT,
+        )
+        resp.raise_for_status()
+        data = resp.content
     except Exception as e:
         raise HttpError(f"POST {url} failed: {e}") from e
 
@@ -109,20 +184,55 @@ def extract_slug_from_url(url: str) -> Optional[str]:
         return None
 
 
-def get_event_by_slug(slug: str) -> Optional[Dict[str, Any]]:
+# Request / response helpers shared with the async server's Gamma lookups
+
+def event_slug_url(slug: str) -> str:
+    return f"{GAMMA_BASE_URL}/events/slug/{urllib.parse.quote(slug, safe='')}"
+
+
+def event_id_url(event_id: str) -> str:
+    return f"{GAMMA_BASE_URL}/events/{urllib.parse.quote(event_id, safe='')}"
+
+
+def search_request(query: str) -> Tuple[str, Dict[str, Any]]:
+    """Return (url, params) for a /public-search lookup."""
+    params = {
+        "q": query,
+        "limit_per_type": 5,
+        "search_profiles": "false",
+        "search_tags": "false",
+    }
+    return f"{GAMMA_BASE_URL}/public-search", params
+
+
+def checked_event(payload: Any) -> Optional[Dict[str, Any]]:
+    """The event in a direct lookup's response, or None if it is not one."""
+    if isinstance(payload, dict) and payload.get("id"):
+        return payload
+    return None
+
+
+def first_search_event(payload: Any) -> Optional[Dict[str, Any]]:
+    events = payload.get("events") if isinstance(payload, dict) else None
+    if isinstance(events, list) and events:
+        return events[0]
+    return None
+
+
+def _fetch_event_by_slug(slug: str) -> Optional[Dict[str, Any]]:
     """
     Get event by slug using:
         GET /events/slug/{slug}
+
+    HttpError (including 404) is raised so the resolver can tell a missing
+    slug from a failed request.
     """
-    slug_enc = urllib.parse.quote(slug, safe="")
-    url = f"{GAMMA_BASE_URL}/events/slug/{slug_enc}"
-    try:
-        event = http_get_json(url)
-    except HttpError:
-        return None
-    if isinstance(event, dict) and event.get("id"):
-        return event
-    return None
+    return checked_event(http_get_json(event_slug_url(slug)))
+
+
+def get_event_by_slug(slug: str) -> Optional[Dict[str, Any]]:
+    """Get event by slug through the shared event cache."""
+    return event_cache.get(slug, _fetch_event_by_slug, namespace=EVENT_CACHE_NAMESPACE)
 
 
 def get_event_by_id(event_id: str) -> Optional[Dict[str, Any]]:
@@ -130,15 +240,7 @@ def get_event_by_id(event_id: str) -> Optional[Dict[str, Any]]:
     Get event by id using:
         GET /events/{id}
     """
-    id_enc = urllib.parse.quote(event_id, safe="")
-    url = f"{GAMMA_BASE_URL}/events/{id_enc}"
-    try:
-        event = http_get_json(url)
-    except HttpError:
-        return None
-    if isinstance(event, dict) and event.get("id"):
-        return event
-    return None
+    return checked_event(http_get_json(event_id_url(event_id)))
 
 
 def search_event(query: str) -> Optional[Dict[str, Any]]:
@@ -148,18 +250,8 @@ def search_event(query: str) -> Optional[Dict[str, Any]]:
 
     We take the first event from "events" array.
     """
-    params = {
-        "q": query,
-        "limit_per_type": 5,
-        "search_profiles": "false",
-        "search_tags": "false",
-    }
-    payload = http_get_json(f"{GAMMA_BASE_URL}/public-search", params=params)
-
-    events = payload.get("events") if isinstance(payload, dict) else None
-    if isinstance(events, list) and events:
-        return events[0]
-    return None
+    url, params = search_request(query)
+    return first_search_event(http_get_json(url, params=params))
 
 
 def classify_input(raw: str) -> Tuple[str, str]:
@@ -188,52 +280,68 @@ def classify_input(raw: str) -> Tuple[str, str]:
     return "search", s
 
 
+RESOLVE_ERRORS = {
+    "url": "Could not find event by URL (slug + search failed).",
+    "id": "Could not find event by id (id + search failed).",
+    "slug": "Could not find event by slug (slug + search failed).",
+    "search": "Search returned no matching events.",
+}
+
+
+def plan_event_lookup(raw_query: str) -> Tuple[str, str, str, Optional[str]]:
+    """
+    Decide how to resolve user input; returns (mode, value, strategy, key).
+
+    strategy is "slug", "id" or "search"; key is the slug / id for the
+    direct lookup (None when only search can answer).
+    """
+    mode, value = classify_input(raw_query)
+    if mode == "url":
+        return mode, value, "slug", extract_slug_from_url(value)
+    if mode in ("slug", "id"):
+        return mode, value, mode, value
+    return mode, value, "search", None
+
+
+def cached_event(strategy: str, key: Optional[str]) -> Optional[Dict[str, Any]]:
+    """A fresh cached event for a slug lookup; no need to race search against it."""
+    if strategy == "slug" and key:
+        return event_cache.peek(key, namespace=EVENT_CACHE_NAMESPACE)
+    return None
+
+
+def resolved_event(event: Optional[Dict[str, Any]], mode: str) -> Dict[str, Any]:
+    if event:
+        return event
+    raise RuntimeError(RESOLVE_ERRORS[mode])
+
+
 def load_event_from_query(raw_query: str) -> Dict[str, Any]:
     """
     Main resolver: from user input to a single Gamma event object.
 
     Strategy:
-    - URL -> slug -> event-by-slug -> fallback search
-    - numeric -> event-by-id -> fallback search
-    - slug   -> event-by-slug -> fallback search
-    - search -> search only
-    """
-    mode, value = classify_input(raw_query)
+    - URL     -> slug lookup, hedged with search
+    - numeric -> id lookup, hedged with search
+    - slug    -> slug lookup, hedged with search
+    - search  -> search only
 
-    if mode == "url":
-        slug = extract_slug_from_url(value)
-        if slug:
-            ev = get_event_by_slug(slug)
-            if ev:
-                return ev
-        ev = search_event(value)
-        if ev:
-            return ev
-        raise RuntimeError("Could not find event by URL (slug + search failed).")
-
-    if mode == "id":
-        ev = get_event_by_id(value)
-        if ev:
-            return ev
-        ev = search_event(value)
-        if ev:
-            return ev
-        raise RuntimeError("Could not find event by id (id + search failed).")
-
-    if mode == "slug":
-        ev = get_event_by_slug(value)
-        if ev:
-            return ev
-        ev = search_event(value)
-        if ev:
-            return ev
-        raise RuntimeError("Could not find event by slug (slug + search failed).")
-
-    # mode == "search"
-    ev = search_event(value)
-    if ev:
-        return ev
-    raise RuntimeError("Search returned no matching events.")
+    The direct lookup and /public-search run concurrently (see
+    event_resolver.HedgedResolver); the direct result is still preferred.
+    """
+    mode, value, strategy, key = plan_event_lookup(raw_query)
+    cached = cached_event(strategy, key)
+    if cached:
+        return cached
+
+    direct = {"slug": get_event_by_slug, "id": get_event_by_id}.get(strategy)
+    ev = event_resolver.resolve(
+        strategy,
+        key,
+        (lambda: direct(key)) if direct and key else None,
+        lambda: search_event(value),
+    )
+    return resolved_event(ev, mode)
 
 
 # ----- Formatting helpers -----
@@ -353,8 +461,8 @@ def get_gemini_api_key() -> Optional[str]:
     return os.environ.get("GEMINI_API_KEY")
 
 
-def build_gemini_prompt(event: Dict[str, Any], markets: List[Dict[str, Any]]) -> str:
-    """Construct a text prompt summarizing the event for Gemini."""
+def build_event_summary(event: Dict[str, Any], markets: List[Dict[str, Any]]) -> str:
+    """Structured text block describing one event and its markets."""
     title = event.get("title") or "<no title>"
     slug = event.get("slug") or "N/A"
     status = get_event_status(event)
@@ -394,7 +502,12 @@ def build_gemini_prompt(event: Dict[str, Any], markets: List[Dict[str, Any]]) ->
     if not markets:
         lines.append("No markets were found for this event.")
 
-    summary = "\n".join(lines)
+    return "\n".join(lines)
+
+
+def build_gemini_prompt(event: Dict[str, Any], markets: List[Dict[str, Any]]) -> str:
+    """Construct a text prompt summarizing the event for Gemini."""
+    summary = build_event_summary(event, markets)
 
     prompt = f"""
 You are an AI assistant helping a user think about prediction markets on Polymarket.
@@ -420,12 +533,54 @@ Respond with plain text only (no bullet points, no markdown headings).
     return prompt
 
 
-def call_gemini_insight(prompt: str, api_key: str, model: str = DEFAULT_GEMINI_MODEL) -> str:
+def insight_cache_key(event: Dict[str, Any], markets: List[Dict[str, Any]], model: str) -> str:
     """
-    Call Gemini text model through the public generateContent REST API.
+    Hash of everything build_gemini_prompt() reads, with prices and volumes
+    bucketed so tiny ticks still hit the insight cache.
     """
+    price_precision = insight_cache.price_precision
+    volume_precision = insight_cache.volume_precision
+
+    canonical = {
+        "model": model,
+        "title": event.get("title"),
+        "slug": event.get("slug"),
+        "status": get_event_status(event),
+        "end_date": event.get("endDate"),
+        "volume": bucket_volume(to_float(event.get("volume")), volume_precision),
+        "markets": [
+            {
+                "question": m.get("question"),
+                "closed": bool(m.get("closed")),
+                "volume": bucket_volume(to_float(m.get("volume")), volume_precision),
+                "outcomes": [
+                    [name, bucket_price(price, price_precision)]
+                    for name, price in parse_outcomes_and_prices(m)
+                ],
+            }
+            for m in markets[:3]
+        ],
+    }
+    return hash_inputs(canonical)
+
+
+# Fallback texts returned by call_gemini_insight() that must not be cached
+GEMINI_FALLBACK_PREFIXES = (
+    "Gemini did not return any candidates.",
+    "Gemini returned an empty response.",
+    "Failed to parse Gemini response:",
+)
+
+
+def gemini_request(
+    prompt: str,
+    model: str,
+    method: str = "generateContent",
+    generation_config: Optional[Dict[str, Any]] = None,
+) -> Tuple[str, Dict[str, Any]]:
+    """Return (url, body) for a Gemini REST call."""
     model_escaped = urllib.parse.quote(model, safe="")
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/{model_escaped}:generateContent"
+    url = f"{GEMINI_BASE_URL}/models/{model_escaped}:{method}"
 
     body = {
         "contents": [
@@ -436,15 +591,16 @@ def call_gemini_insight(prompt: str, api_key: str, model: str = DEFAULT_GEMINI_M
             }
         ]
     }
+    if generation_config:
+        body["generationConfig"] = generation_config
+    return url, body
 
-    headers = {
-        "x-goog-api-key": api_key,
-    }
-
-    resp = http_post_json(url, body, headers=headers)
 
-    # Parse standard Gemini response:
-    #   candidates[0].content.parts[*].text
+def parse_gemini_response(resp: Any) -> str:
+    """
+    Parse standard Gemini response:
+        candidates[0].content.parts[*].text
+    """
     try:
         candidates = resp.get("candidates") or []
         if not candidates:
@@ -462,8 +618,129 @@ def call_gemini_insight(prompt: str, api_key: str, model: str = DEFAULT_GEMINI_M
         return f"Failed to parse Gemini response: {e}"
 
 
+def call_gemini_insight(prompt: str, api_key: str, model: str = DEFAULT_GEMINI_MODEL) -> str:
+    """
+    Call Gemini text model through the public generateContent REST API.
+    """
+    url, body = gemini_request(prompt, model)
+
+    headers = {
+        "x-goog-api-key": api_key,
+    }
+
+    resp = http_post_json(url, body, headers=headers)
+    return parse_gemini_response(resp)
+
+
+# ----- Streaming (streamGenerateContent) -----
+
+class SseDataParser:
+    """Incremental server-sent events parser: feed lines, get each event's data."""
+
+    def __init__(self) -> None:
+        self._data: List[str] = []
+
+    def feed(self, line: str) -> Optional[str]:
+        """Take one line (without its newline); returns the data of a completed event."""
+        if line == "":
+            if self._data:
+                data, self._data = "\n".join(self._data), []
+                return data
+        elif line.startswith("data:"):
+            self._data.append(line[5:].lstrip())
+        return None
+
+    def flush(self) -> Optional[str]:
+        """Data of a last event that was not followed by a blank line."""
+        if self._data:
+            data, self._data = "\n".join(self._data), []
+            return data
+        return None
+
+
+def iter_sse_data(lines: Iterable[str]) -> Iterator[str]:
+    """Yield the data payload of every server-sent event in a line stream."""
+    parser = SseDataParser()
+    for line in lines:
+        data = parser.feed(line)
+        if data is not None:
+            yield data
+    data = parser.flush()
+    if data is not None:
+        yield data
+
+
+def parse_gemini_chunk(resp: Any) -> str:
+    """Text of one streamed Gemini chunk ("" when it carries none)."""
+    try:
+        parts = ((resp.get("candidates") or [{}])[0].get("content") or {}).get("parts") or []
+    except (AttributeError, IndexError):
+        return ""
+    return "".join(p.get("text", "") for p in parts if isinstance(p, dict))
+
+
+def gemini_stream_request(prompt: str, api_key: str, model: str) -> Tuple[str, Dict[str, Any], Dict[str, str]]:
+    """Return (url, body, headers) for a streamGenerateContent?alt=sse call."""
+    url, body = gemini_request(prompt, model, method="streamGenerateContent")
+    headers = {
+        "Content-Type": "application/json",
+        "User-Agent": USER_AGENT,
+        "x-goog-api-key": api_key,
+    }
+    return f"{url}?alt=sse", body, headers
+
+
+def stream_gemini_insight(prompt: str, api_key: str, model: str = DEFAULT_GEMINI_MODEL) -> Iterator[str]:
+    """
+    Call streamGenerateContent?alt=sse through the pooled session and yield
+    text chunks as Gemini produces them.
+    """
+    url, body, headers = gemini_stream_request(prompt, api_key, model)
+
+    try:
+        resp = get_http_session().post(
+            url,
+            data=json.dumps(body).encode("utf-8"),
+            headers=headers,
+            timeout=HTTP_POST_TIMEOUT,
+            stream=True,
+        )
+        resp.raise_for_status()
+    except Exception as e:
+        raise HttpError(f"POST {url} failed: {e}") from e
+
+    with resp:
+        try:
+            for data in iter_sse_data(resp.iter_lines(chunk_size=None, decode_unicode=True)):
+                text = parse_gemini_chunk(json.loads(data))
+                if text:
+                    yield text
+        except json.JSONDecodeError as e:
+            raise HttpError(f"Failed to decode streamed JSON from {url}: {e}") from e
+        except requests.RequestException as e:
+            raise HttpError(f"Stream from {url} failed: {e}") from e
+
+
 # ----- Public function for API use -----
 
+def prepare_insight(event: Dict[str, Any], model: str) -> Tuple[List[Dict[str, Any]], str, str]:
+    """
+    Return (markets, api_key, insight cache key) for a resolved event.
+
+    Raises RuntimeError if GEMINI_API_KEY is missing.
+    """
+    markets = select_markets_for_ai(event)
+    api_key = get_gemini_api_key()
+    if not api_key:
+        raise RuntimeError("GEMINI_API_KEY is not set. Unable to generate AI Trade Insight.")
+    return markets, api_key, insight_cache_key(event, markets, model)
+
+
+def is_cacheable_insight(insight: str) -> bool:
+    """Gemini fallback texts (no candidates, parse errors) are never cached."""
+    return not insight.startswith(GEMINI_FALLBACK_PREFIXES)
+
+
 def generate_insight_from_query(query: str, model: str = DEFAULT_GEMINI_MODEL) -> str:
     """
     Return plain-text AI Trade Insight for a given Polymarket query
@@ -477,20 +754,334 @@ def generate_insight_from_query(query: str, model: str = DEFAULT_GEMINI_MODEL) -
     # Step 1: resolve event
     event = load_event_from_query(query)
 
-    # Step 2: pick markets
-    markets = select_markets_for_ai(event)
+    # Step 2: pick markets, check the Gemini API key
+    markets, api_key, cache_key = prepare_insight(event, model)
 
-    # Step 3: Gemini API key
-    api_key = get_gemini_api_key()
-    if not api_key:
-        raise RuntimeError("GEMINI_API_KEY is not set. Unable to generate AI Trade Insight.")
+    # Step 3: reuse a cached insight if the prompt inputs did not change
+    cached = insight_cache.get(cache_key)
+    if cached is not None:
+        return cached
 
     # Step 4: build prompt and call Gemini
     prompt = build_gemini_prompt(event, markets)
     insight = call_gemini_insight(prompt, api_key, model=model)
+    if is_cacheable_insight(insight):
+        insight_cache.put(cache_key, insight)
     return insight
 
 
+def stream_insight_from_query(query: str, model: str = DEFAULT_GEMINI_MODEL) -> Iterator[str]:
+    """
+    Streaming generate_insight_from_query: yields the insight in chunks.
+
+    A cached insight is yielded as a single chunk. A streamed insight is
+    cached once it has been received completely.
+    """
+    event = load_event_from_query(query)
+    markets, api_key, cache_key = prepare_insight(event, model)
+
+    cached = insight_cache.get(cache_key)
+    if cached is not None:
+        yield cached
+        return
+
+    prompt = build_gemini_prompt(event, markets)
+    chunks = []
+    for text in stream_gemini_insight(prompt, api_key, model=model):
+        chunks.append(text)
+        yield text
+
+    insight = "".join(chunks).strip()
+    if insight:
+        insight_cache.put(cache_key, insight)
+
+
+# ----- Batch mode -----
+
+BATCH_WORKERS = int(os.environ.get("BATCH_WORKERS", "8"))            # concurrent event resolutions
+BATCH_GEMINI_WORKERS = int(os.environ.get("BATCH_GEMINI_WORKERS", "4"))  # concurrent Gemini calls
+BATCH_PACK_SIZE = int(os.environ.get("BATCH_PACK_SIZE", "5"))         # events per Gemini call
+BATCH_PROMPT_BUDGET = int(os.environ.get("BATCH_PROMPT_BUDGET", "24000"))  # characters per packed prompt
+
+
+def build_batch_gemini_prompt(items: List[Tuple[int, str]]) -> str:
+    """One prompt asking for an insight per event; items are (id, event summary)."""
+    blocks = "\n\n".join(f"=== EVENT {item_id} ===\n{summary}" for item_id, summary in items)
+    return f"""
+You are an AI assistant helping a user think about prediction markets on Polymarket.
+
+Here is structured data about {len(items)} Polymarket events and some of their markets.
+Each event has a numeric id.
+
+{blocks}
+
+For EACH event, independently, write a short AI Trade Insight in 3–6 sentences.
+
+Focus on:
+- What current prices roughly imply about market expectations.
+- 1–2 key scenarios or risk factors that could change the odds.
+- A balanced view that mentions both upside and downside perspectives.
+
+Rules:
+- Do NOT give explicit instructions like "you should buy" or "sell now".
+- Do NOT mention specific position sizes.
+- Explicitly remind the reader that this is NOT financial advice.
+- Each insight is plain text (no bullet points, no markdown headings).
+
+Respond with a JSON array only, one object per event, using the ids given above:
+[{{"id": <event id>, "insight": "<insight text>"}}, ...]
+""".strip()
+
+
+def parse_batch_insights(text: str) -> Dict[int, str]:
+    """Map id -> insight from a packed response; malformed entries are skipped."""
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.strip("`")
+        text = text[text.find("\n") + 1:] if "\n" in text else text
+    try:
+        items = json.loads(text)
+    except json.JSONDecodeError:
+        return {}
+    if isinstance(items, dict):
+        items = items.get("insights") or items.get("events") or []
+
+    out: Dict[int, str] = {}
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict):
+            continue
+        try:
+            item_id = int(item.get("id"))
+        except (TypeError, ValueError):
+            continue
+        insight = item.get("insight")
+        if isinstance(insight, str) and insight.strip():
+            out[item_id] = insight.strip()
+    return out
+
+
+def call_gemini_batch(items: List[Tuple[int, str]], api_key: str, model: str = DEFAULT_GEMINI_MODEL) -> Dict[int, str]:
+    """Generate insights for several events with one generateContent call."""
+    url, body = gemini_request(
+        build_batch_gemini_prompt(items),
+        model,
+        generation_config={"responseMimeType": "application/json"},
+    )
+    resp = http_post_json(url, body, headers={"x-goog-api-key": api_key})
+    return parse_batch_insights(parse_gemini_response(resp))
+
+
+def read_batch_queries(source: str) -> List[str]:
+    """Queries from a file (or "-" for stdin): one per line, blank lines and #comments skipped."""
+    f = sys.stdin if source == "-" else open(source, "r", encoding="utf-8")
+    try:
+        queries = [line.strip() for line in f]
+    finally:
+        if f is not sys.stdin:
+            f.close()
+    seen = set()
+    return [q for q in queries if q and not q.startswith("#") and not (q in seen or seen.add(q))]
+
+
+def read_done_queries(path: str) -> set:
+    """
+    Queries that already have an "ok" record in a previous JSONL output.
+    A torn last line from an interrupted run is cut off so appends stay valid.
+    """
+    done = set()
+    if not os.path.exists(path):
+        return done
+
+    valid_bytes = 0
+    with open(path, "rb") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            if not line.endswith(b"\n"):
+                break
+            valid_bytes += len(line)
+            if record.get("status") == "ok":
+                done.add(record.get("query"))
+
+    with open(path, "r+b") as f:
+        f.truncate(valid_bytes)
+    return done
+
+
+class JsonlWriter:
+    """Thread-safe JSON Lines writer that flushes every record."""
+
+    def __init__(self, f) -> None:
+        self._f = f
+        self._lock = threading.Lock()
+        self.counts = {"ok": 0, "error": 0, "cached": 0}
+
+    def write(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            self._f.write(line + "\n")
+            self._f.flush()
+            self.counts[record["status"]] += 1
+            if record.get("cached"):
+                self.counts["cached"] += 1
+
+
+def run_batch(
+    queries: List[str],
+    writer: JsonlWriter,
+    model: str = DEFAULT_GEMINI_MODEL,
+    workers: int = BATCH_WORKERS,
+    gemini_workers: int = BATCH_GEMINI_WORKERS,
+    pack_size: int = BATCH_PACK_SIZE,
+    prompt_budget: int = BATCH_PROMPT_BUDGET,
+) -> Dict[str, int]:
+    """
+    Resolve `queries` on a bounded worker pool and write one JSONL record per
+    query as soon as its insight is ready.
+
+    Cached insights are written straight away; the rest are packed up to
+    `pack_size` events (and `prompt_budget` characters) per Gemini call. Events
+    missing from a packed answer are retried with single calls.
+    """
+    api_key = get_gemini_api_key()
+    if not api_key:
+        raise RuntimeError("GEMINI_API_KEY is not set. Unable to generate AI Trade Insight.")
+
+    calls = {"packed": 0, "single": 0}
+    calls_lock = threading.Lock()
+
+    def prepare(query: str) -> Dict[str, Any]:
+        event = load_event_from_query(query)
+        markets = select_markets_for_ai(event)
+        return {
+            "event": event,
+            "markets": markets,
+            "cache_key": insight_cache_key(event, markets, model),
+            "summary": build_event_summary(event, markets),
+        }
+
+    def ok_record(item: Dict[str, Any], insight: str, cached: bool, packed: int) -> Dict[str, Any]:
+        return {
+            "index": item["index"],
+            "query": item["query"],
+            "status": "ok",
+            "slug": item["event"].get("slug"),
+            "title": item["event"].get("title"),
+            "insight": insight,
+            "cached": cached,
+            "packed": packed,
+        }
+
+    def error_record(index: int, query: str, error: BaseException) -> Dict[str, Any]:
+        return {"index": index, "query": query, "status": "error", "error": f"{type(error).__name__}: {error}"}
+
+    def finish(item: Dict[str, Any], insight: str, packed: int) -> None:
+        if is_cacheable_insight(insight):
+            insight_cache.put(item["cache_key"], insight)
+        writer.write(ok_record(item, insight, False, packed))
+
+    def run_single(item: Dict[str, Any]) -> None:
+        try:
+            with calls_lock:
+                calls["single"] += 1
+            prompt = build_gemini_prompt(item["event"], item["markets"])
+            finish(item, call_gemini_insight(prompt, api_key, model=model), 1)
+        except Exception as e:
+            writer.write(error_record(item["index"], item["query"], e))
+
+    def run_pack(pack: List[Dict[str, Any]]) -> None:
+        if len(pack) == 1:
+            run_single(pack[0])
+            return
+        try:
+            with calls_lock:
+                calls["packed"] += 1
+            insights = call_gemini_batch([(item["index"], item["summary"]) for item in pack], api_key, model)
+        except Exception as e:
+            print(f"[WARN] Packed Gemini call failed ({e}); retrying {len(pack)} events one by one.", file=sys.stderr)
+            insights = {}
+        for item in pack:
+            insight = insights.get(item["index"])
+            if insight is None:
+                run_single(item)
+            else:
+                finish(item, insight, len(pack))
+
+    gemini_pool = ThreadPoolExecutor(max_workers=max(1, gemini_workers), thread_name_prefix="batch-gemini")
+    gemini_futures = []
+    pack: List[Dict[str, Any]] = []
+    pack_chars = 0
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="batch-resolve") as resolve_pool:
+        futures = {resolve_pool.submit(prepare, q): (i, q) for i, q in enumerate(queries)}
+        for future in as_completed(futures):
+            index, query = futures[future]
+            try:
+                item = future.result()
+            except Exception as e:
+                writer.write(error_record(index, query, e))
+                continue
+            item.update(index=index, query=query)
+
+            cached = insight_cache.get(item["cache_key"])
+            if cached is not None:
+                writer.write(ok_record(item, cached, True, 0))
+                continue
+
+            if pack and pack_chars + len(item["summary"]) > prompt_budget:
+                gemini_futures.append(gemini_pool.submit(run_pack, pack))
+                pack, pack_chars = [], 0
+            pack.append(item)
+            pack_chars += len(item["summary"])
+            if len(pack) >= pack_size:
+                gemini_futures.append(gemini_pool.submit(run_pack, pack))
+                pack, pack_chars = [], 0
+
+    if pack:
+        gemini_futures.append(gemini_pool.submit(run_pack, pack))
+    for future in gemini_futures:
+        future.result()
+    gemini_pool.shutdown()
+
+    return {**writer.counts, "gemini_packed_calls": calls["packed"], "gemini_single_calls": calls["single"]}
+
+
+def main_batch(args: argparse.Namespace) -> int:
+    queries = read_batch_queries(args.batch)
+    if args.resume:
+        if args.output == "-":
+            print("[ERROR] --resume needs --output FILE.", file=sys.stderr)
+            return 2
+        done = read_done_queries(args.output)
+        queries = [q for q in queries if q not in done]
+        print(f"Resuming: {len(done)} queries already done, {len(queries)} to go.", file=sys.stderr)
+
+    out = sys.stdout if args.output == "-" else open(args.output, "a" if args.resume else "w", encoding="utf-8")
+    started = dt.datetime.now()
+    try:
+        summary = run_batch(
+            queries,
+            JsonlWriter(out),
+            model=args.model,
+            workers=args.workers,
+            gemini_workers=args.gemini_workers,
+            pack_size=args.pack_size,
+            prompt_budget=args.prompt_budget,
+        )
+    except Exception as e:
+        print(f"[ERROR] {e}", file=sys.stderr)
+        return 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = (dt.datetime.now() - started).total_seconds()
+    print(f"Batch done in {elapsed:.1f}s: {json.dumps(summary)}", file=sys.stderr)
+    return 0 if summary["error"] == 0 else 1
+
+
 # ----- Main CLI -----
 
 def main(argv: Optional[List[str]] = None) -> int:
@@ -499,6 +1090,7 @@ def main(argv: Optional[List[str]] = None) -> int:
     )
     parser.add_argument(
         "query",
+        nargs="?",
         help="Polymarket URL, slug, numeric event ID, or free-text search phrase.",
     )
     parser.add_argument(
@@ -507,8 +1099,31 @@ def main(argv: Optional[List[str]] = None) -> int:
         help=f"Gemini model id (default: {DEFAULT_GEMINI_MODEL}).",
     )
 
+    batch = parser.add_argument_group("batch mode")
+    batch.add_argument(
+        "--batch",
+        metavar="FILE",
+        help='Read one query per line from FILE ("-" for stdin) and write JSON Lines.',
+    )
+    batch.add_argument("--output", "-o", default="-", help="JSONL output file (default: stdout).")
+    batch.add_argument("--resume", action="store_true", help="Skip queries already written as ok to --output.")
+    batch.add_argument("--workers", type=int, default=BATCH_WORKERS, help="Concurrent event resolutions.")
+    batch.add_argument("--gemini-workers", type=int, default=BATCH_GEMINI_WORKERS, help="Concurrent Gemini calls.")
+    batch.add_argument("--pack-size", type=int, default=BATCH_PACK_SIZE, help="Max events per Gemini call.")
+    batch.add_argument(
+        "--prompt-budget",
+        type=int,
+        default=BATCH_PROMPT_BUDGET,
+        help="Max characters of event data per packed Gemini call.",
+    )
+
     args = parser.parse_args(argv)
 
+    if args.batch:
+        return main_batch(args)
+    if not args.query:
+        parser.error("a query is required (or use --batch FILE)")
+
     try:
         insight = generate_insight_from_query(args.query, model=args.model)
     except HttpError as e:
@@ -37,26 +37,57 @@ document.addEventListener("DOMContentLoaded", () => {
 
         outcomeDisplay.textContent = "Generating AI Market Insight...";
 
-        fetch("http://127.0.0.1:5002/ai-insight", {
+        // Streamed as server-sent events so text appears while Gemini writes it
+        fetch("http://127.0.0.1:5002/ai-insight/stream", {
           method: "POST",
           headers: { "Content-Type": "application/json" },
           body: JSON.stringify({ slug })
         })
-          .then((res) => res.json())
-          .then((data) => {
-            console.log("Gemini Insight backend returned:", data);
-
-            if (data.error) {
-              outcomeDisplay.textContent = "AI Insight Error: " + data.error;
+          .then(async (res) => {
+            if (!res.ok || !res.body) {
+              const data = await res.json().catch(() => ({}));
+              outcomeDisplay.textContent = "AI Insight Error: " + (data.error || res.status);
               return;
             }
 
-            if (!data.insight) {
-              outcomeDisplay.textContent = "No AI insight returned.";
-              return;
+            const reader = res.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = "";
+            let insight = "";
+
+            // Handle one "event: ...\ndata: ..." block
+            const handleEvent = (block) => {
+              let eventName = "message";
+              let dataText = "";
+              for (const line of block.split("\n")) {
+                if (line.startsWith("event:")) eventName = line.slice(6).trim();
+                else if (line.startsWith("data:")) dataText += line.slice(5).trim();
+              }
+              if (!dataText) return;
+
+              const data = JSON.parse(dataText);
+              if (eventName === "chunk") {
+                insight += data.text;
+                outcomeDisplay.textContent = insight;
+              } else if (eventName === "error") {
+                outcomeDisplay.textContent = (insight ? insight + "\n\n" : "") + "AI Insight Error: " + data.error;
+              } else if (eventName === "done" && !insight) {
+                outcomeDisplay.textContent = "No AI insight returned.";
+              }
+            };
+
+            while (true) {
+              const { done, value } = await reader.read();
+              if (done) break;
+              buffer += decoder.decode(value, { stream: true });
+
+              let boundary;
+              while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+                handleEvent(buffer.slice(0, boundary));
+                buffer = buffer.slice(boundary + 2);
+              }
             }
-
-            outcomeDisplay.textContent = data.insight;
+            if (buffer.trim()) handleEvent(buffer);
           })
           .catch((err) => {
             console.error("Error contacting Gemini backend:", err);
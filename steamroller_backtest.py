@@ -0,0 +1,293 @@
+"""
+Backtest the steamroller heuristic on resolved markets.
+
+Input is a columnar file with one row per outcome per price snapshot:
+
+    market_id    int64    market identifier
+    ts           float64  snapshot time (epoch seconds)
+    end_ts       float64  market end time (epoch seconds, NaN = unknown)
+    outcome_pos  int64    position of the outcome in the market
+    probability  float64  outcome price at the snapshot
+    won          bool     whether this outcome won when the market resolved
+
+Rows of one snapshot (same market_id and ts) must be contiguous. Supported
+formats: .npz, .parquet (needs pyarrow) or a directory of <column>.npy files,
+which is memory-mapped so sweep workers share the pages.
+
+Every snapshot is scored with the same vectorized rules as steamroller_scan.py,
+with the thresholds taken from a BacktestParams. For the snapshots where a
+steamroller side was picked, the report gives realized hit and wipeout rates
+per risk bucket, probability bucket and time-risk bucket.
+
+    python steamroller_backtest.py snapshots.npz
+    python steamroller_backtest.py snapshots.npz --min-p 0.85,0.9,0.95 --min-wipeout 5,10,20 --workers 4
+    python steamroller_backtest.py snapshots.npz --make-synthetic 200000
+"""
+import argparse
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+
+import numpy as np
+
+from steamroller_scan import (
+    SCORE_HIGH,
+    SCORE_MEDIUM,
+    STEAMROLLER_MIN_P,
+    STEAMROLLER_MIN_WIPEOUT,
+    TIME_RISK_LABELS,
+    TIME_RISK_MULTIPLIERS,
+    compute_outcome_metrics_batch,
+)
+
+COLUMNS = ("market_id", "ts", "end_ts", "outcome_pos", "probability", "won")
+PROBABILITY_BUCKETS = (0.0, 0.9, 0.95, 0.98, 0.99, 1.0)
+RISK_BUCKETS = ("low", "medium", "high")
+
+
+@dataclass(frozen=True)
+class BacktestParams:
+    min_p: float = STEAMROLLER_MIN_P
+    min_wipeout: float = STEAMROLLER_MIN_WIPEOUT
+    mult_medium: float = TIME_RISK_MULTIPLIERS["medium"]
+    mult_high: float = TIME_RISK_MULTIPLIERS["high"]
+    score_medium: float = SCORE_MEDIUM
+    score_high: float = SCORE_HIGH
+
+
+# ----- Loading -----
+
+def load_snapshots(path: str) -> dict:
+    if os.path.isdir(path):
+        return {c: np.load(os.path.join(path, f"{c}.npy"), mmap_mode="r") for c in COLUMNS}
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(path, columns=list(COLUMNS))
+        return {c: table.column(c).to_numpy() for c in COLUMNS}
+    with np.load(path) as data:
+        return {c: data[c] for c in COLUMNS}
+
+
+def save_snapshots(path: str, data: dict) -> None:
+    if path.endswith(".npz"):
+        np.savez(path, **{c: data[c] for c in COLUMNS})
+        return
+    os.makedirs(path, exist_ok=True)
+    for c in COLUMNS:
+        np.save(os.path.join(path, f"{c}.npy"), data[c])
+
+
+def make_synthetic(n_markets: int, snapshots_per_market: int = 10, seed: int = 0) -> dict:
+    """Binary markets whose prices drift towards the eventual winner."""
+    rng = np.random.default_rng(seed)
+    n_snap = n_markets * snapshots_per_market
+
+    market = np.repeat(np.arange(n_markets, dtype=np.int64), snapshots_per_market)
+    end = 1.7e9 + rng.uniform(0, 3.0e7, n_markets)
+    days_before = rng.uniform(0, 30, n_snap)
+    ts = end[market] - days_before * 86400.0
+    order = np.lexsort((ts, market))
+    market, ts = market[order], ts[order]
+
+    yes_wins = rng.random(n_markets) < 0.5
+    base = rng.beta(8, 2, n_snap)  # favourite price, mostly 0.6-0.99
+    favourite_is_winner = rng.random(n_snap) < base + (1 - base) * 0.3
+    p_yes = np.where(favourite_is_winner == yes_wins[market], base, 1.0 - base)
+
+    return {
+        "market_id": np.repeat(market, 2),
+        "ts": np.repeat(ts, 2),
+        "end_ts": np.repeat(end[market], 2),
+        "outcome_pos": np.tile(np.array([0, 1], dtype=np.int64), n_snap),
+        "probability": np.column_stack([p_yes, 1.0 - p_yes]).ravel(),
+        "won": np.column_stack([yes_wins[market], ~yes_wins[market]]).ravel(),
+    }
+
+
+# ----- Scoring -----
+
+class Prepared:
+    """Parameter-independent arrays, computed once per process and reused by every sweep point."""
+
+    def __init__(self, data: dict):
+        market = np.asarray(data["market_id"])
+        ts = np.asarray(data["ts"], dtype=np.float64)
+
+        new = np.empty(len(market), dtype=bool)
+        new[:1] = True
+        new[1:] = (market[1:] != market[:-1]) | (ts[1:] != ts[:-1])
+        self.starts = np.flatnonzero(new)
+        self.snapshot = np.cumsum(new) - 1
+        self.n_snapshots = len(self.starts)
+        self.n_markets = len(np.unique(market))
+        self.n_rows = len(market)
+
+        # days_left / time risk are relative to each snapshot, not to "now"
+        metrics = compute_outcome_metrics_batch(
+            data["probability"],
+            np.asarray(data["end_ts"], dtype=np.float64) - ts,
+            0.0,
+        )
+        self.probability = metrics["probability"]
+        self.wipeout = metrics["wipeout_factor"]
+        self.time_risk_code = metrics["time_risk_code"]
+        self.won = np.asarray(data["won"], dtype=bool)
+
+
+def pick_sides(prep: Prepared, params: BacktestParams):
+    """Row index of the steamroller side of each snapshot that has one."""
+    mult = np.array([1.0, 1.0, params.mult_medium, params.mult_high])
+    p, wipe = prep.probability, prep.wipeout
+    score = np.where(
+        (p >= params.min_p) & (wipe >= params.min_wipeout),
+        wipe * p * mult[prep.time_risk_code],
+        -np.inf,
+    )
+
+    best = np.maximum.reduceat(score, prep.starts)
+    is_best = np.isfinite(score) & (score == best[prep.snapshot])
+    rows = np.flatnonzero(is_best)
+    # first outcome wins ties, like pick_steamroller_side
+    _, first = np.unique(prep.snapshot[rows], return_index=True)
+    rows = rows[first]
+    return rows, score[rows]
+
+
+def _bucket_stats(codes, labels, won, p):
+    n = len(labels)
+    count = np.bincount(codes, minlength=n)
+    hits = np.bincount(codes, weights=won, minlength=n)
+    p_sum = np.bincount(codes, weights=p, minlength=n)
+    pnl = np.bincount(codes, weights=np.where(won, 1.0 - p, -p), minlength=n)
+
+    out = {}
+    for i, label in enumerate(labels):
+        c = int(count[i])
+        if not c:
+            continue
+        out[label] = {
+            "snapshots": c,
+            "hits": int(hits[i]),
+            "wipeouts": c - int(hits[i]),
+            "hit_rate": hits[i] / c,
+            "wipeout_rate": 1.0 - hits[i] / c,
+            "implied_hit_rate": p_sum[i] / c,   # what the prices said
+            "pnl_per_share": pnl[i] / c,        # buy one share of the side at its price
+        }
+    return out
+
+
+def run_backtest(prep: Prepared, params: BacktestParams) -> dict:
+    rows, score = pick_sides(prep, params)
+    won = prep.won[rows]
+    p = prep.probability[rows]
+
+    risk_code = np.where(score > params.score_high, 2, np.where(score > params.score_medium, 1, 0))
+    edges = np.asarray(PROBABILITY_BUCKETS)
+    p_code = np.clip(np.searchsorted(edges, p, side="right") - 1, 0, len(edges) - 2)
+    p_labels = [f"{lo:.2f}-{hi:.2f}" for lo, hi in zip(edges[:-1], edges[1:])]
+
+    return {
+        "params": asdict(params),
+        "snapshots": prep.n_snapshots,
+        "flagged": len(rows),
+        "overall": _bucket_stats(np.zeros(len(rows), dtype=np.int64), ["all"], won, p).get("all"),
+        "by_risk": _bucket_stats(risk_code, RISK_BUCKETS, won, p),
+        "by_probability": _bucket_stats(p_code, p_labels, won, p),
+        "by_time_risk": _bucket_stats(prep.time_risk_code[rows], list(TIME_RISK_LABELS), won, p),
+    }
+
+
+# ----- Parallel sweeps -----
+
+_worker_prep = None
+
+
+def _init_worker(path):
+    global _worker_prep
+    _worker_prep = Prepared(load_snapshots(path))
+
+
+def _run_in_worker(params):
+    return run_backtest(_worker_prep, params)
+
+
+def sweep(path: str, grid, workers: int = None):
+    """Run every BacktestParams in `grid` over a process pool (one data load per worker)."""
+    grid = list(grid)
+    workers = workers or min(len(grid), os.cpu_count() or 1)
+    if workers <= 1:
+        prep = Prepared(load_snapshots(path))
+        return [run_backtest(prep, params) for params in grid]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(path,)) as pool:
+        return list(pool.map(_run_in_worker, grid))
+
+
+def build_grid(args):
+    def floats(s):
+        return [float(x) for x in s.split(",") if x.strip()]
+
+    cutoffs = [tuple(float(x) for x in c.split(":")) for c in args.score_cutoffs.split(",")]
+    for min_p, min_wipe, mult_med, mult_high, (cut_med, cut_high) in itertools.product(
+        floats(args.min_p), floats(args.min_wipeout), floats(args.mult_medium), floats(args.mult_high), cutoffs,
+    ):
+        yield BacktestParams(min_p, min_wipe, mult_med, mult_high, cut_med, cut_high)
+
+
+# ----- CLI -----
+
+def _print_report(report):
+    params = report["params"]
+    overall = report["overall"] or {}
+    print(
+        f"min_p={params['min_p']} min_wipeout={params['min_wipeout']} "
+        f"mult={params['mult_medium']}/{params['mult_high']} cutoffs={params['score_medium']}/{params['score_high']}: "
+        f"{report['flagged']}/{report['snapshots']} snapshots flagged, "
+        f"hit rate {overall.get('hit_rate', 0):.4f} (implied {overall.get('implied_hit_rate', 0):.4f}), "
+        f"pnl/share {overall.get('pnl_per_share', 0):+.4f}"
+    )
+    for section in ("by_risk", "by_probability", "by_time_risk"):
+        for label, s in report[section].items():
+            print(
+                f"  {section[3:]:>11s} {label:>10s}: n={s['snapshots']:>9d}  hit {s['hit_rate']:.4f}  "
+                f"wipeout {s['wipeout_rate']:.4f}  implied {s['implied_hit_rate']:.4f}  pnl/share {s['pnl_per_share']:+.4f}"
+            )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help=".npz, .parquet or directory of .npy columns")
+    parser.add_argument("--min-p", default=str(STEAMROLLER_MIN_P))
+    parser.add_argument("--min-wipeout", default=str(STEAMROLLER_MIN_WIPEOUT))
+    parser.add_argument("--mult-medium", default=str(TIME_RISK_MULTIPLIERS["medium"]))
+    parser.add_argument("--mult-high", default=str(TIME_RISK_MULTIPLIERS["high"]))
+    parser.add_argument("--score-cutoffs", default=f"{SCORE_MEDIUM}:{SCORE_HIGH}", help="medium:high[,medium:high...]")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--json", action="store_true", help="Print the reports as JSON.")
+    parser.add_argument("--make-synthetic", type=int, metavar="MARKETS", help="Write a synthetic dataset to PATH and exit.")
+    args = parser.parse_args(argv)
+
+    if args.make_synthetic:
+        save_snapshots(args.path, make_synthetic(args.make_synthetic))
+        print(f"Wrote {args.make_synthetic} synthetic markets to {args.path}")
+        return 0
+
+    started = time.perf_counter()
+    reports = sweep(args.path, build_grid(args), workers=args.workers)
+    elapsed = time.perf_counter() - started
+
+    if args.json:
+        print(json.dumps(reports, indent=2))
+    else:
+        for report in reports:
+            _print_report(report)
+        print(f"{len(reports)} parameter set(s) in {elapsed:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,310 @@
+"""
+Market-wide steamroller screener.
+
+A background thread (or, in the async server, an asyncio task) pages through
+every active Gamma event, scores the open markets with the vectorized rules
+from steamroller_scan.py and keeps the steamroller candidates in an in-memory
+index sorted by score, wipeout factor and end date, so "top N" queries are
+answered from memory.
+"""
+import asyncio
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from steamroller_scan import (
+    TIME_RISK_LABELS,
+    best_side_per_market,
+    compute_outcome_metrics_batch,
+    flatten_markets,
+    overall_risk,
+    steamroller_scores,
+)
+
+SORT_KEYS = ("score", "wipeout", "days_left")
+
+
+def market_key(market: dict) -> str:
+    return str(market.get("id") or market.get("conditionId") or market.get("slug"))
+
+
+def market_signature(market: dict) -> tuple:
+    """Everything the score depends on apart from the clock."""
+    return (
+        str(market.get("outcomePrices")),
+        str(market.get("outcomes")),
+        market.get("endDateIso") or market.get("endDate"),
+        bool(market.get("active")),
+        bool(market.get("closed")),
+    )
+
+
+class _Snapshot:
+    """Immutable, query-ready view of the index (swapped in as a whole)."""
+
+    __slots__ = ("rows", "score", "probability", "wipeout", "end_ts", "orders")
+
+    def __init__(self, records):
+        self.rows = [r["row"] for r in records]
+        self.score = np.array([r["score"] for r in records], dtype=np.float64)
+        self.probability = np.array([r["probability"] for r in records], dtype=np.float64)
+        self.wipeout = np.array([r["wipeout"] for r in records], dtype=np.float64)
+        self.end_ts = np.array([r["end_ts"] for r in records], dtype=np.float64)
+
+        # unknown end dates sort last for "days_left"
+        end_for_sort = np.where(np.isnan(self.end_ts), np.inf, self.end_ts)
+        self.orders = {
+            "score": np.argsort(-self.score, kind="stable"),
+            "wipeout": np.argsort(-self.wipeout, kind="stable"),
+            "days_left": np.argsort(end_for_sort, kind="stable"),
+        }
+
+
+class SteamrollerIndex:
+    """
+    In-memory steamroller index.
+
+    fetch_page(offset, limit) must return a list of Gamma events (active and
+    not closed); an empty list ends a refresh pass. Only markets whose prices
+    (or end date / status) changed since the previous pass are re-scored;
+    every `full_rescore_every` passes all markets are re-scored so time-based
+    risk keeps up with the clock.
+    """
+
+    def __init__(self, fetch_page, refresh_interval=60.0, page_size=100, full_rescore_every=10):
+        self.fetch_page = fetch_page
+        self.refresh_interval = refresh_interval
+        self.page_size = page_size
+        self.full_rescore_every = full_rescore_every
+
+        self._records = {}          # market key -> record dict
+        self._snapshot = _Snapshot([])
+        self._refresh_lock = threading.Lock()
+        self._thread = None
+        self._task = None           # asyncio refresh loop (astart)
+        self._aready = None         # asyncio.Event twin of _ready for the task
+        self._stop = threading.Event()
+        self._ready = threading.Event()  # set once the first pass finished (or failed)
+
+        self._passes = 0
+        self._last_refresh = None
+        self._last_duration = None
+        self._last_changed = 0
+        self._last_error = None
+
+    # ----- Refresh -----
+
+    def _fetch_all_events(self):
+        events = []
+        offset = 0
+        while True:
+            page = self.fetch_page(offset, self.page_size)
+            if not page:
+                break
+            events.extend(page)
+            offset += self.page_size
+        return events
+
+    async def _afetch_all_events(self, fetch_page):
+        events = []
+        offset = 0
+        while True:
+            page = await fetch_page(offset, self.page_size)
+            if not page:
+                break
+            events.extend(page)
+            offset += self.page_size
+        return events
+
+    def refresh(self, events=None, now=None):
+        """Run one refresh pass (fetching all active events unless `events` is given)."""
+        with self._refresh_lock:
+            started = time.monotonic()
+            now = now or datetime.now(timezone.utc)
+            if events is None:
+                events = self._fetch_all_events()
+
+            full = self.full_rescore_every and self._passes % self.full_rescore_every == 0
+
+            seen = set()
+            changed = []
+            for event in events:
+                changed_markets = []
+                for market in event.get("markets") or []:
+                    key = market_key(market)
+                    seen.add(key)
+                    signature = market_signature(market)
+                    record = self._records.get(key)
+                    if full or record is None or record["signature"] != signature:
+                        changed_markets.append(market)
+                        self._records[key] = {"signature": signature, "row": None}
+                if changed_markets:
+                    changed.append({"slug": event.get("slug"), "markets": changed_markets})
+
+            for key in list(self._records):
+                if key not in seen:
+                    del self._records[key]
+
+            self._score(changed, now)
+
+            candidates = [r for r in self._records.values() if r["row"] is not None]
+            self._snapshot = _Snapshot(candidates)
+
+            self._passes += 1
+            self._last_changed = sum(len(e["markets"]) for e in changed)
+            self._last_refresh = now.isoformat()
+            self._last_duration = round(time.monotonic() - started, 3)
+            self._ready.set()
+            return self._last_changed
+
+    def _score(self, events, now):
+        markets, arrays = flatten_markets(events)
+        if not markets:
+            return
+
+        metrics = compute_outcome_metrics_batch(arrays["probability"], arrays["end_ts"], now.timestamp())
+        score = steamroller_scores(metrics)
+        best = best_side_per_market(arrays["market_idx"], arrays["outcome_pos"], score, len(markets))
+        best_score = score[best]
+        risks = overall_risk(np.where(np.isfinite(best_score), best_score, 0.0))
+
+        for m, entry in enumerate(markets):
+            market = entry["market"]
+            record = self._records[market_key(market)]
+            if not np.isfinite(best_score[m]):
+                continue  # no steamroller side: not indexed
+
+            i = best[m]
+            record.update({
+                "score": float(best_score[m]),
+                "probability": float(metrics["probability"][i]),
+                "wipeout": float(metrics["wipeout_factor"][i]),
+                "end_ts": float(arrays["end_ts"][i]),
+                "row": {
+                    "event_slug": entry["event_slug"],
+                    "market_id": market.get("id"),
+                    "market_title": market.get("question") or market.get("title"),
+                    "end_time": market.get("endDateIso") or market.get("endDate"),
+                    "steamroller_side": arrays["outcome"][i],
+                    "steamroller_score": float(best_score[m]),
+                    "probability": float(metrics["probability"][i]),
+                    "wipeout_factor": float(metrics["wipeout_factor"][i]),
+                    "time_risk": str(TIME_RISK_LABELS[metrics["time_risk_code"][i]]),
+                    "overall_risk": str(risks[m]),
+                },
+            })
+
+    # ----- Background loop -----
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="steamroller-index", daemon=True)
+        self._thread.start()
+
+    def wait_ready(self, timeout=None):
+        """Block until the first refresh pass has finished; False on timeout."""
+        return self._ready.wait(timeout)
+
+    def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+
+    def _refresh_failed(self, e):
+        self._last_error = f"{type(e).__name__}: {e}"
+        print(f"Steamroller index refresh failed: {self._last_error}")
+        self._ready.set()  # don't keep callers waiting on a failing Gamma
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+                self._last_error = None
+            except Exception as e:
+                self._refresh_failed(e)
+            self._stop.wait(self.refresh_interval)
+
+    # ----- asyncio loop -----
+
+    def astart(self, fetch_page):
+        """
+        Refresh from an asyncio task on the running loop instead of a thread.
+        `fetch_page` is a coroutine function with fetch_page's signature.
+        """
+        if self._task is not None and not self._task.done():
+            return
+        self._stop.clear()
+        self._aready = asyncio.Event()
+        self._task = asyncio.ensure_future(self._arun(fetch_page))
+
+    async def await_ready(self, timeout=None):
+        """wait_ready() for astart(): waits on the loop; False on timeout."""
+        if self._ready.is_set():
+            return True
+        if self._aready is None:
+            return False
+        try:
+            await asyncio.wait_for(self._aready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def _arun(self, fetch_page):
+        while not self._stop.is_set():
+            try:
+                self.refresh(events=await self._afetch_all_events(fetch_page))
+                self._last_error = None
+            except Exception as e:
+                self._refresh_failed(e)
+            self._aready.set()
+            await asyncio.sleep(self.refresh_interval)
+
+    # ----- Queries -----
+
+    def top(self, n=20, min_p=None, max_days=None, sort="score", now=None):
+        """
+        Best `n` indexed markets by `sort` ("score", "wipeout" or "days_left"),
+        optionally requiring side probability >= min_p and at most max_days left.
+        """
+        if sort not in SORT_KEYS:
+            raise ValueError(f"sort must be one of {SORT_KEYS}")
+
+        snap = self._snapshot
+        order = snap.orders[sort]
+        if not len(order):
+            return []
+
+        now_ts = (now or datetime.now(timezone.utc)).timestamp()
+        days_left = np.maximum((snap.end_ts - now_ts) / 86400.0, 0.0)
+
+        mask = np.ones(len(order), dtype=bool)
+        if min_p is not None:
+            mask &= snap.probability >= min_p
+        if max_days is not None:
+            mask &= days_left <= max_days  # unknown end dates (NaN) never match
+
+        picked = order[mask[order]][:n]
+        results = []
+        for i in picked.tolist():
+            row = dict(snap.rows[i])
+            row["days_left"] = None if np.isnan(days_left[i]) else float(days_left[i])
+            results.append(row)
+        return results
+
+    def status(self):
+        return {
+            "indexed_markets": len(self._snapshot.rows),
+            "tracked_markets": len(self._records),
+            "refresh_passes": self._passes,
+            "last_refresh": self._last_refresh,
+            "last_refresh_seconds": self._last_duration,
+            "last_changed_markets": self._last_changed,
+            "last_error": self._last_error,
+            "ready": self._ready.is_set(),
+            "running": (self._thread is not None and self._thread.is_alive())
+            or (self._task is not None and not self._task.done()),
+        }
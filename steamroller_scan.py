@@ -0,0 +1,249 @@
+"""
+Vectorized steamroller scoring.
+
+Same rules as compute_outcome_metrics / pick_steamroller_side in
+main_steamroller.py, but over NumPy arrays so thousands of markets can be
+scored in one call.
+"""
+import json
+from datetime import datetime, timezone
+from functools import lru_cache
+
+import numpy as np
+
+# ---------- Thresholds (shared with main_steamroller.py) ----------
+
+EPS = 1e-4
+STEAMROLLER_MIN_P = 0.9            # side must be at least this likely ...
+STEAMROLLER_MIN_WIPEOUT = 10.0     # ... and one loss must wipe at least this many wins
+RISK_MEDIUM_P = 0.75
+TIME_RISK_HIGH = (0.9, 7.0)        # p > 0.9 and more than 7 days left
+TIME_RISK_MEDIUM = (0.85, 3.0)     # p > 0.85 and more than 3 days left
+TIME_RISK_MULTIPLIERS = {"high": 1.3, "medium": 1.1}
+SCORE_HIGH = 30.0
+SCORE_MEDIUM = 15.0
+
+RISK_LABELS = np.array(["low", "medium", "high"])
+TIME_RISK_LABELS = np.array(["unknown", "low", "medium", "high"])
+_TIME_RISK_MULT = np.array([
+    1.0,
+    1.0,
+    TIME_RISK_MULTIPLIERS["medium"],
+    TIME_RISK_MULTIPLIERS["high"],
+])
+
+
+# ---------- Parsing ----------
+
+def parse_outcome_list(value):
+    """outcomes / outcomePrices come as lists or JSON-encoded strings."""
+    if value is None:
+        return []
+    if isinstance(value, list):
+        return value
+    if isinstance(value, str):
+        try:
+            parsed = json.loads(value)
+            if isinstance(parsed, list):
+                return parsed
+        except Exception:
+            return [p.strip() for p in value.split(",") if p.strip()]
+    return [value]
+
+
+@lru_cache(maxsize=4096)
+def _iso_to_timestamp(s: str) -> float:
+    try:
+        if s.endswith("Z"):
+            s = s.replace("Z", "+00:00")
+        d = datetime.fromisoformat(s)
+    except Exception:
+        return np.nan
+    if d.tzinfo is None:
+        d = d.replace(tzinfo=timezone.utc)
+    return d.timestamp()
+
+
+def parse_end_timestamp(market: dict) -> float:
+    """End date as a UTC epoch timestamp, or NaN if missing/unparseable."""
+    s = market.get("endDateIso") or market.get("endDate")
+    if not s:
+        return np.nan
+    # many markets of one event share an end date, so parses are cached
+    return _iso_to_timestamp(s)
+
+
+def is_open_market(market: dict) -> bool:
+    return bool(market.get("active")) and not market.get("closed")
+
+
+def flatten_markets(events, open_only=True):
+    """
+    Flatten the outcomes of every (open) market into parallel arrays.
+
+    Returns (markets, arrays) where `markets` is a list of
+    {"event_slug", "market"} rows and `arrays` holds one entry per outcome:
+    market_idx, outcome_pos, outcome (name), probability, end_ts.
+    """
+    markets = []
+    market_idx, outcome_pos, names, probs, end_ts = [], [], [], [], []
+
+    for event in events:
+        for market in event.get("markets") or []:
+            if open_only and not is_open_market(market):
+                continue
+
+            outcomes = parse_outcome_list(market.get("outcomes"))
+            prices = parse_outcome_list(market.get("outcomePrices"))
+            if not outcomes or len(outcomes) != len(prices):
+                continue
+
+            idx = len(markets)
+            end = parse_end_timestamp(market)
+            added = 0
+            for pos, (name, price) in enumerate(zip(outcomes, prices)):
+                try:
+                    p = float(price)
+                except (TypeError, ValueError):
+                    continue
+                if p > 1.0:
+                    p = p / 100.0
+                market_idx.append(idx)
+                outcome_pos.append(pos)
+                names.append(str(name))
+                probs.append(p)
+                end_ts.append(end)
+                added += 1
+
+            if added:
+                markets.append({"event_slug": event.get("slug"), "market": market})
+
+    arrays = {
+        "market_idx": np.asarray(market_idx, dtype=np.int64),
+        "outcome_pos": np.asarray(outcome_pos, dtype=np.int64),
+        "outcome": np.asarray(names, dtype=object),
+        "probability": np.asarray(probs, dtype=np.float64),
+        "end_ts": np.asarray(end_ts, dtype=np.float64),
+    }
+    return markets, arrays
+
+
+# ---------- Vectorized metrics ----------
+
+def compute_outcome_metrics_batch(probability, end_ts, now_ts):
+    """
+    Vectorized compute_outcome_metrics.
+
+    probability: array of raw probabilities in [0, 1]
+    end_ts:      array of end timestamps (NaN = unknown)
+    now_ts:      scalar "now" timestamp
+
+    Returns a dict of arrays: probability, max_gain_per_1, max_loss_per_1,
+    wipeout_factor, risk_code (index into RISK_LABELS), days_left (NaN =
+    unknown) and time_risk_code (index into TIME_RISK_LABELS).
+    """
+    p = np.clip(np.asarray(probability, dtype=np.float64), EPS, 1.0 - EPS)
+    max_gain = 1.0 - p
+    max_loss = p
+    wipeout = max_loss / max_gain
+
+    risk_code = np.where(
+        p < RISK_MEDIUM_P, 0,
+        np.where(p < STEAMROLLER_MIN_P, 1, np.where(wipeout >= STEAMROLLER_MIN_WIPEOUT, 2, 1)),
+    )
+
+    days_left = np.maximum((np.asarray(end_ts, dtype=np.float64) - now_ts) / 86400.0, 0.0)
+    known = ~np.isnan(days_left)
+    time_risk_code = np.where(
+        ~known, 0,
+        np.where(
+            days_left == 0, 1,
+            np.where(
+                (p > TIME_RISK_HIGH[0]) & (days_left > TIME_RISK_HIGH[1]), 3,
+                np.where((p > TIME_RISK_MEDIUM[0]) & (days_left > TIME_RISK_MEDIUM[1]), 2, 1),
+            ),
+        ),
+    )
+
+    return {
+        "probability": p,
+        "max_gain_per_1": max_gain,
+        "max_loss_per_1": max_loss,
+        "wipeout_factor": wipeout,
+        "risk_code": risk_code,
+        "days_left": days_left,
+        "time_risk_code": time_risk_code,
+    }
+
+
+def steamroller_scores(metrics, min_p=STEAMROLLER_MIN_P, min_wipeout=STEAMROLLER_MIN_WIPEOUT):
+    """Per-outcome steamroller score (-inf where the side does not qualify)."""
+    p = metrics["probability"]
+    wipe = metrics["wipeout_factor"]
+    score = wipe * p * _TIME_RISK_MULT[metrics["time_risk_code"]]
+    return np.where((p >= min_p) & (wipe >= min_wipeout), score, -np.inf)
+
+
+def overall_risk(score):
+    return np.where(score > SCORE_HIGH, "high", np.where(score > SCORE_MEDIUM, "medium", "low"))
+
+
+def best_side_per_market(market_idx, outcome_pos, score, n_markets):
+    """
+    Index of the best-scoring outcome of every market (ties -> first outcome),
+    like pick_steamroller_side. Returns an int array of length n_markets.
+    """
+    order = np.lexsort((outcome_pos, -score, market_idx))
+    _, first = np.unique(market_idx[order], return_index=True)
+    best = np.full(n_markets, -1, dtype=np.int64)
+    best[market_idx[order][first]] = order[first]
+    return best
+
+
+# ---------- Bulk scan ----------
+
+def scan_events(events, now=None, limit=None, include_all=False):
+    """
+    Score every open market of `events` and return rows ranked by
+    steamroller score (highest first).
+
+    Markets without a steamroller side are left out unless include_all=True.
+    """
+    now = now or datetime.now(timezone.utc)
+    markets, arrays = flatten_markets(events)
+    if not markets:
+        return []
+
+    metrics = compute_outcome_metrics_batch(arrays["probability"], arrays["end_ts"], now.timestamp())
+    score = steamroller_scores(metrics)
+    best = best_side_per_market(arrays["market_idx"], arrays["outcome_pos"], score, len(markets))
+
+    best_score = score[best]
+    has_side = np.isfinite(best_score)
+    keep = np.arange(len(markets)) if include_all else np.flatnonzero(has_side)
+
+    ranked = keep[np.argsort(-np.where(has_side, best_score, -1.0)[keep], kind="stable")]
+    if limit is not None:
+        ranked = ranked[:limit]
+
+    risks = overall_risk(np.where(has_side, best_score, 0.0))
+    rows = []
+    for m in ranked.tolist():
+        i = best[m]
+        market = markets[m]["market"]
+        days_left = metrics["days_left"][i]
+        side = has_side[m]
+        rows.append({
+            "event_slug": markets[m]["event_slug"],
+            "market_id": market.get("id"),
+            "market_title": market.get("question") or market.get("title"),
+            "end_time": market.get("endDateIso") or market.get("endDate"),
+            "days_left": None if np.isnan(days_left) else float(days_left),
+            "steamroller_side": arrays["outcome"][i] if side else None,
+            "steamroller_score": float(best_score[m]) if side else None,
+            "probability": float(metrics["probability"][i]),
+            "wipeout_factor": float(metrics["wipeout_factor"][i]),
+            "time_risk": str(TIME_RISK_LABELS[metrics["time_risk_code"][i]]),
+            "overall_risk": str(risks[m]) if side else "low",
+        })
+    return rows
@@ -0,0 +1,357 @@
+"""
+Streaming mode for the steamroller detector.
+
+Instead of polling a full event snapshot per request, a SteamrollerStream keeps
+one small state object per market and consumes price ticks from a pluggable
+async source (a websocket or a replayable JSONL file). Each tick re-scores only
+the outcomes of the market it touches, and subscribers are pushed a message
+whenever a market enters or leaves steamroller territory (or flips side).
+
+Messages understood by apply():
+
+    {"slug": "...", "markets": [...]}                       Gamma event: (re)seeds its markets
+    {"market_id": "123", "prices": [0.95, 0.05]}            all outcome prices of a market
+    {"market_id": "123", "outcome": "Yes", "price": 0.95}   one outcome price
+
+A tick may carry "ts" (epoch seconds or ISO string) so replays score against
+the time of the tick rather than the wall clock.
+
+    python steamroller_stream.py feed.jsonl
+    python steamroller_stream.py wss://example/feed
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+import numpy as np
+
+from steamroller_scan import (
+    STEAMROLLER_MIN_P,
+    STEAMROLLER_MIN_WIPEOUT,
+    TIME_RISK_LABELS,
+    _iso_to_timestamp,
+    compute_outcome_metrics_batch,
+    flatten_markets,
+    overall_risk,
+    parse_end_timestamp,
+    steamroller_scores,
+)
+
+
+class MarketState:
+    """Live state of one market (slotted: tens of thousands are kept in memory)."""
+
+    __slots__ = (
+        "market_id",
+        "event_slug",
+        "title",
+        "outcomes",
+        "prices",
+        "end_ts",
+        "side",
+        "score",
+        "probability",
+        "wipeout",
+        "time_risk",
+        "updated_at",
+    )
+
+    def __init__(self, market_id, event_slug, title, outcomes, prices, end_ts):
+        self.market_id = market_id
+        self.event_slug = event_slug
+        self.title = title
+        self.outcomes = outcomes
+        self.prices = prices          # float64 array, one entry per outcome
+        self.end_ts = end_ts
+        self.side = None              # index into outcomes, None = no steamroller side
+        self.score = None
+        self.probability = None
+        self.wipeout = None
+        self.time_risk = None
+        self.updated_at = None
+
+    def row(self) -> Dict[str, Any]:
+        return {
+            "event_slug": self.event_slug,
+            "market_id": self.market_id,
+            "market_title": self.title,
+            "steamroller_side": self.outcomes[self.side] if self.side is not None else None,
+            "steamroller_score": self.score,
+            "probability": self.probability,
+            "wipeout_factor": self.wipeout,
+            "time_risk": self.time_risk,
+            "overall_risk": str(overall_risk(self.score)) if self.score is not None else "low",
+            "updated_at": self.updated_at,
+        }
+
+
+def _tick_timestamp(value) -> Optional[float]:
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value / 1000.0 if value > 1e11 else value)  # accept milliseconds too
+    ts = _iso_to_timestamp(str(value))
+    return None if np.isnan(ts) else ts
+
+
+def _normalize_price(p) -> float:
+    p = float(p)
+    return p / 100.0 if p > 1.0 else p
+
+
+class SteamrollerStream:
+    def __init__(self, min_p: float = STEAMROLLER_MIN_P, min_wipeout: float = STEAMROLLER_MIN_WIPEOUT):
+        self.min_p = min_p
+        self.min_wipeout = min_wipeout
+        self.markets: Dict[str, MarketState] = {}
+        self._subscribers: List[asyncio.Queue] = []
+        self._stats = {"ticks": 0, "crossings": 0, "unknown_markets": 0, "bad_messages": 0, "dropped": 0}
+
+    # ----- State -----
+
+    def seed(self, events, now_ts: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Add or replace the open markets of Gamma events, dropping markets of
+        those events that are no longer open. Returns crossings (an "exit" for
+        every dropped steamroller).
+        """
+        now_ts = now_ts or time.time()
+        markets, arrays = flatten_markets(events)
+        crossings = []
+
+        slugs = {event.get("slug") for event in events} - {None}
+        open_ids = {str(entry["market"].get("id")) for entry in markets}
+        for market_id, state in list(self.markets.items()):
+            if state.event_slug in slugs and market_id not in open_ids:
+                del self.markets[market_id]
+                if state.side is not None:
+                    self._stats["crossings"] += 1
+                    previous = state.outcomes[state.side]
+                    state.side = state.score = state.probability = state.wipeout = state.time_risk = None
+                    state.updated_at = now_ts
+                    crossings.append({"type": "exit", "previous_side": previous, **state.row()})
+
+        for m, entry in enumerate(markets):
+            market = entry["market"]
+            sel = arrays["market_idx"] == m
+            market_id = str(market.get("id"))
+            state = MarketState(
+                market_id=market_id,
+                event_slug=entry["event_slug"],
+                title=market.get("question") or market.get("title"),
+                outcomes=[str(o) for o in arrays["outcome"][sel]],
+                prices=arrays["probability"][sel].copy(),
+                end_ts=parse_end_timestamp(market),
+            )
+            previous = self.markets.get(market_id)
+            if previous is not None and previous.outcomes == state.outcomes:
+                state.side, state.score = previous.side, previous.score
+            self.markets[market_id] = state
+            crossing = self._rescore(state, now_ts)
+            if crossing:
+                crossings.append(crossing)
+        return crossings
+
+    def _rescore(self, state: MarketState, now_ts: float) -> Optional[Dict[str, Any]]:
+        """Re-run the outcome metrics of one market; return a crossing message if any."""
+        metrics = compute_outcome_metrics_batch(state.prices, np.full(len(state.prices), state.end_ts), now_ts)
+        score = steamroller_scores(metrics, self.min_p, self.min_wipeout)
+
+        best = int(np.argmax(score))  # first outcome wins ties, like pick_steamroller_side
+        was_side = state.side
+        state.updated_at = now_ts
+
+        if np.isfinite(score[best]):
+            state.side = best
+            state.score = float(score[best])
+            state.probability = float(metrics["probability"][best])
+            state.wipeout = float(metrics["wipeout_factor"][best])
+            state.time_risk = str(TIME_RISK_LABELS[metrics["time_risk_code"][best]])
+        else:
+            state.side = state.score = state.probability = state.wipeout = state.time_risk = None
+
+        if was_side == state.side:
+            return None
+        if was_side is None:
+            kind = "enter"
+        elif state.side is None:
+            kind = "exit"
+        else:
+            kind = "side_change"
+        self._stats["crossings"] += 1
+        previous = state.outcomes[was_side] if was_side is not None else None
+        return {"type": kind, "previous_side": previous, **state.row()}
+
+    def apply(self, message: Dict[str, Any], now_ts: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Apply one feed message and return the crossings it caused."""
+        now_ts = _tick_timestamp(message.get("ts")) or now_ts or time.time()
+
+        if "markets" in message:
+            return self.seed([message], now_ts)
+
+        self._stats["ticks"] += 1
+        state = self.markets.get(str(message.get("market_id")))
+        if state is None:
+            self._stats["unknown_markets"] += 1
+            return []
+
+        try:
+            if "prices" in message:
+                prices = [_normalize_price(p) for p in message["prices"]]
+                if len(prices) != len(state.prices):
+                    raise ValueError("outcome count mismatch")
+                state.prices[:] = prices
+            else:
+                state.prices[state.outcomes.index(str(message["outcome"]))] = _normalize_price(message["price"])
+        except (KeyError, TypeError, ValueError):
+            self._stats["bad_messages"] += 1
+            return []
+
+        crossing = self._rescore(state, now_ts)
+        return [crossing] if crossing else []
+
+    def steamrollers(self) -> List[Dict[str, Any]]:
+        """Current steamroller markets, best score first."""
+        rows = [s.row() for s in self.markets.values() if s.side is not None]
+        rows.sort(key=lambda r: r["steamroller_score"], reverse=True)
+        return rows
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "markets": len(self.markets),
+            "steamrollers": sum(1 for s in self.markets.values() if s.side is not None),
+            "subscribers": len(self._subscribers),
+        }
+
+    # ----- Subscribers -----
+
+    def subscribe(self, maxsize: int = 256) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self._subscribers.append(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        if queue in self._subscribers:
+            self._subscribers.remove(queue)
+
+    def publish(self, message: Dict[str, Any]) -> None:
+        for queue in self._subscribers:
+            if queue.full():
+                queue.get_nowait()  # slow consumer: drop its oldest message
+                self._stats["dropped"] += 1
+            queue.put_nowait(message)
+
+    async def run(self, source: AsyncIterator[Dict[str, Any]]) -> None:
+        """Consume a source until it ends, pushing crossings to subscribers."""
+        async for message in source:
+            for crossing in self.apply(message):
+                self.publish(crossing)
+
+
+# ----- Sources -----
+
+async def jsonl_source(path: str, realtime: bool = False, speed: float = 1.0) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Replay a JSONL file of feed messages. With realtime=True, messages carrying
+    "ts" are paced by their timestamps (divided by `speed`).
+    """
+    last_ts = None
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                message = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+            ts = _tick_timestamp(message.get("ts"))
+            if realtime and ts is not None:
+                if last_ts is not None and ts > last_ts:
+                    await asyncio.sleep((ts - last_ts) / speed)
+                last_ts = ts
+            else:
+                await asyncio.sleep(0)  # let subscribers run between messages
+            yield message
+
+
+async def websocket_source(
+    url: str,
+    subscribe: Optional[Dict[str, Any]] = None,
+    parse: Callable[[Any], List[Dict[str, Any]]] = None,
+    reconnect_delay: float = 5.0,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Read feed messages from a websocket, reconnecting when it drops.
+
+    `subscribe` is sent as JSON after every (re)connect. `parse` turns one
+    decoded frame into a list of feed messages (default: the frame itself, or
+    each element when the frame is a list).
+    """
+    import aiohttp
+
+    parse = parse or (lambda data: data if isinstance(data, list) else [data])
+    async with aiohttp.ClientSession() as session:
+        while True:
+            try:
+                async with session.ws_connect(url, heartbeat=30) as ws:
+                    if subscribe is not None:
+                        await ws.send_json(subscribe)
+                    async for frame in ws:
+                        if frame.type != aiohttp.WSMsgType.TEXT:
+                            continue
+                        try:
+                            data = json.loads(frame.data)
+                        except json.JSONDecodeError:
+                            continue
+                        for message in parse(data):
+                            yield message
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                print(f"Price feed {url} dropped: {e}")
+            await asyncio.sleep(reconnect_delay)
+
+
+def source_from_spec(spec: str, realtime: bool = False) -> AsyncIterator[Dict[str, Any]]:
+    """ws:// or wss:// URLs become websocket sources, anything else a JSONL replay."""
+    if spec.startswith(("ws://", "wss://")):
+        return websocket_source(spec)
+    return jsonl_source(spec, realtime=realtime)
+
+
+# ----- CLI -----
+
+async def _print_crossings(spec: str, realtime: bool) -> None:
+    stream = SteamrollerStream()
+    queue = stream.subscribe()
+    runner = asyncio.create_task(stream.run(source_from_spec(spec, realtime)))
+
+    while not (runner.done() and queue.empty()):
+        try:
+            message = await asyncio.wait_for(queue.get(), timeout=0.5)
+        except asyncio.TimeoutError:
+            continue
+        print(json.dumps(message))
+
+    await runner
+    print(json.dumps({"type": "stats", **stream.stats()}))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Print steamroller threshold crossings from a price feed.")
+    parser.add_argument("source", help="JSONL file to replay or ws:// / wss:// URL")
+    parser.add_argument("--realtime", action="store_true", help="Pace a JSONL replay by its tick timestamps.")
+    args = parser.parse_args(argv)
+
+    try:
+        asyncio.run(_print_crossings(args.source, args.realtime))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
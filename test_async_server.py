@@ -0,0 +1,95 @@
+import asyncio
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+
+import async_server
+import main_steamroller
+import poly_event_ai_summarizer as summarizer
+from fake_gemini_server import INSIGHT_TEXT, make_handler
+from insight_cache import InsightCache
+from steamroller_index import SteamrollerIndex
+
+
+@pytest.fixture
+def fake_upstream(tmp_path, monkeypatch):
+    """Point Gamma and Gemini at fake_gemini_server.py, with a scratch insight cache and index."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(chunk_delay=0.0, n_chunks=4))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    cache = InsightCache(str(tmp_path / "insights.sqlite3"))
+    monkeypatch.setattr(summarizer, "GAMMA_BASE_URL", base)
+    monkeypatch.setattr(summarizer, "GEMINI_BASE_URL", f"{base}/v1beta")
+    monkeypatch.setattr(summarizer, "insight_cache", cache)
+    monkeypatch.setattr(async_server, "GAMMA_BASE_URL", base)
+    monkeypatch.setattr(async_server, "insight_cache", cache)
+    index = SteamrollerIndex(fetch_page=None)
+    monkeypatch.setattr(async_server, "steamroller_index", index)
+    monkeypatch.setattr(main_steamroller, "steamroller_index", index)
+    monkeypatch.setenv("GEMINI_API_KEY", "fake")
+    yield base
+    server.shutdown()
+    server.server_close()
+
+
+def call(handler):
+    """Run `handler(client)` against the async app on a fresh event loop."""
+    async def run():
+        app = async_server.web.Application()
+        app.on_startup.append(async_server._start_client)
+        app.on_cleanup.append(async_server._close_client)
+        app.router.add_post("/ai-insight", async_server.ai_insight)
+        app.router.add_post("/ai-insight/stream", async_server.ai_insight_stream)
+        app.router.add_get("/api/steamroller/bulk", async_server.steamroller_bulk)
+        app.router.add_get("/api/steamroller/top", async_server.steamroller_top)
+        async with TestClient(TestServer(app)) as client:
+            try:
+                return await handler(client)
+            finally:
+                async_server.steamroller_index.stop()
+
+    return asyncio.run(run())
+
+
+def test_async_insight_matches_the_summarizer(fake_upstream):
+    async def insights(client):
+        plain = await client.post("/ai-insight", json={"slug": "async-insight-event"})
+        stream = await client.post("/ai-insight/stream", json={"slug": "async-stream-event"})
+        return await plain.json(), await stream.text()
+
+    plain, stream = call(insights)
+
+    assert plain == {"insight": INSIGHT_TEXT}
+    assert stream.count("event: chunk") > 1 and stream.endswith("event: done\ndata: {}\n\n")
+    # both were cached under the same keys the sync summarizer uses
+    assert summarizer.generate_insight_from_query("async-stream-event") == INSIGHT_TEXT
+
+
+def test_bulk_scans_tag_and_slugs_through_aiohttp(fake_upstream):
+    async def bulk(client):
+        resp = await client.get("/api/steamroller/bulk", params=[("tag", "politics"), ("slugs", "bulk-a,bulk-b")])
+        return resp.status, await resp.json()
+
+    status, payload = call(bulk)
+
+    assert status == 200
+    assert payload["events_scanned"] == 3 and payload["errors"] == []
+    assert {r["event_slug"] for r in payload["results"]} == {"fake-listed-event", "bulk-a", "bulk-b"}
+
+
+def test_top_starts_the_index_on_the_event_loop(fake_upstream):
+    async def top(client):
+        resp = await client.get("/api/steamroller/top", params={"n": "5"})
+        bad = await client.get("/api/steamroller/top", params={"max_days": "soon"})
+        return await resp.json(), bad.status, await bad.json()
+
+    payload, bad_status, bad_payload = call(top)
+
+    assert payload["index"]["ready"] and payload["index"]["refresh_passes"] == 1
+    assert [r["event_slug"] for r in payload["results"]] == ["fake-listed-event"]
+    assert async_server.steamroller_index._thread is None  # no refresh thread
+    assert bad_status == 400 and bad_payload == {"error": "max_days must be a number"}
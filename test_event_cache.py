@@ -0,0 +1,31 @@
+import time
+
+from event_cache import EventCache
+
+
+def test_namespaces_do_not_share_entries():
+    cache = EventCache()
+    cache.get("fed-decision", lambda slug: {"id": "1", "source": "summarizer"}, namespace="event")
+
+    raw = cache.get("fed-decision", lambda slug: {"id": "1", "source": "comments"}, namespace="comments")
+
+    assert raw["source"] == "comments"
+    assert cache.peek("fed-decision", namespace="event")["source"] == "summarizer"
+    assert cache.peek("fed-decision") is None
+
+
+def test_no_stale_window_reloads_expired_entries():
+    cache = EventCache(ttl=0.05, stale_ttl=0)
+    calls = []
+
+    def loader(slug):
+        calls.append(slug)
+        return {"id": str(len(calls))}
+
+    assert cache.get("btc", loader)["id"] == "1"
+    assert cache.get("btc", loader)["id"] == "1"
+    time.sleep(0.06)
+
+    # expired: loaded again on the caller's thread, never served stale
+    assert cache.get("btc", loader)["id"] == "2"
+    assert cache.stats()["stale_hits"] == 0
@@ -0,0 +1,60 @@
+import asyncio
+import time
+
+from event_resolver import HedgedResolver
+
+
+class NotFound(Exception):
+    status_code = 404
+
+
+def lookups(direct_event, search_event, direct_delay=0.0):
+    """(direct, search) callables for resolve() and their async twins for aresolve()."""
+    def direct():
+        time.sleep(direct_delay)
+        if direct_event is None:
+            raise NotFound()
+        return direct_event
+
+    async def adirect():
+        await asyncio.sleep(direct_delay)
+        if direct_event is None:
+            raise NotFound()
+        return direct_event
+
+    async def asearch():
+        return search_event
+
+    return (direct, lambda: search_event), (adirect, asearch)
+
+
+def resolve_both(resolver, key, direct_event, search_event, direct_delay=0.0):
+    (direct, search), (adirect, asearch) = lookups(direct_event, search_event, direct_delay)
+    threaded = resolver.resolve("slug", key, direct, search)
+    resolver.negative_cache.discard(key)
+    hedged = asyncio.run(resolver.aresolve("slug", key, adirect, asearch))
+    return threaded, hedged
+
+
+def test_direct_lookup_beats_a_non_matching_search_hit():
+    event = {"id": "1", "slug": "fed-decision"}
+    other = {"id": "2", "slug": "fed-decision-2025"}
+
+    assert resolve_both(HedgedResolver(), "fed-decision", event, other, direct_delay=0.05) == (event, event)
+
+
+def test_matching_search_hit_wins_without_waiting_for_direct():
+    event = {"id": "1", "slug": "fed-decision"}
+
+    started = time.monotonic()
+    assert resolve_both(HedgedResolver(), "fed-decision", event, event, direct_delay=0.5) == (event, event)
+    assert time.monotonic() - started < 0.5
+
+
+def test_direct_miss_falls_back_to_search_and_is_negatively_cached():
+    resolver = HedgedResolver()
+    other = {"id": "2", "slug": "fed-decision-2025"}
+
+    assert resolve_both(resolver, "fed-decison", None, other) == (other, other)
+    assert "fed-decison" in resolver.negative_cache
+    assert resolver.stats()["hedged"] == 2
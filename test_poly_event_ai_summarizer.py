@@ -0,0 +1,81 @@
+import json
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import poly_event_ai_summarizer as summarizer
+from fake_gemini_server import INSIGHT_TEXT, make_handler
+from insight_cache import InsightCache
+
+
+@pytest.fixture
+def fake_gemini(tmp_path, monkeypatch):
+    """Point Gamma and Gemini at fake_gemini_server.py, with a scratch insight cache."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(chunk_delay=0.0, n_chunks=4))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    monkeypatch.setattr(summarizer, "GAMMA_BASE_URL", base)
+    monkeypatch.setattr(summarizer, "GEMINI_BASE_URL", f"{base}/v1beta")
+    monkeypatch.setattr(summarizer, "insight_cache", InsightCache(str(tmp_path / "insights.sqlite3")))
+    monkeypatch.setenv("GEMINI_API_KEY", "fake")
+    yield base
+    server.shutdown()
+    server.server_close()
+
+
+def read_records(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_stream_insight_arrives_in_chunks(fake_gemini):
+    chunks = list(summarizer.stream_insight_from_query("stream-test-event"))
+
+    assert len(chunks) > 1
+    assert "".join(chunks) == INSIGHT_TEXT
+
+    # the complete text is cached and served as a single chunk next time
+    assert list(summarizer.stream_insight_from_query("stream-test-event")) == [INSIGHT_TEXT]
+
+
+def test_run_batch_packs_events_into_few_gemini_calls(fake_gemini, tmp_path):
+    output = tmp_path / "digest.jsonl"
+    queries = [f"batch-pack-event-{i}" for i in range(7)]
+
+    with open(output, "w", encoding="utf-8") as f:
+        summary = summarizer.run_batch(queries, summarizer.JsonlWriter(f), pack_size=3)
+
+    records = read_records(output)
+    assert summary["ok"] == 7 and summary["error"] == 0
+    assert summary["gemini_packed_calls"] == 2 and summary["gemini_single_calls"] == 1
+    assert sorted(r["query"] for r in records) == sorted(queries)
+    assert sorted(r["packed"] for r in records) == [1, 3, 3, 3, 3, 3, 3]
+    for r in records:
+        # packed answers carry the index the prompt gave the event
+        expected = f"[{r['index']}] {INSIGHT_TEXT}" if r["packed"] > 1 else INSIGHT_TEXT
+        assert r["status"] == "ok" and r["insight"] == expected
+
+
+def test_batch_resume_skips_done_queries_and_drops_a_torn_line(fake_gemini, tmp_path):
+    queries_path = tmp_path / "queries.txt"
+    output = tmp_path / "digest.jsonl"
+    queries_path.write_text("batch-resume-a\n# comment\n\nbatch-resume-b\nbatch-resume-a\n")
+
+    assert summarizer.main(["--batch", str(queries_path), "--output", str(output)]) == 0
+    assert sorted(r["query"] for r in read_records(output)) == ["batch-resume-a", "batch-resume-b"]
+
+    # an interrupted run left half a record behind
+    with open(output, "a", encoding="utf-8") as f:
+        f.write('{"index": 2, "query": "batch-resu')
+    with open(queries_path, "a", encoding="utf-8") as f:
+        f.write("batch-resume-c\n")
+
+    assert summarizer.read_done_queries(str(output)) == {"batch-resume-a", "batch-resume-b"}
+    assert summarizer.main(["--batch", str(queries_path), "--output", str(output), "--resume"]) == 0
+
+    records = read_records(output)
+    assert [r["query"] for r in records[2:]] == ["batch-resume-c"]
+    assert all(r["status"] == "ok" for r in records)